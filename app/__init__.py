@@ -3,29 +3,69 @@ from logging.handlers import RotatingFileHandler
 import os
 from flask import Flask
 from config import Config
-from app.tracing import init_tracing
-from app.metrics import get_backend_type
+from app.startup import StartupProfile, get_startup_profile_enabled
 
 
 def create_app(config_class=Config):
-    app = Flask(__name__)
-    app.config.from_object(config_class)
+    # Tracing, metrics backends and exporters are imported inside their phases,
+    # so deployments that do not configure them never load them.
+    profile = StartupProfile(get_startup_profile_enabled())
 
-    init_tracing(app)
+    with profile.phase("config"):
+        app = Flask(__name__)
+        app.config.from_object(config_class)
 
-    from app.errors import bp as errors_bp
+    with profile.phase("blueprints"):
+        from app.errors import bp as errors_bp
 
-    app.register_blueprint(errors_bp)
+        app.register_blueprint(errors_bp)
 
-    from app.main import bp as main_bp
+        from app.main import bp as main_bp
 
-    app.register_blueprint(main_bp)
+        app.register_blueprint(main_bp)
 
-    # Add prometheus wsgi middleware to route /metrics requests (only for prometheus backend)
-    if get_backend_type() == "prometheus":
-        from werkzeug.middleware.dispatcher import DispatcherMiddleware
-        from prometheus_client import make_wsgi_app
-        app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {"/metrics": make_wsgi_app()})
+    # Templates are compiled here rather than by the first request of each worker
+    with profile.phase("templates"):
+        from app.pages import init_pages
+
+        init_pages(app)
+
+    with profile.phase("metrics backend"):
+        from app.metrics import get_backend_type, get_metrics_backend
+
+        metrics = get_metrics_backend()
+
+    with profile.phase("tracing"):
+        from app.tracing import init_tracing
+
+        init_tracing(app, metrics)
+
+    # Count and time every response (including errors and static files) in one place.
+    with profile.phase("request metrics"):
+        from app.metrics.middleware import init_request_metrics
+
+        init_request_metrics(app, metrics)
+
+    # Add prometheus wsgi middleware to route /metrics requests: the Prometheus backend's
+    # registry, or with OTEL_METRICS_EXPORTER=prometheus the OTel meter provider, collected per scrape.
+    # In multiprocess mode the Prometheus registry merges the metrics of every gunicorn worker.
+    from app.tracing import get_metrics_exporter_type
+
+    if get_backend_type() == "prometheus" or get_metrics_exporter_type() == "prometheus":
+        with profile.phase("/metrics endpoint"):
+            from werkzeug.middleware.dispatcher import DispatcherMiddleware
+            from app.metrics.exposition import CachedMetricsApp, get_cache_ttl
+
+            if get_backend_type() == "prometheus":
+                from app.metrics.multiprocess import get_registry
+
+                registry = get_registry()
+            else:
+                registry = metrics.registry
+            metrics_app = CachedMetricsApp(
+                registry, ttl=get_cache_ttl(), before_render=metrics.flush
+            )
+            app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {"/metrics": metrics_app})
 
     if not app.debug and not app.testing:
         if app.config["LOG_TO_STDOUT"]:
@@ -50,4 +90,8 @@ def create_app(config_class=Config):
         app.logger.setLevel(logging.INFO)
         app.logger.info("prom-metrics-app startup")
 
+    if profile.enabled:
+        app.extensions["startup_profile"] = profile
+        app.logger.info(profile.report())
+
     return app
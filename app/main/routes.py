@@ -1,35 +1,107 @@
-from flask import render_template
-from app.main import bp, metrics
+from flask import Response, current_app, jsonify, render_template, request, url_for
+from app.main import bp
+from app.metrics import get_metrics_backend
+from app.metrics.middleware import exempt
+from app.metrics.snapshot import dumps, get_metrics_snapshots
+from app.metrics.stream import get_metrics_stream, get_stream_max_age
+from app.pages import render_page
+from app.tasks import TaskQueueFull, get_task_executor, report_progress
 import time
 
 
 @bp.route("/", methods=["GET", "POST"])
 @bp.route("/index", methods=["GET", "POST"])
-@metrics.time_request_decorator()
 def index():
-    metrics.inc_successful()
-    metrics.inc_requests()
-
-    return render_template("index.html", title="Home")
+    return render_page("index.html", title="Home")
 
 
 @bp.route("/view_metrics", methods=["GET", "POST"])
+@exempt
 def view_metrics():
-    summary = metrics.get_metrics_summary()
+    summary = get_metrics_backend().get_metrics_summary()
     return render_template("view_metrics.html", title="View Metrics", metrics_summary=summary)
 
 
+@bp.route("/api/metrics", methods=["GET"])
+@exempt
+def api_metrics():
+    """Metric values as JSON for dashboards.
+
+    With ?since=<version> only the series changed after that version are
+    returned, or 304 when nothing changed. Not counted in the request
+    metrics, so polling does not change the values it polls.
+    """
+    try:
+        since = _since_arg()
+    except ValueError:
+        return jsonify({"error": "since must be an integer version"}), 400
+
+    version, series = get_metrics_snapshots().changed_since(since)
+    headers = {"ETag": f'W/"{version}"', "Cache-Control": "no-cache"}
+    if since is not None and version <= since:
+        return Response(status=304, headers=headers)
+    body = dumps({"version": version, "since": since, "series": series})
+    return Response(body, mimetype="application/json", headers=headers)
+
+
+@bp.route("/api/metrics/stream", methods=["GET"])
+@exempt
+def api_metrics_stream():
+    """Server-Sent Events stream of the changes /api/metrics would return.
+
+    Every client is fed from one shared producer. The stream closes after
+    METRICS_STREAM_MAX_AGE seconds and the browser reconnects with
+    Last-Event-ID, so it resumes where it left off.
+    """
+    try:
+        since = _since_arg(request.headers.get("Last-Event-ID"))
+    except ValueError:
+        return jsonify({"error": "since must be an integer version"}), 400
+
+    events = get_metrics_stream().events(since, max_age=get_stream_max_age())
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(events, mimetype="text/event-stream", headers=headers)
+
+
+def _since_arg(default=None):
+    """Return the ?since version as an int, or None; raises ValueError when malformed."""
+    since = request.args.get("since", default)
+    return None if since is None else int(since)
+
+
 @bp.route("/do_task", methods=["GET", "POST"])
-@metrics.time_request_decorator()
 def do_task():
-    process_request(5)
+    """Run the dummy task on the task executor.
+
+    Waits for the task by default. With ?async=1 (or a 'Prefer: respond-async'
+    header) returns 202 with the job id, to be polled at /tasks/<job_id>.
+    """
+    try:
+        job = get_task_executor().submit(process_request, current_app.config["TASK_DURATION"])
+    except TaskQueueFull:
+        return "Task queue is full, try again later\n", 503, {"Retry-After": "1"}
+
+    if request.args.get("async") or "respond-async" in request.headers.get("Prefer", ""):
+        status_url = url_for("main.task_status", job_id=job.id)
+        return jsonify(job.to_dict()), 202, {"Location": status_url}
+
+    job.wait()
+    if job.state == "failed":
+        raise RuntimeError(f"Task {job.id} failed: {job.error}")
+
+    return render_page("do_task.html", title="Do task")
 
-    metrics.inc_successful()
-    metrics.inc_requests()
 
-    return render_template("do_task.html", title="Do task")
+@bp.route("/tasks/<job_id>", methods=["GET"])
+def task_status(job_id):
+    job = get_task_executor().get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.to_dict())
 
 
-def process_request(t):
+def process_request(t, steps=10):
     """A dummy function that takes some time."""
-    time.sleep(t)
+    for step in range(steps):
+        time.sleep(t / steps)
+        report_progress((step + 1) / steps)
@@ -11,6 +11,9 @@ def get_metrics_backend() -> MetricsBackend:
 
     Uses METRICS_BACKEND environment variable to determine which backend to use.
     Valid values: 'prometheus' (default), 'otel'
+
+    When METRICS_SNAPSHOT_PATH is set, totals saved by a previous run are
+    restored before the backend is returned, see app.metrics.persistence.
     """
     global _metrics_instance
 
@@ -26,9 +29,17 @@ def get_metrics_backend() -> MetricsBackend:
         from app.metrics.prometheus import PrometheusMetrics
         _metrics_instance = PrometheusMetrics()
 
+    from app.metrics.persistence import start_persistence
+    start_persistence(_metrics_instance)
     return _metrics_instance
 
 
+def flush_metrics_backend() -> None:
+    """Apply buffered request metrics of the backend, if one was created."""
+    if _metrics_instance is not None:
+        _metrics_instance.flush()
+
+
 def get_backend_type() -> str:
     """Return the configured backend type string."""
     return os.environ.get("METRICS_BACKEND", "prometheus").lower()
@@ -1,51 +1,249 @@
+import time
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
 from functools import wraps
-from typing import Callable, Iterator, TypeVar
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Optional, Sequence, Tuple, TypeVar
+
+from app.metrics.batching import RequestBatcher, get_batch_interval
+from app.metrics.exemplars import (
+    ExemplarSampler,
+    TraceContext,
+    current_trace_context,
+    get_exemplar_interval,
+    get_exemplars_enabled,
+)
+from app.metrics.labels import UNKNOWN
+from app.metrics.window import SlidingWindow
+
+if TYPE_CHECKING:
+    from app.metrics.persistence import MetricState
 
 F = TypeVar("F", bound=Callable)
 
 
 class MetricsBackend(ABC):
-    """Abstract base class defining the metrics interface."""
+    """Abstract base class defining the metrics interface.
+
+    HTTP metrics are labelled with the route template and method; the total
+    request counter also carries the status class ('2xx', '4xx', ...).
+    Implementations bound the number of label sets and fold the excess into
+    an 'other' route. Request durations carry the trace and span id of a
+    sampled request as an exemplar, at most once per bucket and interval.
+    """
+
+    def __init__(self):
+        interval = get_batch_interval()
+        self._batcher = RequestBatcher(self.record_batch, interval) if interval > 0 else None
+        # Recent request rate, 5xx ratio and latency, fed by the counter and timing methods
+        self._windows = SlidingWindow()
+        self._exemplars = ExemplarSampler(interval=get_exemplar_interval()) if get_exemplars_enabled() else None
+        # When the counter and histogram totals started, moved back by restore_state()
+        self._start_time = time.time()
 
     @abstractmethod
-    def inc_requests(self) -> None:
+    def inc_requests(self, route: str = UNKNOWN, method: str = UNKNOWN, status: str = UNKNOWN) -> None:
         """Increment total HTTP request counter."""
         pass
 
     @abstractmethod
-    def inc_successful(self) -> None:
+    def inc_successful(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
         """Increment successful HTTP request counter."""
         pass
 
     @abstractmethod
-    def inc_4xx(self) -> None:
+    def inc_4xx(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
         """Increment 4xx error counter."""
         pass
 
     @abstractmethod
-    def inc_5xx(self) -> None:
+    def inc_5xx(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
         """Increment 5xx error counter."""
         pass
 
     @abstractmethod
     @contextmanager
-    def time_request(self) -> Iterator[None]:
+    def time_request(self, route: str = UNKNOWN, method: str = UNKNOWN) -> Iterator[None]:
         """Context manager to time request duration."""
         pass
 
-    def time_request_decorator(self) -> Callable[[F], F]:
-        """Decorator to time request duration."""
+    @abstractmethod
+    def observe_request(
+        self, route: str, method: str, seconds: float, exemplar: Optional[TraceContext] = None
+    ) -> None:
+        """Record the duration of one request.
+
+        exemplar is the (trace_id, span_id) to attach; without it the current
+        span is attached when _sample_exemplar() selects the duration.
+        """
+        pass
+
+    @abstractmethod
+    def record_batch(self, route: str, method: str, statuses: Dict[int, int], durations: Sequence[float]) -> None:
+        """Record several finished requests of one (route, method) pair.
+
+        statuses maps status codes to request counts; durations holds one
+        value per request.
+        """
+        pass
+
+    def record_request(
+        self, route: str, method: str, status_code: int, seconds: float,
+        trace_context: Optional[TraceContext] = None,
+    ) -> None:
+        """Record count, status class and duration of one finished request.
+
+        Buffered per thread and applied in batches when METRICS_BATCH_INTERVAL
+        is set, see app.metrics.batching. trace_context is the (trace_id,
+        span_id) of the request's span; a request selected as an exemplar is
+        recorded right away so its duration carries it.
+        """
+        if trace_context is not None:
+            exemplar = self._sample_exemplar(seconds, trace_context)
+            if exemplar is not None:
+                self.record_batch(route, method, {status_code: 1}, ())
+                self.observe_request(route, method, seconds, exemplar)
+                return
+        if self._batcher is not None:
+            self._batcher.record(route, method, status_code, seconds)
+        else:
+            self.record_batch(route, method, {status_code: 1}, (seconds,))
+
+    @property
+    def exemplars_enabled(self) -> bool:
+        """True when request durations may carry trace exemplars, see METRICS_EXEMPLARS."""
+        return self._exemplars is not None
+
+    def _sample_exemplar(
+        self, seconds: float, trace_context: Optional[TraceContext] = None
+    ) -> Optional[TraceContext]:
+        """Return the trace context to attach to a duration, or None.
+
+        Uses the current span when trace_context is not given. The bucket
+        check comes first, so most calls return without looking at the span.
+        """
+        sampler = self._exemplars
+        if sampler is None or not sampler.due(seconds):
+            return None
+        if trace_context is None:
+            trace_context = current_trace_context()
+            if trace_context is None:
+                return None
+        sampler.add(seconds, trace_context)
+        return trace_context
+
+    def flush(self) -> None:
+        """Apply buffered request metrics to the backend."""
+        if self._batcher is not None:
+            self._batcher.flush()
+
+    def time_request_decorator(
+        self, labels: Optional[Callable[[], Tuple[str, str]]] = None
+    ) -> Callable[[F], F]:
+        """Decorator to time request duration.
+
+        labels is called on every invocation and returns the (route, method)
+        labels, e.g. app.metrics.labels.request_labels inside Flask views.
+        """
         def decorator(func: F) -> F:
             @wraps(func)
             def wrapper(*args, **kwargs):
-                with self.time_request():
+                route, method = labels() if labels is not None else (UNKNOWN, UNKNOWN)
+                with self.time_request(route, method):
                     return func(*args, **kwargs)
             return wrapper  # type: ignore
         return decorator
 
+    @abstractmethod
+    def set_task_queue_depth(self, depth: int) -> None:
+        """Set the number of tasks waiting for an executor worker."""
+        pass
+
+    @abstractmethod
+    def set_tasks_running(self, count: int) -> None:
+        """Set the number of tasks currently running."""
+        pass
+
+    @abstractmethod
+    def observe_task_queue_wait(self, seconds: float) -> None:
+        """Record how long a task waited in the queue before starting."""
+        pass
+
+    @abstractmethod
+    def observe_trace_sampling(self, sampled: bool) -> None:
+        """Count one trace sampling decision, see app.sampling."""
+        pass
+
+    @abstractmethod
+    def set_span_queue_size(self, size: int) -> None:
+        """Set the number of finished spans waiting to be exported."""
+        pass
+
+    @abstractmethod
+    def observe_span_export(self, batch_size: int, seconds: float) -> None:
+        """Record the size and duration of one span export, see app.span_pipeline."""
+        pass
+
+    @abstractmethod
+    def inc_spans_dropped(self, count: int, reason: str) -> None:
+        """Count spans lost by the span pipeline; reason is 'queue_full' or 'export_failed'."""
+        pass
+
+    @abstractmethod
+    def export_state(self) -> Optional["MetricState"]:
+        """Return the totals of every counter and histogram series, see app.metrics.persistence.
+
+        Returns None when the totals cannot be read.
+        """
+        pass
+
+    @abstractmethod
+    def restore_state(self, state: "MetricState") -> None:
+        """Add totals saved by either backend's export_state() in a previous run.
+
+        Series whose labels or histogram buckets no longer match are skipped.
+        """
+        pass
+
     @abstractmethod
     def get_metrics_summary(self) -> dict:
         """Return current metric values for display."""
         pass
+
+    @staticmethod
+    def _trace_sampling_summary(name: str, sampled: float, dropped: float) -> dict:
+        """Return the get_metrics_summary() entry for trace sampling decisions."""
+        decisions = sampled + dropped
+        return {
+            "name": name,
+            "sampled": sampled,
+            "dropped": dropped,
+            "ratio": sampled / decisions if decisions else None,
+        }
+
+    @staticmethod
+    def _span_pipeline_summary(
+        queue_size: float, exports: float, export_seconds: float, exported_spans: float, dropped: Dict[str, float]
+    ) -> dict:
+        """Return the get_metrics_summary() entries for the span export pipeline."""
+        return {
+            "span_queue_size": {"name": "span_queue_size", "value": queue_size},
+            "span_export": {
+                "name": "span_export_seconds",
+                "count": exports,
+                "sum": export_seconds,
+            },
+            "span_export_batch_size": {
+                "name": "span_export_batch_size",
+                "count": exports,
+                "sum": exported_spans,
+            },
+            "spans_dropped": {
+                "name": "spans_dropped",
+                "queue_full": dropped.get("queue_full", 0.0),
+                "export_failed": dropped.get("export_failed", 0.0),
+            },
+        }
+
+    def _exemplar_summary(self, name: str) -> list:
+        """Return the get_metrics_summary() entry for request duration exemplars."""
+        return self._exemplars.summary(f"{name}_bucket") if self.exemplars_enabled else []
@@ -0,0 +1,114 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.metrics.sharded import ThreadShards
+
+# apply(route, method, {status_code: count}, [durations])
+ApplyBatch = Callable[[str, str, Dict[int, int], List[float]], None]
+
+
+def get_batch_interval() -> float:
+    """Return how often buffered request metrics are applied, in seconds.
+
+    Environment variables:
+        METRICS_BATCH_INTERVAL: Seconds request metrics are buffered per
+            thread before being applied to the backend (default: 1). Set to
+            0 to apply every request immediately.
+    """
+    return max(float(os.environ.get("METRICS_BATCH_INTERVAL", "1")), 0.0)
+
+
+class _SeriesBatch:
+    """Buffered status counts and durations of one (route, method) pair."""
+
+    __slots__ = ("statuses", "durations")
+
+    def __init__(self):
+        self.statuses: Dict[int, int] = {}
+        self.durations: List[float] = []
+
+
+class _Shard:
+    """One thread's pending batch. The lock is only contended while a flush swaps it out."""
+
+    __slots__ = ("lock", "series")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series: Dict[Tuple[str, str], _SeriesBatch] = {}
+
+    def take(self) -> Dict[Tuple[str, str], _SeriesBatch]:
+        with self.lock:
+            series, self.series = self.series, {}
+        return series
+
+
+class RequestBatcher:
+    """Buffers finished requests per thread and applies them in batches.
+
+    Recording a request touches only the calling thread's shard under its
+    own, normally uncontended lock, instead of the several shared locks the
+    backend takes per counter and histogram update. A background thread
+    applies every shard to the backend each ``interval`` seconds, merging
+    the requests of a (route, method) pair into one call; flush() does the
+    same on demand, e.g. before the metrics are read. Shards of finished
+    threads or greenlets are applied by the next flush.
+    """
+
+    def __init__(self, apply: ApplyBatch, interval: float):
+        self._apply = apply
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._retired: List[_Shard] = []
+        self._shards: ThreadShards[_Shard] = ThreadShards(self._new_shard, self._retire, self._lock)
+        self._stopped = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def record(self, route: str, method: str, status_code: int, seconds: float) -> None:
+        shard = self._shards.get()
+        with shard.lock:
+            series = shard.series.get((route, method))
+            if series is None:
+                series = shard.series[(route, method)] = _SeriesBatch()
+            series.statuses[status_code] = series.statuses.get(status_code, 0) + 1
+            series.durations.append(seconds)
+
+    def flush(self) -> None:
+        """Apply every pending request to the backend."""
+        with self._flush_lock:
+            with self._lock:
+                shards = self._shards.live() + self._retired
+                self._retired = []
+            merged: Dict[Tuple[str, str], _SeriesBatch] = {}
+            for shard in shards:
+                for key, batch in shard.take().items():
+                    target = merged.get(key)
+                    if target is None:
+                        merged[key] = batch
+                        continue
+                    for status_code, count in batch.statuses.items():
+                        target.statuses[status_code] = target.statuses.get(status_code, 0) + count
+                    target.durations.extend(batch.durations)
+            for (route, method), batch in merged.items():
+                self._apply(route, method, batch.statuses, batch.durations)
+
+    def close(self) -> None:
+        """Stop the background flusher and apply what is left."""
+        self._stopped.set()
+        self.flush()
+
+    def _new_shard(self) -> _Shard:
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="metrics-batcher", daemon=True)
+                self._flusher.start()
+        return _Shard()
+
+    def _retire(self, shard: _Shard) -> None:
+        self._retired.append(shard)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self.flush()
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+from bisect import bisect_left
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.metrics.histogram import DEFAULT_BUCKETS
+
+# (trace_id, span_id) of the span an observation belongs to
+TraceContext = Tuple[int, int]
+
+
+def get_exemplars_enabled() -> bool:
+    """Return True when request durations may carry trace exemplars.
+
+    Environment variables:
+        METRICS_EXEMPLARS: Set to 'false' to never attach exemplars
+            (default: true)
+    """
+    return os.environ.get("METRICS_EXEMPLARS", "true").lower() == "true"
+
+
+def get_exemplar_interval() -> float:
+    """Return the minimum seconds between two exemplars of one histogram bucket.
+
+    Environment variables:
+        METRICS_EXEMPLAR_INTERVAL: Seconds (default: 10)
+    """
+    return max(float(os.environ.get("METRICS_EXEMPLAR_INTERVAL", "10")), 0.0)
+
+
+def current_trace_context() -> Optional[TraceContext]:
+    """Return the (trace_id, span_id) of the current sampled span, or None.
+
+    Looks the OTel API up in sys.modules instead of importing it, so
+    deployments without tracing never load it.
+    """
+    trace = sys.modules.get("opentelemetry.trace")
+    if trace is None:
+        return None
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.trace_flags.sampled:
+        return None
+    return span_context.trace_id, span_context.span_id
+
+
+class Exemplar(NamedTuple):
+    trace_id: int
+    span_id: int
+    value: float
+    timestamp: float
+
+
+class ExemplarSampler:
+    """Picks which request durations carry an exemplar, and keeps the latest ones.
+
+    At most one exemplar per histogram bucket is taken every ``interval``
+    seconds, so rare slow buckets get one almost every time while the busy
+    fast ones are sampled sparsely. The check is a binary search and a clock
+    read; memory is one slot per bucket. Updates are not locked: concurrent
+    requests may both take an exemplar for the same bucket, which only
+    replaces the slot.
+    """
+
+    def __init__(
+        self,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        interval: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self._bounds = tuple(float(b) for b in buckets)
+        self._interval = interval
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._next_at = [float("-inf")] * (len(self._bounds) + 1)
+        self._latest: List[Optional[Exemplar]] = [None] * (len(self._bounds) + 1)
+
+    def due(self, seconds: float) -> bool:
+        """Return True if the bucket of ``seconds`` may take an exemplar now."""
+        return self._clock() >= self._next_at[bisect_left(self._bounds, seconds)]
+
+    def add(self, seconds: float, trace_context: TraceContext) -> None:
+        """Store an exemplar for the bucket of ``seconds`` and close the bucket for the interval."""
+        index = bisect_left(self._bounds, seconds)
+        self._next_at[index] = self._clock() + self._interval
+        self._latest[index] = Exemplar(trace_context[0], trace_context[1], seconds, self._wall_clock())
+
+    def summary(self, name: str) -> List[dict]:
+        """Return the latest exemplar of each bucket for get_metrics_summary()."""
+        labels = [str(bound) for bound in self._bounds] + ["+Inf"]
+        return [
+            {
+                "name": name,
+                "le": le,
+                "trace_id": format(exemplar.trace_id, "032x"),
+                "span_id": format(exemplar.span_id, "016x"),
+                "value": exemplar.value,
+                "timestamp": exemplar.timestamp,
+            }
+            for le, exemplar in zip(labels, self._latest)
+            if exemplar is not None
+        ]
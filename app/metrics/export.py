@@ -0,0 +1,661 @@
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from dataclasses import replace
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, Optional
+
+from opentelemetry.sdk.metrics import Counter, Histogram, ObservableCounter
+from opentelemetry.sdk.metrics import export as metrics_export
+from opentelemetry.sdk.metrics.export import (
+    AggregationTemporality,
+    HistogramDataPoint,
+    Metric,
+    MetricExporter,
+    MetricExportResult,
+    MetricReader,
+    MetricsData,
+    NumberDataPoint,
+    ResourceMetrics,
+    ScopeMetrics,
+)
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+
+from app.metrics import otel_multiprocess
+
+if TYPE_CHECKING:
+    from app.metrics.persistence import MetricState
+
+logger = logging.getLogger(__name__)
+
+
+def get_metric_export_interval() -> float:
+    """Return the seconds between metric exports while metrics are changing.
+
+    Environment variables:
+        OTEL_METRIC_EXPORT_INTERVAL: Milliseconds (default: 10000)
+    """
+    return max(float(os.environ.get("OTEL_METRIC_EXPORT_INTERVAL", "10000")), 1.0) / 1000
+
+
+def get_metric_export_max_interval() -> float:
+    """Return the longest the export interval stretches to while nothing changes.
+
+    Environment variables:
+        OTEL_METRIC_EXPORT_MAX_INTERVAL: Milliseconds; set it to
+            OTEL_METRIC_EXPORT_INTERVAL for a fixed interval (default: 60000)
+    """
+    return max(float(os.environ.get("OTEL_METRIC_EXPORT_MAX_INTERVAL", "60000")), 1.0) / 1000
+
+
+def get_metric_temporality() -> str:
+    """Return the aggregation temporality of exported counters and histograms.
+
+    Environment variables:
+        OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE: 'cumulative'
+            (default) or 'delta'
+    """
+    return os.environ.get("OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE", "cumulative").lower()
+
+
+def get_changed_only_export() -> bool:
+    """Return True when series that did not change since the last export are left out.
+
+    Environment variables:
+        OTEL_METRIC_EXPORT_CHANGED_ONLY: Set to 'false' to resend every
+            series on every export (default: true)
+    """
+    return os.environ.get("OTEL_METRIC_EXPORT_CHANGED_ONLY", "true").lower() == "true"
+
+
+def preferred_temporality(temporality: str) -> Optional[dict]:
+    """Return the exporter ``preferred_temporality`` for get_metric_temporality().
+
+    With 'delta', counters and histograms report what was recorded since the
+    previous export; gauges and up-down counters stay cumulative, as the
+    OTLP exporter's own delta preference does.
+    """
+    if temporality != "delta":
+        return None
+    return {
+        Counter: AggregationTemporality.DELTA,
+        Histogram: AggregationTemporality.DELTA,
+        ObservableCounter: AggregationTemporality.DELTA,
+    }
+
+
+class AdaptiveMetricReader(MetricReader):
+    """Periodically exports metrics, leaving out series that did not change.
+
+    Works like the SDK's PeriodicExportingMetricReader, with two changes.
+    With ``changed_only``, a cumulative data point or gauge is exported
+    only when its value differs from the last one sent; delta points are
+    always sent, since the SDK already omits series that recorded nothing.
+    An export left with no data points is skipped. And the interval adapts
+    to traffic: every collection in which nothing changed doubles it, up to
+    ``max_interval``, and the first change brings it back to ``interval``.
+
+    A series counts as sent only once the exporter returns SUCCESS, so
+    after a failed export the next one resends it even if it has not
+    changed since. ``exports``, ``failed_exports``, ``skipped_exports``,
+    ``exported_points`` and ``unchanged_points`` count what the reader did.
+    """
+
+    def __init__(
+        self,
+        exporter: MetricExporter,
+        interval: float = 10.0,
+        max_interval: float = 60.0,
+        changed_only: bool = True,
+    ):
+        super().__init__(
+            preferred_temporality=exporter._preferred_temporality,
+            preferred_aggregation=exporter._preferred_aggregation,
+        )
+        self._exporter = exporter
+        self._base_interval = interval
+        self._max_interval = max(max_interval, interval)
+        self._changed_only = changed_only
+        self.interval = interval
+
+        # Last exported value of each cumulative series, by (metric name, attributes)
+        self._last_values: Dict[Hashable, Hashable] = {}
+        self.exports = 0
+        self.failed_exports = 0
+        self.skipped_exports = 0
+        self.exported_points = 0
+        self.unchanged_points = 0
+
+        # Held while comparing and exporting; export() must not run concurrently
+        self._export_lock = threading.Lock()
+        self._received = False
+        self._shutdown = threading.Event()
+        self._start_worker()
+        if hasattr(os, "register_at_fork"):
+            start_worker = weakref.WeakMethod(self._start_worker)
+
+            def _after_in_child() -> None:
+                method = start_worker()
+                if method is not None:
+                    method()
+
+            os.register_at_fork(after_in_child=_after_in_child)
+
+    def _start_worker(self) -> None:
+        self._worker = threading.Thread(target=self._run, name="metric-export", daemon=True)
+        self._worker.start()
+
+    def _run(self) -> None:
+        while not self._shutdown.wait(self.interval):
+            self._collect_safely()
+        # Send what changed since the last export before stopping
+        self._collect_safely()
+
+    def _collect_safely(self) -> None:
+        self._received = False
+        try:
+            self.collect()
+        except Exception:
+            logger.exception("Exception while collecting metrics")
+            return
+        if not self._received:
+            # The SDK had nothing to report (e.g. idle delta series) and
+            # skipped _receive_metrics; that still counts as no change
+            with self._export_lock:
+                self._adapt(False)
+                self.skipped_exports += 1
+
+    def _receive_metrics(self, metrics_data: MetricsData, timeout_millis: float = 10_000, **kwargs) -> None:
+        with self._export_lock:
+            self._received = True
+            sent: Dict[Hashable, Hashable] = {}
+            changes = self._changes(metrics_data, sent)
+            self._adapt(changes is not None)
+            data = changes if self._changed_only else metrics_data
+            if data is None:
+                self.skipped_exports += 1
+                return
+            try:
+                result = self._exporter.export(data, timeout_millis=timeout_millis)
+            except Exception:
+                logger.exception("Exception while exporting metrics")
+                result = MetricExportResult.FAILURE
+            if result is not MetricExportResult.SUCCESS:
+                self.failed_exports += 1
+                return
+            self._last_values.update(sent)
+            self.exports += 1
+            self.exported_points += sum(
+                len(metric.data.data_points)
+                for resource in data.resource_metrics
+                for scope in resource.scope_metrics
+                for metric in scope.metrics
+            )
+
+    def _changes(self, metrics_data: MetricsData, sent: Dict[Hashable, Hashable]) -> Optional[MetricsData]:
+        """Return ``metrics_data`` without the data points that did not change, or None if none did.
+
+        The new values of changed cumulative series are added to ``sent``,
+        to become the last exported values once the export succeeds.
+        """
+        resource_metrics = []
+        for resource in metrics_data.resource_metrics:
+            scope_metrics = []
+            for scope in resource.scope_metrics:
+                metrics = []
+                for metric in scope.metrics:
+                    points = [point for point in metric.data.data_points if self._changed(metric, point, sent)]
+                    self.unchanged_points += len(metric.data.data_points) - len(points)
+                    if points:
+                        metrics.append(replace(metric, data=replace(metric.data, data_points=points)))
+                if metrics:
+                    scope_metrics.append(replace(scope, metrics=metrics))
+            if scope_metrics:
+                resource_metrics.append(replace(resource, scope_metrics=scope_metrics))
+        return MetricsData(resource_metrics=resource_metrics) if resource_metrics else None
+
+    def _changed(self, metric, point, sent: Dict[Hashable, Hashable]) -> bool:
+        if getattr(metric.data, "aggregation_temporality", None) is AggregationTemporality.DELTA:
+            return True
+        key = (metric.name, tuple(sorted(point.attributes.items())) if point.attributes else ())
+        if isinstance(point, HistogramDataPoint):
+            value = (point.count, point.sum, tuple(point.bucket_counts))
+        else:
+            value = point.value
+        if self._last_values.get(key) == value:
+            return False
+        sent[key] = value
+        return True
+
+    def _adapt(self, changed: bool) -> None:
+        """Reset the interval after a change, stretch it after a collection without one."""
+        if changed:
+            self.interval = self._base_interval
+        else:
+            self.interval = min(self._max_interval, self.interval * 2)
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        super().force_flush(timeout_millis=timeout_millis)
+        self._exporter.force_flush(timeout_millis=timeout_millis)
+        return True
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        """Export what changed, stop the worker and shut down the exporter."""
+        if self._shutdown.is_set():
+            return
+        self._shutdown.set()
+        self._worker.join(timeout_millis / 1000)
+        self._exporter.shutdown(timeout_millis=timeout_millis)
+
+
+def _kind(data) -> Optional[str]:
+    if isinstance(data, metrics_export.Histogram):
+        return "histogram"
+    if isinstance(data, metrics_export.Gauge):
+        return "gauge"
+    if isinstance(data, metrics_export.Sum):
+        return "counter" if data.is_monotonic else "updowncounter"
+    return None
+
+
+def read_shared_metrics(resource: Resource, path: Optional[str] = None) -> Optional[MetricsData]:
+    """Return the cumulative metrics of every worker sharing ``path``, or None if there are none.
+
+    Built from app.metrics.otel_multiprocess.read_merged_values(); exemplars
+    stay with the worker that recorded them and are not included.
+    """
+    values = otel_multiprocess.read_merged_values(path)
+    if not values:
+        return None
+    now = time.time_ns()
+
+    # {(scope, kind, name, unit, description): {attributes: {field: (value, start time)}}}
+    series: Dict[tuple, Dict[tuple, dict]] = {}
+    for key, value in values.items():
+        scope, kind, name, unit, description, attributes, field = json.loads(key)
+        points = series.setdefault((scope, kind, name, unit, description), {})
+        points.setdefault(tuple(map(tuple, attributes)), {})[field] = value
+
+    scopes: Dict[str, list] = {}
+    for (scope, kind, name, unit, description), points in sorted(series.items()):
+        data_points = [_data_point(kind, dict(attributes), fields, now) for attributes, fields in points.items()]
+        if kind == "histogram":
+            data = metrics_export.Histogram(data_points, AggregationTemporality.CUMULATIVE)
+        elif kind == "gauge":
+            data = metrics_export.Gauge(data_points)
+        else:
+            data = metrics_export.Sum(data_points, AggregationTemporality.CUMULATIVE, kind == "counter")
+        scopes.setdefault(scope, []).append(Metric(name, description, unit, data))
+
+    scope_metrics = [ScopeMetrics(InstrumentationScope(scope), metrics, "") for scope, metrics in scopes.items()]
+    return MetricsData(resource_metrics=[ResourceMetrics(resource, scope_metrics, "")])
+
+
+def _data_point(kind: str, attributes: dict, fields: dict, now: int):
+    start = min((start for _, start in fields.values() if start), default=0.0)
+    start_time = int(start * 1e9)
+    if kind != "histogram":
+        return NumberDataPoint(attributes, start_time, now, fields["value"][0], exemplars=[])
+    buckets = sorted((float(field[3:]), value) for field, (value, _) in fields.items() if field.startswith("le:"))
+    return HistogramDataPoint(
+        attributes,
+        start_time,
+        now,
+        count=int(fields["count"][0]),
+        sum=fields["sum"][0],
+        bucket_counts=[int(count) for _, count in buckets],
+        explicit_bounds=[bound for bound, _ in buckets[:-1]],
+        min=fields["min"][0],
+        max=fields["max"][0],
+        exemplars=[],
+    )
+
+
+class SharedMetricReader(MetricReader):
+    """Publishes this worker's metrics for the pod; the elected worker exports everyone's.
+
+    Every ``interval`` seconds the worker's cumulative values are written to
+    its mmap file in ``path`` (see app.metrics.otel_multiprocess). The
+    worker holding the directory's leader lock also runs the reader made
+    by ``create_export_reader``, which collects read_shared_metrics()
+    instead of this worker's own values, so the collector receives one
+    series per pod over one connection. The other workers retry the lock
+    on every publish, and one takes over within ``interval`` when the
+    leader exits.
+    """
+
+    def __init__(
+        self,
+        resource: Resource,
+        create_export_reader: Callable[[], Optional[MetricReader]],
+        path: Optional[str] = None,
+        interval: float = 1.0,
+    ):
+        super().__init__()
+        self._resource = resource
+        self._create_export_reader = create_export_reader
+        self._path = path or otel_multiprocess.get_otel_multiproc_dir()
+        self._interval = interval
+        # Set while this worker is the pod's exporter
+        self.export_reader: Optional[MetricReader] = None
+        self._leader_fd: Optional[int] = None
+
+        # Held while writing to the worker file, which is not thread safe
+        self._publish_lock = threading.Lock()
+        self._file = None
+        # Only the process that created the reader publishes; see _after_fork_in_child()
+        self._pid = os.getpid()
+        self._keys: Dict[tuple, str] = {}
+        self._shutdown = threading.Event()
+        self._start_worker()
+        if hasattr(os, "register_at_fork"):
+            after_fork = weakref.WeakMethod(self._after_fork_in_child)
+
+            def _after_in_child() -> None:
+                method = after_fork()
+                if method is not None:
+                    method()
+
+            os.register_at_fork(after_in_child=_after_in_child)
+
+    @property
+    def leading(self) -> bool:
+        """True while this worker exports for every worker."""
+        return self.export_reader is not None
+
+    def _start_worker(self) -> None:
+        self._worker = threading.Thread(target=self._run, name="metric-publish", daemon=True)
+        self._worker.start()
+
+    def _after_fork_in_child(self) -> None:
+        """Give up the parent's leadership and stop publishing in the forked child.
+
+        The child's aggregations start as copies of the parent's cumulative
+        values, so publishing them would count the parent's traffic twice.
+        Forked children, such as TASK_EXECUTOR=process pool workers, also
+        never pass through gunicorn's child_exit, which would leave their
+        files behind.
+        """
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+        if isinstance(self.export_reader, AdaptiveMetricReader):
+            # Stop the copy's worker; its collect callback returns nothing once it is no longer ours
+            self.export_reader._shutdown.set()
+        self.export_reader = None
+        self._publish_lock = threading.Lock()
+        self._file = None
+        self._shutdown = threading.Event()
+        self._shutdown.set()
+
+    def _run(self) -> None:
+        while not self._shutdown.wait(self._interval):
+            try:
+                self.collect()
+                self._elect()
+            except Exception:
+                logger.exception("Exception while publishing metrics")
+
+    def _elect(self) -> None:
+        if self._leader_fd is not None:
+            return
+        fd = otel_multiprocess.acquire_leader_lock(self._path)
+        if fd is None:
+            return
+        export_reader = self._create_export_reader()
+        if export_reader is None:
+            os.close(fd)
+            return
+        export_reader._set_collect_callback(self._collect_shared)
+        self._leader_fd = fd
+        self.export_reader = export_reader
+        logger.info("Worker %d exports metrics for every worker in %s", os.getpid(), self._path)
+
+    def _collect_shared(self, reader: MetricReader, timeout_millis: float = 10_000) -> Optional[MetricsData]:
+        if reader is not self.export_reader:
+            return None
+        # The leader's own values are as fresh as the export
+        self.collect(timeout_millis=timeout_millis)
+        return read_shared_metrics(self._resource, self._path)
+
+    def _receive_metrics(self, metrics_data: MetricsData, timeout_millis: float = 10_000, **kwargs) -> None:
+        from prometheus_client.mmap_dict import MmapedDict
+
+        if os.getpid() != self._pid:
+            return
+        with self._publish_lock:
+            if self._file is None:
+                self._file = MmapedDict(otel_multiprocess.worker_file(self._path, self._pid))
+            for resource in metrics_data.resource_metrics:
+                for scope in resource.scope_metrics:
+                    for metric in scope.metrics:
+                        kind = _kind(metric.data)
+                        if kind is None:
+                            continue
+                        for point in metric.data.data_points:
+                            start = (point.start_time_unix_nano or 0) / 1e9
+                            for field, value in _fields(kind, point):
+                                self._file.write_value(self._key(scope.scope.name, kind, metric, point, field),
+                                                       value, start)
+
+    def _key(self, scope: str, kind: str, metric: Metric, point, field: str) -> str:
+        attributes = tuple(sorted(point.attributes.items())) if point.attributes else ()
+        cache_key = (metric.name, attributes, field)
+        key = self._keys.get(cache_key)
+        if key is None:
+            key = self._keys[cache_key] = otel_multiprocess.series_key(
+                scope, kind, metric.name, metric.unit, metric.description, list(attributes), field
+            )
+        return key
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        super().force_flush(timeout_millis=timeout_millis)
+        if self.export_reader is not None:
+            self.export_reader.force_flush(timeout_millis=timeout_millis)
+        return True
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        """Publish the final values, export them if leading and give up the lock."""
+        if self._shutdown.is_set():
+            return
+        self._shutdown.set()
+        self._worker.join(timeout_millis / 1000)
+        try:
+            self.collect(timeout_millis=timeout_millis)
+        except Exception:
+            logger.exception("Exception while publishing metrics")
+        if self.export_reader is not None:
+            self.export_reader.shutdown(timeout_millis=timeout_millis)
+            self.export_reader = None
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+        with self._publish_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _fields(kind: str, point):
+    if kind != "histogram":
+        return (("value", point.value),)
+    bounds = [repr(float(bound)) for bound in point.explicit_bounds] + ["inf"]
+    return (
+        ("count", point.count),
+        ("sum", point.sum),
+        ("min", point.min),
+        ("max", point.max),
+        *((f"le:{bound}", count) for bound, count in zip(bounds, point.bucket_counts)),
+    )
+
+
+def _attributes(point) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in point.attributes.items())) if point.attributes else ()
+
+
+def metric_state(data: Optional[MetricsData], start_time: float) -> "MetricState":
+    """Return the cumulative counter and histogram points of ``data`` as a MetricState.
+
+    ``start_time`` is used when it is earlier than every point's start time.
+    """
+    from app.metrics.persistence import HistogramState, MetricState
+
+    counters = {}
+    histograms = {}
+    for resource in data.resource_metrics if data is not None else ():
+        for scope in resource.scope_metrics:
+            for metric in scope.metrics:
+                kind = _kind(metric.data)
+                if kind not in ("counter", "histogram") or \
+                        metric.data.aggregation_temporality != AggregationTemporality.CUMULATIVE:
+                    continue
+                for point in metric.data.data_points:
+                    if point.start_time_unix_nano:
+                        start_time = min(start_time, point.start_time_unix_nano / 1e9)
+                    key = (metric.name, _attributes(point))
+                    if kind == "counter":
+                        counters[key] = counters.get(key, 0.0) + point.value
+                    else:
+                        histograms[key] = HistogramState(
+                            tuple(point.explicit_bounds), tuple(point.bucket_counts), point.sum
+                        )
+    return MetricState(counters, histograms, start_time)
+
+
+class RestoredMetrics:
+    """Adds counter and histogram totals restored from a snapshot to what readers collect.
+
+    The SDK's aggregations cannot be set to a value, so the restored totals
+    are kept here and added to the cumulative points of every reader passed
+    to attach(); series with nothing recorded since the restart are added
+    as points of their own. Their start time becomes the snapshot's, so
+    the totals continue rather than reset. Delta readers are left alone:
+    their receiver has already counted the restored values.
+
+    ``instruments`` maps the name of each counter and histogram of the
+    meter named ``scope`` to its (kind, description, unit).
+    """
+
+    def __init__(
+        self, state: "MetricState", instruments: Dict[str, tuple], resource: Resource, scope: str
+    ):
+        self._instruments = instruments
+        self._resource = resource
+        self._scope = scope
+        self._start_time = int(state.start_time * 1e9)
+        # {name: {attributes: restored value or HistogramState}}
+        self._series: Dict[str, dict] = {}
+        for kind, values in (("counter", state.counters), ("histogram", state.histograms)):
+            for (name, labels), value in values.items():
+                if instruments.get(name, (None,))[0] == kind:
+                    self._series.setdefault(name, {})[labels] = value
+
+    def attach(self, reader: MetricReader) -> None:
+        """Add the restored totals to what ``reader`` collects, unless it uses delta temporality."""
+        if AggregationTemporality.DELTA in reader._instrument_class_temporality.values():
+            return
+        collect = reader._collect
+
+        def collect_restored(reader: MetricReader, timeout_millis: float = 10_000) -> Optional[MetricsData]:
+            return self.apply(collect(reader, timeout_millis=timeout_millis))
+
+        reader._set_collect_callback(collect_restored)
+
+    def apply(self, data: Optional[MetricsData]) -> Optional[MetricsData]:
+        """Return ``data`` with the restored totals added."""
+        if not self._series:
+            return data
+        now = time.time_ns()
+        resource_metrics = list(data.resource_metrics) if data is not None else []
+        if not resource_metrics:
+            resource_metrics = [ResourceMetrics(self._resource, [], "")]
+
+        applied = False
+        for index, resource in enumerate(resource_metrics):
+            scope_metrics = list(resource.scope_metrics)
+            for scope_index, scope in enumerate(scope_metrics):
+                if scope.scope.name == self._scope:
+                    scope_metrics[scope_index] = replace(scope, metrics=self._restore(scope.metrics, now))
+                    applied = True
+                    break
+            if applied:
+                resource_metrics[index] = replace(resource, scope_metrics=scope_metrics)
+                break
+        if not applied:
+            first = resource_metrics[0]
+            scope = ScopeMetrics(InstrumentationScope(self._scope), self._restore([], now), "")
+            resource_metrics[0] = replace(first, scope_metrics=list(first.scope_metrics) + [scope])
+        return MetricsData(resource_metrics=resource_metrics)
+
+    def _restore(self, metrics, now: int) -> list:
+        restored = []
+        for metric in metrics:
+            series = self._series.get(metric.name)
+            if series is None or getattr(metric.data, "aggregation_temporality", None) != \
+                    AggregationTemporality.CUMULATIVE:
+                restored.append(metric)
+                continue
+            points = {_attributes(point): point for point in metric.data.data_points}
+            data_points = [
+                self._point(point, series.get(attributes), now) for attributes, point in points.items()
+            ] + [
+                self._point(None, value, now, attributes)
+                for attributes, value in series.items() if attributes not in points
+            ]
+            restored.append(replace(metric, data=replace(metric.data, data_points=data_points)))
+
+        names = {metric.name for metric in metrics}
+        for name, series in self._series.items():
+            if name in names:
+                continue
+            kind, description, unit = self._instruments[name]
+            data_points = [self._point(None, value, now, attributes) for attributes, value in series.items()]
+            if kind == "histogram":
+                data = metrics_export.Histogram(data_points, AggregationTemporality.CUMULATIVE)
+            else:
+                data = metrics_export.Sum(data_points, AggregationTemporality.CUMULATIVE, True)
+            restored.append(Metric(name, description, unit, data))
+        return restored
+
+    def _point(self, point, value, now: int, attributes: tuple = ()):
+        """Return ``point`` with the restored ``value`` added, or a new point holding only ``value``."""
+        if value is None:
+            return point
+        start_time = min(point.start_time_unix_nano, self._start_time) if point is not None else self._start_time
+        if not isinstance(value, tuple):
+            if point is None:
+                return NumberDataPoint(dict(attributes), start_time, now, value, exemplars=[])
+            return replace(point, start_time_unix_nano=start_time, value=point.value + value)
+
+        low, high = _bucket_range(value)
+        if point is None:
+            return HistogramDataPoint(
+                dict(attributes), start_time, now,
+                count=sum(value.counts), sum=value.sum, bucket_counts=list(value.counts),
+                explicit_bounds=list(value.bounds), min=low, max=high, exemplars=[],
+            )
+        if tuple(point.explicit_bounds) != value.bounds or not any(value.counts):
+            return point
+        return replace(
+            point,
+            start_time_unix_nano=start_time,
+            count=point.count + sum(value.counts),
+            sum=point.sum + value.sum,
+            bucket_counts=[current + restored for current, restored in zip(point.bucket_counts, value.counts)],
+            min=min(point.min, low),
+            max=max(point.max, high),
+        )
+
+
+def _bucket_range(histogram) -> tuple:
+    """Estimate the (min, max) of a restored histogram from its lowest and highest non-empty buckets."""
+    filled = [index for index, count in enumerate(histogram.counts) if count]
+    if not filled or not histogram.bounds:
+        return 0.0, 0.0
+    bounds = histogram.bounds
+    low = bounds[filled[0] - 1] if filled[0] > 0 else min(0.0, bounds[0])
+    high = bounds[min(filled[-1], len(bounds) - 1)]
+    return low, high
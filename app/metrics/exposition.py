@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+from prometheus_client import REGISTRY
+from prometheus_client.exposition import choose_encoder, gzip_accepted
+
+
+def get_cache_ttl() -> float:
+    """Return the /metrics response cache TTL in seconds.
+
+    Environment variables:
+        METRICS_CACHE_TTL: Seconds a rendered scrape is reused (default: 1).
+            Set to 0 to render on every scrape.
+    """
+    return max(float(os.environ.get("METRICS_CACHE_TTL", "1")), 0.0)
+
+
+class _ScrapeResponse:
+    """One rendered exposition body, with its ETag and a lazily built gzip copy."""
+
+    __slots__ = ("body", "etag", "expires_at", "_gzip_body", "_lock")
+
+    def __init__(self, body: bytes, expires_at: float):
+        self.body = body
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.expires_at = expires_at
+        self._gzip_body: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    def gzip_body(self) -> bytes:
+        if self._gzip_body is None:
+            with self._lock:
+                if self._gzip_body is None:
+                    self._gzip_body = gzip.compress(self.body)
+        return self._gzip_body
+
+
+class CachedMetricsApp:
+    """WSGI app serving a registry with a short-lived, shared response cache.
+
+    Drop-in replacement for prometheus_client's make_wsgi_app(). A rendered
+    body is reused by every scrape within the TTL, and when it expires only
+    one request re-renders it while concurrent scrapes wait for that result.
+    Responses carry a weak ETag so conditional scrapes get a 304, and gzip is
+    negotiated through Accept-Encoding with the compressed body cached too.
+    ``before_render`` is called before each render, e.g. to apply buffered
+    metrics.
+    """
+
+    def __init__(
+        self,
+        registry=REGISTRY,
+        ttl: float = 1.0,
+        disable_compression: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+        before_render: Optional[Callable[[], None]] = None,
+    ):
+        self._registry = registry
+        self._ttl = ttl
+        self._disable_compression = disable_compression
+        self._clock = clock
+        self._before_render = before_render
+        self._responses: Dict[str, _ScrapeResponse] = {}
+        self._render_locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        method = environ["REQUEST_METHOD"]
+        if method == "OPTIONS":
+            start_response("200 OK", [("Allow", "OPTIONS,GET,HEAD")])
+            return [b""]
+        if method not in ("GET", "HEAD"):
+            start_response("405 Method Not Allowed", [("Allow", "OPTIONS,GET,HEAD")])
+            return [f"# HTTP 405 Method Not Allowed: {method}; use OPTIONS or GET\n".encode()]
+
+        encoder, content_type = choose_encoder(environ.get("HTTP_ACCEPT"))
+        params = parse_qs(environ.get("QUERY_STRING", ""))
+        if "name[]" in params:
+            # Filtered scrapes are rare and vary per caller, so they bypass the cache
+            registry = self._registry.restricted_registry(params["name[]"])
+            self._render_hook()
+            response = _ScrapeResponse(encoder(registry), 0.0)
+        else:
+            response = self._get_response(encoder, content_type)
+
+        headers = [
+            ("Content-Type", content_type),
+            ("ETag", response.etag),
+            ("Vary", "Accept, Accept-Encoding"),
+        ]
+        if _etag_matches(environ.get("HTTP_IF_NONE_MATCH"), response.etag):
+            start_response("304 Not Modified", headers)
+            return [b""]
+
+        body = response.body
+        if not self._disable_compression and gzip_accepted(environ.get("HTTP_ACCEPT_ENCODING")):
+            body = response.gzip_body()
+            headers.append(("Content-Encoding", "gzip"))
+        headers.append(("Content-Length", str(len(body))))
+
+        start_response("200 OK", headers)
+        return [b"" if method == "HEAD" else body]
+
+    def _get_response(self, encoder, content_type: str) -> _ScrapeResponse:
+        response = self._responses.get(content_type)
+        if response is not None and response.expires_at > self._clock():
+            return response
+
+        with self._locks_lock:
+            render_lock = self._render_locks.setdefault(content_type, threading.Lock())
+
+        # Single flight: whoever holds the lock renders, everyone queued behind
+        # it picks up the fresh response instead of rendering again.
+        with render_lock:
+            response = self._responses.get(content_type)
+            if response is None or response.expires_at <= self._clock():
+                self._render_hook()
+                body = encoder(self._registry)
+                response = _ScrapeResponse(body, self._clock() + self._ttl)
+                self._responses[content_type] = response
+        return response
+
+    def _render_hook(self) -> None:
+        if self._before_render is not None:
+            self._before_render()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    opaque = etag[2:]
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == opaque:
+            return True
+    return False
@@ -0,0 +1,63 @@
+from array import array
+from bisect import bisect_left
+from typing import List, Sequence
+
+# Same default bounds as prometheus_client so both backends render identical buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Span export batch sizes, up to the largest default queue
+BATCH_SIZE_BUCKETS = (1.0, 16.0, 32.0, 64.0, 128.0, 256.0, 512.0, 1024.0, 2048.0)
+
+
+class BucketHistogram:
+    """Fixed-size histogram accumulator.
+
+    Keeps one non-cumulative count per bucket plus an overflow (+Inf) slot, a
+    total count and a running sum. Memory does not depend on how many values
+    are recorded; recording is a binary search over the bounds and reading is
+    a single pass over the buckets.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self._bounds = tuple(float(b) for b in buckets)
+        if list(self._bounds) != sorted(self._bounds):
+            raise ValueError("Histogram buckets must be in sorted order")
+        self._counts = array("Q", [0] * (len(self._bounds) + 1))
+        self._count = 0
+        self._sum = 0.0
+
+    @property
+    def bounds(self) -> tuple:
+        return self._bounds
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def record(self, value: float) -> None:
+        """Add a value; bucket bounds are inclusive upper limits, like Prometheus."""
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._count += 1
+        self._sum += value
+
+    def add_counts(self, counts: Sequence[int], total: float) -> None:
+        """Add non-cumulative per-bucket counts, +Inf last, whose values sum to ``total``."""
+        if len(counts) != len(self._counts):
+            raise ValueError("Expected one count per bucket plus +Inf")
+        for index, count in enumerate(counts):
+            self._counts[index] += count
+        self._count += sum(counts)
+        self._sum += total
+
+    def cumulative_counts(self) -> List[int]:
+        """Return cumulative counts per bound, with the +Inf count last."""
+        total = 0
+        cumulative = []
+        for count in self._counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
@@ -0,0 +1,98 @@
+import os
+import threading
+from typing import Callable, Dict, Generic, Tuple, TypeVar
+
+T = TypeVar("T")
+
+UNKNOWN = "unknown"
+OTHER = "other"
+UNMATCHED = "unmatched"
+
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", UNKNOWN))
+STATUS_CLASSES = frozenset(("1xx", "2xx", "3xx", "4xx", "5xx", UNKNOWN))
+
+
+def get_max_series() -> int:
+    """Return the maximum number of distinct (route, method) label sets.
+
+    Environment variables:
+        METRICS_MAX_SERIES: Label sets tracked before new ones are folded into
+            the 'other' route (default: 100)
+    """
+    return int(os.environ.get("METRICS_MAX_SERIES", "100"))
+
+
+def status_class(status_code: int) -> str:
+    """Return the status class label ('2xx', '4xx', ...) for an HTTP status code."""
+    if 100 <= status_code < 600:
+        return f"{status_code // 100}xx"
+    return OTHER
+
+
+def tally_statuses(statuses: Dict[int, int]) -> Tuple[Dict[str, int], int, int, int]:
+    """Split {status_code: count} into per-class counts and successful/4xx/5xx totals."""
+    by_class: Dict[str, int] = {}
+    successful = errors_4xx = errors_5xx = 0
+    for status_code, count in statuses.items():
+        cls = status_class(status_code)
+        by_class[cls] = by_class.get(cls, 0) + count
+        if status_code < 400:
+            successful += count
+        elif status_code < 500:
+            errors_4xx += count
+        else:
+            errors_5xx += count
+    return by_class, successful, errors_4xx, errors_5xx
+
+
+def normalize_method(method: str) -> str:
+    return method if method in METHODS else OTHER
+
+
+def normalize_status(status: str) -> str:
+    return status if status in STATUS_CLASSES else OTHER
+
+
+def request_labels() -> Tuple[str, str]:
+    """Return the (route template, method) labels of the current Flask request."""
+    from flask import request
+
+    rule = request.url_rule
+    return (rule.rule if rule is not None else UNMATCHED), request.method
+
+
+class LabelCache(Generic[T]):
+    """Cache of pre-resolved per-series objects with a hard cardinality limit.
+
+    Maps a (route, method) pair to whatever the backend builds for it (label
+    children, attribute dicts), so the hot path is a single dict lookup. Once
+    ``limit`` label sets exist, new routes share one 'other' series per
+    method; methods are normalized to a fixed set, so the total number of
+    series can never exceed ``limit + len(METHODS) + 1``.
+    """
+
+    def __init__(self, factory: Callable[[str, str], T], limit: int):
+        self._factory = factory
+        self._limit = limit
+        self._series: Dict[Tuple[str, str], T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, route: str, method: str) -> T:
+        try:
+            return self._series[(route, method)]
+        except KeyError:
+            return self._admit(route, method)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def _admit(self, route: str, method: str) -> T:
+        method = normalize_method(method)
+        with self._lock:
+            key = (route, method)
+            if key not in self._series and len(self._series) >= self._limit:
+                key = (OTHER, method)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = self._factory(*key)
+            return series
@@ -0,0 +1,118 @@
+import time
+from typing import Callable, TypeVar
+
+from app.metrics.base import MetricsBackend
+from app.metrics.exemplars import current_trace_context
+from app.metrics.labels import UNMATCHED
+
+F = TypeVar("F", bound=Callable)
+
+# WSGI environ keys the before_request hook uses to hand the matched route to the middleware
+ROUTE_KEY = "app.metrics.route"
+EXEMPT_KEY = "app.metrics.exempt"
+TRACE_KEY = "app.metrics.trace"
+
+
+def exempt(view: F) -> F:
+    """Mark a view function so its requests are not recorded."""
+    view._metrics_exempt = True  # type: ignore[attr-defined]
+    return view
+
+
+class RequestMetricsMiddleware:
+    """WSGI middleware recording every response exactly once.
+
+    Counts the request under its status class and records its duration from
+    the moment the app is called until the response body is sent, so
+    streamed responses, error pages and exceptions that escape Flask are all
+    accounted for. The route label is taken from ``environ[ROUTE_KEY]``
+    (set by init_request_metrics) and defaults to 'unmatched'. The request's
+    span has ended by the time the duration is known, so its trace context
+    is handed over in ``environ[TRACE_KEY]`` for exemplars.
+    """
+
+    def __init__(self, app, metrics: MetricsBackend, clock: Callable[[], float] = time.perf_counter):
+        self.app = app
+        self.metrics = metrics
+        self._clock = clock
+
+    def __call__(self, environ, start_response):
+        start = self._clock()
+        status = [500]
+
+        def _start_response(status_line, headers, exc_info=None):
+            status[0] = int(status_line[:3])
+            return start_response(status_line, headers, exc_info)
+
+        def record():
+            if not environ.get(EXEMPT_KEY):
+                self.metrics.record_request(
+                    environ.get(ROUTE_KEY, UNMATCHED),
+                    environ.get("REQUEST_METHOD", ""),
+                    status[0],
+                    self._clock() - start,
+                    trace_context=environ.get(TRACE_KEY),
+                )
+
+        try:
+            body = self.app(environ, _start_response)
+        except BaseException:
+            status[0] = 500
+            record()
+            raise
+        return _ClosingBody(body, record)
+
+
+class _ClosingBody:
+    """Response iterable that calls ``on_done`` once, when the body is exhausted or closed."""
+
+    __slots__ = ("_body", "_on_done", "_done")
+
+    def __init__(self, body, on_done: Callable[[], None]):
+        self._body = body
+        self._on_done = on_done
+        self._done = False
+
+    def __iter__(self):
+        yield from self._body
+        self._finish()
+
+    def close(self) -> None:
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._finish()
+
+    def _finish(self) -> None:
+        if not self._done:
+            self._done = True
+            self._on_done()
+
+
+def init_request_metrics(app, metrics: MetricsBackend) -> None:
+    """Record count, status and duration of every request to a Flask app.
+
+    Wraps ``app.wsgi_app`` in RequestMetricsMiddleware and registers a
+    before_request hook that labels the request with its URL rule, or
+    'unmatched' when routing failed, and with the trace context of its span
+    when exemplars are enabled. Views decorated with exempt() are not
+    recorded.
+    """
+    from flask import request
+
+    exemplars = metrics.exemplars_enabled
+
+    @app.before_request
+    def _label_request():
+        environ = request.environ
+        rule = request.url_rule
+        if rule is not None:
+            environ[ROUTE_KEY] = rule.rule
+            view = app.view_functions.get(rule.endpoint)
+            if getattr(view, "_metrics_exempt", False):
+                environ[EXEMPT_KEY] = True
+        if exemplars:
+            environ[TRACE_KEY] = current_trace_context()
+
+    app.wsgi_app = RequestMetricsMiddleware(app.wsgi_app, metrics)
@@ -0,0 +1,146 @@
+import glob
+import os
+from typing import TYPE_CHECKING, Optional
+
+from app.metrics.sketch import DDSketch
+
+if TYPE_CHECKING:
+    from prometheus_client import CollectorRegistry
+
+# Metric types whose per-worker files must outlive the worker so totals stay monotonic
+_ACCUMULATING_TYPES = ("counter", "histogram", "summary")
+_ARCHIVE_SUFFIX = "archive"
+# Serialized request duration sketches; not *.db so MultiProcessCollector ignores them
+_SKETCH_PREFIX = "request_sketch"
+
+
+def get_multiproc_dir() -> Optional[str]:
+    """Return the configured multiprocess directory, or None when disabled.
+
+    Environment variables:
+        PROMETHEUS_MULTIPROC_DIR: Directory holding the per-worker mmap files.
+            Must be set before the first metric is created in each worker.
+    """
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def is_multiprocess_enabled() -> bool:
+    """Return True when the Prometheus backend runs in multiprocess mode."""
+    return get_multiproc_dir() is not None
+
+
+def get_registry(path: Optional[str] = None) -> "CollectorRegistry":
+    """Return the registry that should be served on /metrics.
+
+    In multiprocess mode this is a dedicated registry whose collector merges the
+    mmap files of every live and dead worker on each collect. Otherwise the
+    global in-process registry is returned.
+    """
+    from prometheus_client import REGISTRY, CollectorRegistry, multiprocess
+
+    path = path or get_multiproc_dir()
+    if path is None:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    return registry
+
+
+def prepare_multiproc_dir(path: Optional[str] = None) -> None:
+    """Create the multiprocess directory and remove files left by a previous run.
+
+    Called once from the gunicorn master before any worker is forked.
+    """
+    path = path or get_multiproc_dir()
+    if path is None:
+        return
+
+    os.makedirs(path, exist_ok=True)
+    for db_file in glob.glob(os.path.join(path, "*.db")) + glob.glob(os.path.join(path, f"{_SKETCH_PREFIX}_*.bin")):
+        os.remove(db_file)
+
+
+def mark_worker_dead(pid: int, path: Optional[str] = None) -> None:
+    """Clean up after a dead worker.
+
+    Live gauges of the worker are dropped, and its counter, histogram and
+    summary files are folded into one archive file per type so the number of
+    files read on every scrape does not grow with worker restarts.
+    """
+    path = path or get_multiproc_dir()
+    if path is None:
+        return
+
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(pid, path)
+
+    for metric_type in _ACCUMULATING_TYPES:
+        worker_file = os.path.join(path, f"{metric_type}_{pid}.db")
+        if os.path.exists(worker_file):
+            _fold_into_archive(worker_file, os.path.join(path, f"{metric_type}_{_ARCHIVE_SUFFIX}.db"))
+
+    sketch_file = os.path.join(path, f"{_SKETCH_PREFIX}_{pid}.bin")
+    if os.path.exists(sketch_file):
+        archive_file = os.path.join(path, f"{_SKETCH_PREFIX}_{_ARCHIVE_SUFFIX}.bin")
+        archive = _read_sketch(archive_file) if os.path.exists(archive_file) else None
+        sketch = _read_sketch(sketch_file)
+        if archive is not None:
+            sketch.merge(archive)
+        _write_file(archive_file, sketch.to_bytes())
+        os.remove(sketch_file)
+
+
+def write_sketch(sketch: DDSketch, path: Optional[str] = None) -> None:
+    """Publish this worker's request duration sketch for read_merged_sketch()."""
+    path = path or get_multiproc_dir()
+    if path is not None:
+        _write_file(os.path.join(path, f"{_SKETCH_PREFIX}_{os.getpid()}.bin"), sketch.to_bytes())
+
+
+def read_merged_sketch(path: Optional[str] = None, relative_accuracy: float = 0.01) -> DDSketch:
+    """Return the merge of every live and archived worker sketch."""
+    path = path or get_multiproc_dir()
+    merged = DDSketch(relative_accuracy)
+    if path is None:
+        return merged
+    for sketch_file in glob.glob(os.path.join(path, f"{_SKETCH_PREFIX}_*.bin")):
+        try:
+            merged.merge(_read_sketch(sketch_file))
+        except FileNotFoundError:
+            # Folded into the archive since the glob, which is read separately
+            continue
+    return merged
+
+
+def _read_sketch(sketch_file: str) -> DDSketch:
+    with open(sketch_file, "rb") as f:
+        return DDSketch.from_bytes(f.read())
+
+
+def _write_file(target: str, data: bytes) -> None:
+    """Replace target atomically so readers never see a partial file."""
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, target)
+
+
+def _fold_into_archive(worker_file: str, archive_file: str) -> None:
+    """Add every value of worker_file into archive_file, then remove worker_file.
+
+    Keys are copied verbatim, so the archive is read by MultiProcessCollector
+    exactly like a worker file. Histogram buckets are stored non-cumulatively
+    per worker, which makes plain addition correct for every type here.
+    """
+    from prometheus_client.mmap_dict import MmapedDict
+
+    archive = MmapedDict(archive_file)
+    try:
+        for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(worker_file):
+            current, _ = archive.read_value(key)
+            archive.write_value(key, current + value, timestamp)
+    finally:
+        archive.close()
+    os.remove(worker_file)
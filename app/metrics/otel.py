@@ -1,53 +1,219 @@
 import os
 import time
 from contextlib import contextmanager
-from typing import Iterator
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Sequence
 
-from opentelemetry import metrics
-from opentelemetry.sdk.metrics import MeterProvider
-from opentelemetry.sdk.metrics.export import (
-    ConsoleMetricExporter,
-    PeriodicExportingMetricReader,
-)
+from opentelemetry import context as otel_context
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import ExemplarFilter, MeterProvider
+from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, InMemoryMetricReader
 from opentelemetry.sdk.resources import Resource, SERVICE_NAME
 
 from app.metrics.base import MetricsBackend
+from app.metrics.exemplars import TraceContext
+from app.metrics.export import (
+    AdaptiveMetricReader,
+    RestoredMetrics,
+    SharedMetricReader,
+    get_changed_only_export,
+    get_metric_export_interval,
+    get_metric_export_max_interval,
+    get_metric_temporality,
+    metric_state,
+    preferred_temporality,
+    read_shared_metrics,
+)
+from app.metrics.histogram import BATCH_SIZE_BUCKETS, DEFAULT_BUCKETS, BucketHistogram
+from app.metrics.labels import UNKNOWN, LabelCache, get_max_series, normalize_status, tally_statuses
+from app.metrics.otel_multiprocess import get_publish_interval, is_otel_multiprocess_enabled
+from app.metrics.persistence import get_snapshot_path
+from app.metrics.sharded import ShardedCounters
+from app.metrics.sketch import DDSketch, quantile_summary
+from app.tracing import (
+    get_metrics_exporter_type,
+    get_otlp_endpoint,
+    get_otlp_http_session,
+    otlp_grpc_compression,
+    otlp_http_compression,
+)
 
+if TYPE_CHECKING:
+    from app.metrics.persistence import MetricState
 
-def _create_metric_reader():
+
+def _create_metric_reader(registry=None):
     """Create the appropriate metric reader based on configuration.
 
+    Returns None when export is disabled; values are then only kept locally
+    for get_metrics_summary(). With 'prometheus' nothing is pushed: the
+    reader registers with the prometheus_client ``registry`` and collects
+    the meter provider whenever the registry is scraped.
+
     Environment variables:
-        OTEL_EXPORTER: 'console' (default) or 'otlp'
-        OTEL_EXPORTER_OTLP_ENDPOINT: OTLP endpoint URL (default: http://localhost:4317)
-        OTEL_EXPORTER_OTLP_INSECURE: Set to 'true' for insecure connection
+        OTEL_METRICS_EXPORTER: 'console', 'otlp', 'otlp_http', 'prometheus'
+            or 'none' (default: OTEL_EXPORTER), see
+            app.tracing.get_metrics_exporter_type()
+        OTEL_EXPORTER_OTLP_ENDPOINT: OTLP endpoint URL, see app.tracing.get_otlp_endpoint()
+        OTEL_EXPORTER_OTLP_INSECURE: Set to 'true' for insecure gRPC connection
+        OTEL_EXPORTER_OTLP_COMPRESSION: See app.tracing.get_otlp_compression()
+        OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE, OTEL_METRIC_EXPORT_*:
+            See app.metrics.export
     """
-    exporter_type = os.environ.get("OTEL_EXPORTER", "console").lower()
+    exporter_type = get_metrics_exporter_type()
 
+    if exporter_type == "none":
+        return None
+    if exporter_type == "prometheus":
+        from opentelemetry.exporter.prometheus import PrometheusMetricReader
+        from prometheus_client import CollectorRegistry
+
+        # Without target_info and otel_scope_* labels, series match the Prometheus backend's
+        return PrometheusMetricReader(
+            disable_target_info=True,
+            scope_info_enabled=False,
+            registry=registry if registry is not None else CollectorRegistry(),
+        )
+    temporality = preferred_temporality(get_metric_temporality())
     if exporter_type == "otlp":
         from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
 
-        endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
         insecure = os.environ.get("OTEL_EXPORTER_OTLP_INSECURE", "true").lower() == "true"
 
-        exporter = OTLPMetricExporter(endpoint=endpoint, insecure=insecure)
+        exporter = OTLPMetricExporter(
+            endpoint=get_otlp_endpoint(exporter_type), insecure=insecure, compression=otlp_grpc_compression(),
+            preferred_temporality=temporality,
+        )
+    elif exporter_type == "otlp_http":
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+
+        # Shares the keep-alive connection pool of the span exporter
+        exporter = OTLPMetricExporter(
+            endpoint=f"{get_otlp_endpoint(exporter_type).rstrip('/')}/v1/metrics",
+            compression=otlp_http_compression(),
+            session=get_otlp_http_session(),
+            preferred_temporality=temporality,
+        )
     else:
-        exporter = ConsoleMetricExporter()
+        exporter = ConsoleMetricExporter(preferred_temporality=temporality)
+
+    return AdaptiveMetricReader(
+        exporter,
+        interval=get_metric_export_interval(),
+        max_interval=get_metric_export_max_interval(),
+        changed_only=get_changed_only_export(),
+    )
+
+
+_EXEMPLAR_KEY = otel_context.create_key("app.metrics.exemplar")
+_SAMPLED = trace.TraceFlags(trace.TraceFlags.SAMPLED)
+
+
+class _SelectedExemplarFilter(ExemplarFilter):
+    """Admits only measurements recorded with _exemplar_context().
+
+    The SDK's default filter offers every measurement made inside a sampled
+    span to the exemplar reservoir; the backend's ExemplarSampler has
+    already chosen the few that should carry one.
+    """
+
+    def should_sample(self, value, time_unix_nano, attributes, context) -> bool:
+        return bool(context.get(_EXEMPLAR_KEY))
 
-    return PeriodicExportingMetricReader(exporter, export_interval_millis=10000)
+
+def _exemplar_context(exemplar: TraceContext):
+    span_context = trace.SpanContext(exemplar[0], exemplar[1], is_remote=False, trace_flags=_SAMPLED)
+    span_in_context = trace.set_span_in_context(trace.NonRecordingSpan(span_context))
+    return otel_context.set_value(_EXEMPLAR_KEY, True, span_in_context)
+
+
+_SAMPLING_ATTRIBUTES = {decision: {"decision": decision} for decision in ("sampled", "dropped")}
+_DROPPED_ATTRIBUTES = {reason: {"reason": reason} for reason in ("queue_full", "export_failed")}
+
+# Restored counters: (name of the local total, label order of its key)
+_LOCAL_COUNTERS = {
+    "http_successful_request": ("http_successful_request", ("route", "method")),
+    "http_requests": ("http_requests", ("route", "method", "status")),
+    "http_error_4xx": ("http_4xx_errors", ("route", "method")),
+    "http_error_5xx": ("http_5xx_errors", ("route", "method")),
+    "trace_sampling_decisions": ("trace_sampling_decisions", ("decision",)),
+    "spans_dropped": ("spans_dropped", ("reason",)),
+}
+
+
+class _OTelSeries:
+    """Pre-built attributes and local counter keys of one (route, method) pair."""
+
+    __slots__ = ("attributes", "successful_key", "errors_4xx_key", "errors_5xx_key", "_requests")
+
+    def __init__(self, route: str, method: str):
+        self.attributes = {"route": route, "method": method}
+        self.successful_key = ("http_successful_request", route, method)
+        self.errors_4xx_key = ("http_4xx_errors", route, method)
+        self.errors_5xx_key = ("http_5xx_errors", route, method)
+        self._requests = {}
+
+    def requests(self, status: str) -> tuple:
+        """Return (attributes, counter key) of http_requests for a status class."""
+        status = normalize_status(status)
+        entry = self._requests.get(status)
+        if entry is None:
+            route, method = self.attributes["route"], self.attributes["method"]
+            entry = self._requests[status] = (
+                {"route": route, "method": method, "status": status},
+                ("http_requests", route, method, status),
+            )
+        return entry
 
 
 class OTelMetrics(MetricsBackend):
-    """OpenTelemetry-based metrics implementation."""
+    """OpenTelemetry-based metrics implementation.
+
+    With OTEL_METRICS_EXPORTER=prometheus, ``registry`` is the prometheus_client
+    registry create_app() serves at /metrics; it is None otherwise.
+
+    With OTEL_MULTIPROC_DIR set, push exporters are not created in every
+    worker: values are published to the shared directory and exported by
+    one elected worker (SharedMetricReader). get_metrics_summary() still
+    reports this worker's own values.
+
+    With METRICS_SNAPSHOT_PATH set, an extra in-memory reader keeps the
+    cumulative totals export_state() reads, so snapshots never take values
+    from a delta exporter.
+    """
 
     def __init__(self, service_name: str = "prom-metrics-app"):
+        super().__init__()
         resource = Resource(attributes={SERVICE_NAME: service_name})
 
-        reader = _create_metric_reader()
-        provider = MeterProvider(resource=resource, metric_readers=[reader])
-        metrics.set_meter_provider(provider)
+        self.registry = None
+        if get_metrics_exporter_type() == "prometheus":
+            from prometheus_client import CollectorRegistry, GCCollector, PlatformCollector, ProcessCollector
 
-        self._meter = metrics.get_meter(__name__)
+            # Same process and runtime series as prometheus_client's default registry
+            self.registry = CollectorRegistry()
+            for collector in (ProcessCollector, PlatformCollector, GCCollector):
+                collector(registry=self.registry)
+        if self.registry is None and get_metrics_exporter_type() != "none" and is_otel_multiprocess_enabled():
+            # Workers publish to shared memory; one elected worker exports the pod's totals
+            reader = SharedMetricReader(resource, _create_metric_reader, interval=get_publish_interval())
+        else:
+            reader = _create_metric_reader(self.registry)
+        readers = [reader] if reader is not None else []
+        self._resource = resource
+        self._shared_reader = reader if isinstance(reader, SharedMetricReader) else None
+        self._state_reader = None
+        if get_snapshot_path() is not None and self._shared_reader is None:
+            self._state_reader = InMemoryMetricReader()
+            readers.append(self._state_reader)
+        provider = MeterProvider(
+            resource=resource,
+            metric_readers=readers,
+            exemplar_filter=_SelectedExemplarFilter(),
+        )
+        metrics.set_meter_provider(provider)
+        # The global provider can only be set once per process; the backend records into its own either way
+        self._provider = provider
+        self._meter = provider.get_meter(__name__)
 
         self._http_successful_request = self._meter.create_counter(
             name="http_successful_request",
@@ -73,51 +239,225 @@ class OTelMetrics(MetricsBackend):
             name="request_processing_seconds",
             description="Time spent processing request",
             unit="s",
+            explicit_bucket_boundaries_advisory=DEFAULT_BUCKETS,
         )
 
-        # Track values locally for get_metrics_summary since OTel doesn't expose values directly
-        self._counters = {
-            "http_successful_request": 0,
-            "http_requests": 0,
-            "http_4xx_errors": 0,
-            "http_5xx_errors": 0,
-        }
-        self._histogram_values = []
+        self._task_queue_depth = self._meter.create_gauge(
+            name="task_queue_depth",
+            description="Tasks waiting for an executor worker",
+            unit="1",
+        )
+        self._tasks_running = self._meter.create_gauge(
+            name="tasks_running",
+            description="Tasks currently running",
+            unit="1",
+        )
+        self._task_queue_wait_histogram = self._meter.create_histogram(
+            name="task_queue_wait_seconds",
+            description="Time tasks spent queued before starting",
+            unit="s",
+            explicit_bucket_boundaries_advisory=DEFAULT_BUCKETS,
+        )
+        self._trace_sampling = self._meter.create_counter(
+            name="trace_sampling_decisions",
+            description="Trace sampling decisions",
+            unit="1",
+        )
+        self._span_queue_size = self._meter.create_gauge(
+            name="span_queue_size",
+            description="Finished spans waiting to be exported",
+            unit="1",
+        )
+        self._span_export_histogram = self._meter.create_histogram(
+            name="span_export_seconds",
+            description="Time spent exporting a batch of spans",
+            unit="s",
+            explicit_bucket_boundaries_advisory=DEFAULT_BUCKETS,
+        )
+        self._span_batch_histogram = self._meter.create_histogram(
+            name="span_export_batch_size",
+            description="Spans per export",
+            unit="1",
+            explicit_bucket_boundaries_advisory=BATCH_SIZE_BUCKETS,
+        )
+        self._spans_dropped = self._meter.create_counter(
+            name="spans_dropped",
+            description="Spans dropped by the span pipeline",
+            unit="1",
+        )
+
+        # Track values locally for get_metrics_summary since OTel doesn't expose values directly.
+        # Sharded per thread/greenlet so concurrent handlers never lose increments.
+        self._counters = ShardedCounters()
+        self._histogram = BucketHistogram()
+        self._sketch = DDSketch()
+        self._task_gauges = {"task_queue_depth": 0, "tasks_running": 0}
+        self._task_queue_wait = BucketHistogram()
+        self._span_queue = 0
+        self._span_export = BucketHistogram()
+        self._exported_spans = 0
 
-    def inc_requests(self) -> None:
-        self._http_requests.add(1)
-        self._counters["http_requests"] += 1
+        # Attributes are built once per (route, method) so the hot path never allocates them
+        self._series = LabelCache(_OTelSeries, get_max_series())
 
-    def inc_successful(self) -> None:
-        self._http_successful_request.add(1)
-        self._counters["http_successful_request"] += 1
+    def inc_requests(self, route: str = UNKNOWN, method: str = UNKNOWN, status: str = UNKNOWN) -> None:
+        attributes, key = self._series.get(route, method).requests(status)
+        self._http_requests.add(1, attributes)
+        self._counters.inc(key)
+        self._windows.add(requests=1)
 
-    def inc_4xx(self) -> None:
-        self._http_4xx_errors.add(1)
-        self._counters["http_4xx_errors"] += 1
+    def inc_successful(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
+        series = self._series.get(route, method)
+        self._http_successful_request.add(1, series.attributes)
+        self._counters.inc(series.successful_key)
 
-    def inc_5xx(self) -> None:
-        self._http_5xx_errors.add(1)
-        self._counters["http_5xx_errors"] += 1
+    def inc_4xx(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
+        series = self._series.get(route, method)
+        self._http_4xx_errors.add(1, series.attributes)
+        self._counters.inc(series.errors_4xx_key)
+
+    def inc_5xx(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
+        series = self._series.get(route, method)
+        self._http_5xx_errors.add(1, series.attributes)
+        self._counters.inc(series.errors_5xx_key)
+        self._windows.add(errors=1)
 
     @contextmanager
-    def time_request(self) -> Iterator[None]:
+    def time_request(self, route: str = UNKNOWN, method: str = UNKNOWN) -> Iterator[None]:
         start_time = time.perf_counter()
         try:
             yield
         finally:
-            duration = time.perf_counter() - start_time
-            self._http_request_time_histogram.record(duration)
-            self._histogram_values.append(duration)
+            self.observe_request(route, method, time.perf_counter() - start_time)
+
+    def observe_request(
+        self, route: str, method: str, seconds: float, exemplar: Optional[TraceContext] = None
+    ) -> None:
+        if exemplar is None:
+            exemplar = self._sample_exemplar(seconds)
+        attributes = self._series.get(route, method).attributes
+        if exemplar is None:
+            self._http_request_time_histogram.record(seconds, attributes)
+        else:
+            self._http_request_time_histogram.record(seconds, attributes, _exemplar_context(exemplar))
+        self._histogram.record(seconds)
+        self._sketch.add(seconds)
+        self._windows.add(latency_count=1, latency_sum=seconds)
+
+    def record_batch(self, route: str, method: str, statuses: Dict[int, int], durations: Sequence[float]) -> None:
+        series = self._series.get(route, method)
+        by_class, successful, errors_4xx, errors_5xx = tally_statuses(statuses)
+        self._windows.add(sum(by_class.values()), errors_5xx, len(durations), sum(durations))
+        for status, count in by_class.items():
+            attributes, key = series.requests(status)
+            self._http_requests.add(count, attributes)
+            self._counters.inc(key, count)
+        for counter, key, count in (
+            (self._http_successful_request, series.successful_key, successful),
+            (self._http_4xx_errors, series.errors_4xx_key, errors_4xx),
+            (self._http_5xx_errors, series.errors_5xx_key, errors_5xx),
+        ):
+            if count:
+                counter.add(count, series.attributes)
+                self._counters.inc(key, count)
+        # The SDK has no bulk record, so only the counters are merged
+        for seconds in durations:
+            self._http_request_time_histogram.record(seconds, series.attributes)
+            self._histogram.record(seconds)
+        self._sketch.add_many(durations)
+
+    def set_task_queue_depth(self, depth: int) -> None:
+        self._task_queue_depth.set(depth)
+        self._task_gauges["task_queue_depth"] = depth
+
+    def set_tasks_running(self, count: int) -> None:
+        self._tasks_running.set(count)
+        self._task_gauges["tasks_running"] = count
+
+    def observe_task_queue_wait(self, seconds: float) -> None:
+        self._task_queue_wait_histogram.record(seconds)
+        self._task_queue_wait.record(seconds)
+
+    def observe_trace_sampling(self, sampled: bool) -> None:
+        decision = "sampled" if sampled else "dropped"
+        self._trace_sampling.add(1, _SAMPLING_ATTRIBUTES[decision])
+        self._counters.inc(("trace_sampling_decisions", decision))
+
+    def set_span_queue_size(self, size: int) -> None:
+        self._span_queue_size.set(size)
+        self._span_queue = size
+
+    def observe_span_export(self, batch_size: int, seconds: float) -> None:
+        self._span_export_histogram.record(seconds)
+        self._span_batch_histogram.record(batch_size)
+        # Only the span export thread records exports, so the local totals need no lock
+        self._span_export.record(seconds)
+        self._exported_spans += batch_size
+
+    def inc_spans_dropped(self, count: int, reason: str) -> None:
+        self._spans_dropped.add(count, _DROPPED_ATTRIBUTES[reason])
+        self._counters.inc(("spans_dropped", reason), count)
+
+    def export_state(self) -> Optional["MetricState"]:
+        """Return the totals of every counter and histogram series.
+
+        With OTEL_MULTIPROC_DIR set the totals are merged across all gunicorn
+        workers. Returns None when METRICS_SNAPSHOT_PATH was not set when
+        the backend was created.
+        """
+        self.flush()
+        if self._shared_reader is not None:
+            # Publish this worker's latest values first
+            self._shared_reader.collect()
+            data = read_shared_metrics(self._resource)
+        elif self._state_reader is not None:
+            data = self._state_reader.get_metrics_data()
+        else:
+            return None
+        return metric_state(data, self._start_time)
+
+    def restore_state(self, state: "MetricState") -> None:
+        """Add restored totals to what cumulative readers collect and to the local summary."""
+        instruments = {
+            instrument.name: (kind, instrument.description, instrument.unit)
+            for kind, group in (
+                ("counter", (self._http_successful_request, self._http_requests, self._http_4xx_errors,
+                             self._http_5xx_errors, self._trace_sampling, self._spans_dropped)),
+                ("histogram", (self._http_request_time_histogram, self._task_queue_wait_histogram,
+                               self._span_export_histogram, self._span_batch_histogram)),
+            )
+            for instrument in group
+        }
+        restored = RestoredMetrics(state, instruments, self._resource, __name__)
+        for reader in self._provider._metric_readers:
+            restored.attach(reader)
+
+        for (name, labels), value in state.counters.items():
+            local_name, label_names = _LOCAL_COUNTERS.get(name, (None, ()))
+            labels = dict(labels)
+            if local_name is not None and labels.keys() == set(label_names):
+                self._counters.inc((local_name,) + tuple(labels[label] for label in label_names), value)
+        local_histograms = {
+            "request_processing_seconds": self._histogram,
+            "task_queue_wait_seconds": self._task_queue_wait,
+            "span_export_seconds": self._span_export,
+        }
+        for (name, _), histogram in state.histograms.items():
+            local = local_histograms.get(name)
+            if local is not None and local.bounds == histogram.bounds:
+                local.add_counts(histogram.counts, histogram.sum)
+            elif name == "span_export_batch_size":
+                self._exported_spans += int(histogram.sum)
+        self._start_time = min(self._start_time, state.start_time)
 
     def get_metrics_summary(self) -> dict:
         """Return current metric values for display."""
-        # Calculate histogram buckets similar to Prometheus
-        buckets = [0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0]
+        self.flush()
+        # Render histogram buckets similar to Prometheus
         histogram_buckets = []
+        cumulative = self._histogram.cumulative_counts()
 
-        for le in buckets:
-            count = sum(1 for v in self._histogram_values if v <= le)
+        for le, count in zip(self._histogram.bounds, cumulative):
             histogram_buckets.append({
                 "name": "request_processing_seconds_bucket",
                 "le": str(le),
@@ -128,37 +468,85 @@ class OTelMetrics(MetricsBackend):
         histogram_buckets.append({
             "name": "request_processing_seconds_bucket",
             "le": "+Inf",
-            "value": float(len(self._histogram_values)),
+            "value": float(cumulative[-1]),
         })
 
         # Count and sum
         histogram_buckets.append({
             "name": "request_processing_seconds_count",
             "le": "",
-            "value": float(len(self._histogram_values)),
+            "value": float(self._histogram.count),
         })
         histogram_buckets.append({
             "name": "request_processing_seconds_sum",
             "le": "",
-            "value": sum(self._histogram_values) if self._histogram_values else 0.0,
+            "value": self._histogram.sum,
         })
 
-        return {
+        # Local counters are keyed by (name, route, method[, status]); sum them per name
+        counters = {}
+        sampling = {"sampled": 0, "dropped": 0}
+        spans_dropped = {}
+        requests_by_route = []
+        for key, value in self._counters.values().items():
+            counters[key[0]] = counters.get(key[0], 0) + value
+            if key[0] == "trace_sampling_decisions":
+                sampling[key[1]] = value
+            elif key[0] == "spans_dropped":
+                spans_dropped[key[1]] = float(value)
+            elif key[0] == "http_requests":
+                requests_by_route.append({
+                    "route": key[1],
+                    "method": key[2],
+                    "status": key[3],
+                    "value": float(value),
+                })
+        requests_by_route.sort(key=lambda r: (r["route"], r["method"], r["status"]))
+
+        summary = {
             "http_successful_request": {
                 "name": "http_successful_request",
-                "value": float(self._counters["http_successful_request"]),
+                "value": float(counters.get("http_successful_request", 0)),
             },
             "http_requests": {
                 "name": "http_requests",
-                "value": float(self._counters["http_requests"]),
+                "value": float(counters.get("http_requests", 0)),
             },
             "http_4xx_errors": {
                 "name": "http_error_4xx",
-                "value": float(self._counters["http_4xx_errors"]),
+                "value": float(counters.get("http_4xx_errors", 0)),
             },
             "http_5xx_errors": {
                 "name": "http_error_5xx",
-                "value": float(self._counters["http_5xx_errors"]),
+                "value": float(counters.get("http_5xx_errors", 0)),
             },
             "histogram_buckets": histogram_buckets,
+            "request_quantiles": quantile_summary("request_processing_seconds", self._sketch),
+            "request_exemplars": self._exemplar_summary("request_processing_seconds"),
+            "request_windows": self._windows.summary(),
+            "requests_by_route": requests_by_route,
+            "task_queue_depth": {
+                "name": "task_queue_depth",
+                "value": float(self._task_gauges["task_queue_depth"]),
+            },
+            "tasks_running": {
+                "name": "tasks_running",
+                "value": float(self._task_gauges["tasks_running"]),
+            },
+            "task_queue_wait": {
+                "name": "task_queue_wait_seconds",
+                "count": float(self._task_queue_wait.count),
+                "sum": self._task_queue_wait.sum,
+            },
+            "trace_sampling": self._trace_sampling_summary(
+                "trace_sampling_decisions", float(sampling["sampled"]), float(sampling["dropped"])
+            ),
         }
+        summary.update(self._span_pipeline_summary(
+            float(self._span_queue),
+            float(self._span_export.count),
+            self._span_export.sum,
+            float(self._exported_spans),
+            spans_dropped,
+        ))
+        return summary
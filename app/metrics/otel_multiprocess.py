@@ -0,0 +1,165 @@
+import fcntl
+import glob
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+# Worker files are otel_<pid>.db; dead workers' sums and histograms are folded into otel_archive.db
+_PREFIX = "otel"
+_ARCHIVE_SUFFIX = "archive"
+# Held by the worker that exports for the whole pod
+_LEADER_LOCK = "leader.lock"
+# Held shared while values are read, exclusive while a dead worker's file is folded
+_MERGE_LOCK = "merge.lock"
+# Histogram fields combined by min/max instead of addition
+_COMBINE = {"min": min, "max": max}
+
+
+def get_otel_multiproc_dir() -> Optional[str]:
+    """Return the directory workers share OTel metric values through, or None when disabled.
+
+    Environment variables:
+        OTEL_MULTIPROC_DIR: Directory holding the per-worker mmap files; a
+            tmpfs such as /dev/shm keeps them in memory. When set, one
+            elected worker exports the values of every worker.
+    """
+    return os.environ.get("OTEL_MULTIPROC_DIR") or None
+
+
+def is_otel_multiprocess_enabled() -> bool:
+    """Return True when OTel metrics are aggregated across workers."""
+    return get_otel_multiproc_dir() is not None
+
+
+def get_publish_interval() -> float:
+    """Return the seconds between writes of a worker's values to the shared directory.
+
+    Environment variables:
+        OTEL_MULTIPROC_PUBLISH_INTERVAL: Milliseconds (default: 1000)
+    """
+    return max(float(os.environ.get("OTEL_MULTIPROC_PUBLISH_INTERVAL", "1000")), 1.0) / 1000
+
+
+def prepare_otel_multiproc_dir(path: Optional[str] = None) -> None:
+    """Create the shared directory and remove values left by a previous run.
+
+    Called once from the gunicorn master before any worker is forked.
+    """
+    path = path or get_otel_multiproc_dir()
+    if path is None:
+        return
+
+    os.makedirs(path, exist_ok=True)
+    for db_file in glob.glob(os.path.join(path, f"{_PREFIX}_*.db")):
+        os.remove(db_file)
+
+
+def worker_file(path: str, pid: Optional[int] = None) -> str:
+    """Return the mmap file a worker writes its values to."""
+    return os.path.join(path, f"{_PREFIX}_{pid or os.getpid()}.db")
+
+
+def acquire_leader_lock(path: str) -> Optional[int]:
+    """Return a descriptor holding the exporter lock, or None while another worker holds it.
+
+    The lock is released when the descriptor is closed, including when the
+    holding worker dies.
+    """
+    fd = os.open(os.path.join(path, _LEADER_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def series_key(scope: str, kind: str, name: str, unit: str, description: str, attributes: list, field: str) -> str:
+    """Return the mmap key of one field of a data point.
+
+    ``kind`` is 'counter', 'updowncounter', 'gauge' or 'histogram'. A
+    histogram point is stored as its 'count', 'sum', 'min', 'max' and one
+    'le:<bound>' field per bucket; the others as a single 'value'.
+    """
+    return json.dumps([scope, kind, name, unit, description, attributes, field])
+
+
+def read_merged_values(path: Optional[str] = None) -> Dict[str, Tuple[float, float]]:
+    """Return {key: (value, start time)} combined over every live and archived worker.
+
+    Sums, histogram counts and buckets are added, histogram min and max
+    combined, and gauges summed over the live workers. The start time is
+    the earliest of any worker, so totals stay continuous across workers.
+    """
+    path = path or get_otel_multiproc_dir()
+    merged: Dict[str, Tuple[float, float]] = {}
+    if path is None:
+        return merged
+    with _merge_lock(path, fcntl.LOCK_SH):
+        for db_file in glob.glob(os.path.join(path, f"{_PREFIX}_*.db")):
+            for key, value, start in _read_values(db_file):
+                _combine(merged, key, value, start)
+    return merged
+
+
+def mark_worker_dead(pid: int, path: Optional[str] = None) -> None:
+    """Fold a dead worker's sums and histograms into the archive and drop its gauges."""
+    path = path or get_otel_multiproc_dir()
+    if path is None:
+        return
+    dead_file = worker_file(path, pid)
+    if not os.path.exists(dead_file):
+        return
+
+    from prometheus_client.mmap_dict import MmapedDict
+
+    archive_file = os.path.join(path, f"{_PREFIX}_{_ARCHIVE_SUFFIX}.db")
+    with _merge_lock(path, fcntl.LOCK_EX):
+        merged: Dict[str, Tuple[float, float]] = {}
+        for db_file in (archive_file, dead_file):
+            for key, value, start in _read_values(db_file):
+                if json.loads(key)[1] != "gauge":
+                    _combine(merged, key, value, start)
+        archive = MmapedDict(archive_file)
+        try:
+            for key, (value, start) in merged.items():
+                archive.write_value(key, value, start)
+        finally:
+            archive.close()
+        os.remove(dead_file)
+
+
+def _read_values(db_file: str) -> Iterator[Tuple[str, float, float]]:
+    from prometheus_client.mmap_dict import MmapedDict
+
+    try:
+        values = MmapedDict.read_all_values_from_file(db_file)
+    except FileNotFoundError:
+        return
+    for key, value, start, _ in values:
+        yield key, value, start
+
+
+def _combine(merged: Dict[str, Tuple[float, float]], key: str, value: float, start: float) -> None:
+    current = merged.get(key)
+    if current is None:
+        merged[key] = (value, start)
+        return
+    combine = _COMBINE.get(json.loads(key)[-1])
+    starts = [s for s in (current[1], start) if s]
+    merged[key] = (
+        combine(current[0], value) if combine else current[0] + value,
+        min(starts) if starts else 0.0,
+    )
+
+
+@contextmanager
+def _merge_lock(path: str, operation: int) -> Iterator[None]:
+    """Keep readers from seeing a dead worker's values both in its file and in the archive."""
+    fd = os.open(os.path.join(path, _MERGE_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, operation)
+        yield
+    finally:
+        os.close(fd)
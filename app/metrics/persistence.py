@@ -0,0 +1,397 @@
+import atexit
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    from app.metrics.base import MetricsBackend
+
+logger = logging.getLogger(__name__)
+
+_persister_instance: Optional["MetricsPersister"] = None
+
+# (metric name, sorted (label, value) pairs)
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+FORMAT_VERSION = 1
+_MAGIC = b"PMSN"
+# magic, format version, slot capacity
+_FILE_HEADER = struct.Struct("<4sHxxI")
+# generation, written at, run id, payload length, crc32 of everything after the crc field
+_SLOT_HEADER = struct.Struct("<IQd16sI")
+_INITIAL_SLOT_SIZE = 1 << 16
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+_SERIES = struct.Struct("<IB")
+_LABEL = struct.Struct("<II")
+
+
+def get_snapshot_path() -> Optional[str]:
+    """Return the file metric state is persisted to, or None when persistence is off.
+
+    Environment variables:
+        METRICS_SNAPSHOT_PATH: File counter and histogram totals are written
+            to and restored from on startup (default: not set)
+    """
+    return os.environ.get("METRICS_SNAPSHOT_PATH") or None
+
+
+def get_snapshot_interval() -> float:
+    """Return the seconds between snapshots.
+
+    Environment variables:
+        METRICS_SNAPSHOT_INTERVAL: Seconds (default: 30, minimum 1)
+    """
+    return max(float(os.environ.get("METRICS_SNAPSHOT_INTERVAL", "30")), 1.0)
+
+
+class HistogramState(NamedTuple):
+    bounds: Tuple[float, ...]
+    # One count per bucket, not cumulative, with the +Inf bucket last
+    counts: Tuple[int, ...]
+    sum: float
+
+
+class MetricState(NamedTuple):
+    """Counter and histogram totals of a backend, keyed by metric name and labels.
+
+    Names and labels are those both backends expose, so state saved by one
+    backend restores into the other. ``start_time`` is when the totals
+    started counting, in seconds since the epoch.
+    """
+
+    counters: Dict[SeriesKey, float]
+    histograms: Dict[SeriesKey, HistogramState]
+    start_time: float
+
+
+def encode_state(state: MetricState) -> bytes:
+    """Return the compact binary form of a MetricState.
+
+    Names, label keys and label values are stored once in a string table and
+    referenced by index, and histogram bounds once per distinct tuple; the
+    result is zlib-compressed.
+    """
+    strings: Dict[str, int] = {}
+    bounds_table: Dict[Tuple[float, ...], int] = {}
+
+    def string(value: str) -> int:
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    def series(key: SeriesKey) -> bytes:
+        name, labels = key
+        parts = [_SERIES.pack(string(name), len(labels))]
+        parts.extend(_LABEL.pack(string(label), string(str(value))) for label, value in labels)
+        return b"".join(parts)
+
+    counters = [series(key) + _F64.pack(value) for key, value in state.counters.items()]
+    histograms = []
+    for key, histogram in state.histograms.items():
+        bounds = bounds_table.setdefault(histogram.bounds, len(bounds_table))
+        histograms.append(
+            series(key) + _U32.pack(bounds) + _F64.pack(histogram.sum)
+            + struct.pack(f"<{len(histogram.counts)}Q", *histogram.counts)
+        )
+
+    parts = [_F64.pack(state.start_time), _U32.pack(len(strings))]
+    for value in strings:
+        encoded = value.encode()
+        parts += [_U16.pack(len(encoded)), encoded]
+    parts.append(_U32.pack(len(bounds_table)))
+    for bounds in bounds_table:
+        parts += [_U16.pack(len(bounds)), struct.pack(f"<{len(bounds)}d", *bounds)]
+    parts += [_U32.pack(len(counters))] + counters + [_U32.pack(len(histograms))] + histograms
+    return zlib.compress(b"".join(parts), 1)
+
+
+def decode_state(data: bytes) -> MetricState:
+    """Return the MetricState encoded by encode_state()."""
+    data = zlib.decompress(data)
+    pos = 0
+
+    def unpack(fmt: struct.Struct):
+        nonlocal pos
+        values = fmt.unpack_from(data, pos)
+        pos += fmt.size
+        return values
+
+    def series() -> SeriesKey:
+        name, label_count = unpack(_SERIES)
+        labels = tuple((strings[label], strings[value]) for label, value in (unpack(_LABEL) for _ in range(label_count)))
+        return strings[name], labels
+
+    (start_time,) = unpack(_F64)
+    strings = []
+    for _ in range(unpack(_U32)[0]):
+        (length,) = unpack(_U16)
+        strings.append(data[pos:pos + length].decode())
+        pos += length
+    bounds_table = []
+    for _ in range(unpack(_U32)[0]):
+        (length,) = unpack(_U16)
+        bounds_table.append(unpack(struct.Struct(f"<{length}d")))
+
+    counters = {}
+    for _ in range(unpack(_U32)[0]):
+        key = series()
+        counters[key] = unpack(_F64)[0]
+    histograms = {}
+    for _ in range(unpack(_U32)[0]):
+        key = series()
+        bounds = bounds_table[unpack(_U32)[0]]
+        (total,) = unpack(_F64)
+        histograms[key] = HistogramState(bounds, unpack(struct.Struct(f"<{len(bounds) + 1}Q")), total)
+    return MetricState(counters, histograms, start_time)
+
+
+class Snapshot(NamedTuple):
+    generation: int
+    written_at: float
+    run_id: bytes
+    payload: bytes
+
+
+class SnapshotFile:
+    """A memory-mapped file holding the last two snapshots.
+
+    After a small file header come two equally sized slots, each a header
+    (generation, time, run id, length, CRC32) followed by its payload.
+    write() fills the slot not holding the latest snapshot, so a crash
+    mid-write leaves a slot whose CRC does not match and read() falls back
+    to the other one. A payload larger than a slot rewrites the file with
+    bigger slots through a temporary file and os.replace(), keeping the
+    previous snapshot.
+
+    Not thread safe; one process writes at a time (see MetricsPersister).
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._slot_size = 0
+        if os.path.exists(path) and os.path.getsize(path) >= _FILE_HEADER.size:
+            self._open()
+
+    def read(self) -> Optional[Snapshot]:
+        """Return the newest intact snapshot, or None if there is none."""
+        if self._map is None:
+            return None
+        snapshots = [snapshot for snapshot in map(self._read_slot, (0, 1)) if snapshot is not None]
+        return max(snapshots, key=lambda snapshot: snapshot.generation, default=None)
+
+    def write(self, payload: bytes, run_id: bytes) -> int:
+        """Store payload as the newest snapshot and return its generation."""
+        latest = self.read()
+        generation = latest.generation + 1 if latest is not None else 1
+        if self._map is None or _SLOT_HEADER.size + len(payload) > self._slot_size:
+            self._grow(_SLOT_HEADER.size + len(payload), latest)
+            latest = self.read()
+        # Generation n lives in slot n % 2, so the latest snapshot is never overwritten
+        slot = generation % 2
+        start = _FILE_HEADER.size + slot * self._slot_size
+        body = _SLOT_HEADER.pack(0, generation, time.time(), run_id, len(payload))[4:] + payload
+        # Payload first, CRC last: a torn write fails the check instead of passing as new
+        self._map[start + 4:start + 4 + len(body)] = body
+        self._map[start:start + 4] = _U32.pack(zlib.crc32(body))
+        self._map.flush()
+        return generation
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def _open(self) -> None:
+        self._file = open(self._path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, slot_size = _FILE_HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            logger.warning("Ignoring metric snapshot %s with unsupported format %r v%d", self._path, magic, version)
+            self.close()
+            return
+        if len(self._map) < _FILE_HEADER.size + 2 * slot_size:
+            logger.warning("Ignoring truncated metric snapshot %s", self._path)
+            self.close()
+            return
+        self._slot_size = slot_size
+
+    def _read_slot(self, slot: int) -> Optional[Snapshot]:
+        start = _FILE_HEADER.size + slot * self._slot_size
+        crc, generation, written_at, run_id, length = _SLOT_HEADER.unpack_from(self._map, start)
+        if generation == 0 or _SLOT_HEADER.size + length > self._slot_size:
+            return None
+        body = self._map[start + 4:start + _SLOT_HEADER.size + length]
+        if zlib.crc32(body) != crc:
+            return None
+        return Snapshot(generation, written_at, run_id, body[_SLOT_HEADER.size - 4:])
+
+    def _grow(self, needed: int, latest: Optional[Snapshot]) -> None:
+        slot_size = max(_INITIAL_SLOT_SIZE, self._slot_size)
+        while slot_size < needed:
+            slot_size *= 2
+        tmp = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_FILE_HEADER.pack(_MAGIC, FORMAT_VERSION, slot_size))
+            f.truncate(_FILE_HEADER.size + 2 * slot_size)
+            if latest is not None:
+                body = _SLOT_HEADER.pack(0, latest.generation, latest.written_at, latest.run_id,
+                                         len(latest.payload))[4:] + latest.payload
+                f.seek(_FILE_HEADER.size + (latest.generation % 2) * slot_size)
+                f.write(_U32.pack(zlib.crc32(body)) + body)
+            f.flush()
+            os.fsync(f.fileno())
+        self.close()
+        os.replace(tmp, self._path)
+        self._open()
+
+
+def start_snapshot_run(path: Optional[str] = None) -> None:
+    """Start a new run whose workers restore the snapshot once between them.
+
+    Called from the gunicorn master before any worker is forked. Without it,
+    every process counts as a run of its own.
+    """
+    path = path or get_snapshot_path()
+    if path is None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.run", "wb") as f:
+        f.write(uuid.uuid4().bytes)
+
+
+def _current_run_id(path: str) -> bytes:
+    try:
+        with open(f"{path}.run", "rb") as f:
+            return f.read(16).ljust(16, b"\0")
+    except FileNotFoundError:
+        return uuid.uuid4().bytes
+
+
+class MetricsPersister:
+    """Periodically snapshots a backend's counters and histograms and restores them on startup.
+
+    One process at a time owns the snapshot file, through an exclusive lock
+    on ``<path>.lock``; under gunicorn the other workers retry every
+    ``interval``. The owner restores the snapshot into its backend if no
+    process of the current run (see start_snapshot_run()) has done so yet,
+    then writes a snapshot every ``interval`` seconds and when it stops. In
+    multiprocess mode the backend's state is the merged state of every
+    worker, so one restore covers the whole pod. Snapshots are taken on a
+    background thread and never on the request path.
+    """
+
+    def __init__(self, backend: "MetricsBackend", path: str, interval: float = 30.0):
+        self._backend = backend
+        self._path = path
+        self._interval = interval
+        self._run_id = _current_run_id(path)
+        self._file: Optional[SnapshotFile] = None
+        self._lock_fd: Optional[int] = None
+        self.generation = 0
+        self.restored: Optional[MetricState] = None
+        self.restore_seconds = 0.0
+
+        self._stopped = threading.Event()
+        self._acquire()
+        self._thread = threading.Thread(target=self._run, name="metric-snapshot", daemon=True)
+        self._thread.start()
+
+    @property
+    def owner(self) -> bool:
+        """True while this process writes the snapshot file."""
+        return self._lock_fd is not None
+
+    def _acquire(self) -> None:
+        """Take ownership if no other process holds it, restoring once per run."""
+        os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+        fd = os.open(f"{self._path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        self._lock_fd = fd
+        self._file = SnapshotFile(self._path)
+        snapshot = self._file.read()
+        if snapshot is not None and snapshot.run_id != self._run_id:
+            self._restore(snapshot)
+        # Marks the run as restored before any other worker can take over
+        self.save()
+
+    def _restore(self, snapshot: Snapshot) -> None:
+        start = time.perf_counter()
+        try:
+            state = decode_state(snapshot.payload)
+        except (struct.error, zlib.error, IndexError, UnicodeDecodeError):
+            logger.warning("Could not decode metric snapshot generation %d in %s", snapshot.generation, self._path)
+            return
+        self._backend.restore_state(state)
+        self.restored = state
+        self.restore_seconds = time.perf_counter() - start
+        logger.info(
+            "Restored %d counters and %d histograms from %s in %.3fs",
+            len(state.counters), len(state.histograms), self._path, self.restore_seconds,
+        )
+
+    def save(self) -> None:
+        """Write the backend's current state as a new snapshot, if this process owns the file."""
+        if self._file is None:
+            return
+        state = self._backend.export_state()
+        if state is None:
+            return
+        self.generation = self._file.write(encode_state(state), self._run_id)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                if self.owner:
+                    self.save()
+                else:
+                    self._acquire()
+            except Exception:
+                logger.exception("Exception while snapshotting metrics")
+
+    def stop(self) -> None:
+        """Write a final snapshot and give up ownership."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join()
+        try:
+            self.save()
+        except Exception:
+            logger.exception("Exception while snapshotting metrics")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+def start_persistence(backend: "MetricsBackend") -> Optional[MetricsPersister]:
+    """Restore and start snapshotting ``backend`` when METRICS_SNAPSHOT_PATH is set."""
+    global _persister_instance
+
+    path = get_snapshot_path()
+    if path is None:
+        return None
+    _persister_instance = MetricsPersister(backend, path, interval=get_snapshot_interval())
+    atexit.register(_persister_instance.stop)
+    return _persister_instance
@@ -1,67 +1,412 @@
+import itertools
+import logging
+import os
+import time
+from bisect import bisect_left
 from contextlib import contextmanager
-from typing import Iterator
-from prometheus_client import Counter, Histogram
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Sequence
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.utils import floatToGoString
 
+from app.metrics import multiprocess
 from app.metrics.base import MetricsBackend
+from app.metrics.exemplars import TraceContext
+from app.metrics.histogram import BATCH_SIZE_BUCKETS
+from app.metrics.labels import UNKNOWN, LabelCache, get_max_series, normalize_status, tally_statuses
+from app.metrics.sketch import DDSketch, quantile_summary
+
+if TYPE_CHECKING:
+    from app.metrics.persistence import MetricState
+
+logger = logging.getLogger(__name__)
+
+# Seconds between publishing a worker's quantile sketch in multiprocess mode
+SKETCH_SAVE_INTERVAL = 1.0
+
+
+class _PrometheusSeries:
+    """Label children of one (route, method) pair, resolved on first use."""
+
+    __slots__ = (
+        "_metrics", "_labels", "_requests",
+        "_successful", "_errors_4xx", "_errors_5xx", "_duration",
+    )
+
+    def __init__(self, metrics: "PrometheusMetrics", route: str, method: str):
+        self._metrics = metrics
+        self._labels = (route, method)
+        self._requests = {}
+        self._successful = None
+        self._errors_4xx = None
+        self._errors_5xx = None
+        self._duration = None
+
+    def requests(self, status: str):
+        status = normalize_status(status)
+        child = self._requests.get(status)
+        if child is None:
+            child = self._requests[status] = self._metrics._http_requests.labels(*self._labels, status)
+        return child
+
+    @property
+    def successful(self):
+        if self._successful is None:
+            self._successful = self._metrics._http_successful_request.labels(*self._labels)
+        return self._successful
+
+    @property
+    def errors_4xx(self):
+        if self._errors_4xx is None:
+            self._errors_4xx = self._metrics._http_4xx_errors.labels(*self._labels)
+        return self._errors_4xx
+
+    @property
+    def errors_5xx(self):
+        if self._errors_5xx is None:
+            self._errors_5xx = self._metrics._http_5xx_errors.labels(*self._labels)
+        return self._errors_5xx
+
+    @property
+    def duration(self):
+        if self._duration is None:
+            self._duration = self._metrics._http_request_time_histogram.labels(*self._labels)
+        return self._duration
+
+    def observe_many(self, durations: Sequence[float]) -> None:
+        """Observe several durations with one update per touched bucket.
+
+        Histogram.observe() takes the sum and bucket locks once per value, so
+        the bucket counts are tallied here and added through the child's
+        value objects directly.
+        """
+        child = self.duration
+        bounds = child._upper_bounds
+        counts = [0] * len(bounds)
+        for value in durations:
+            counts[bisect_left(bounds, value)] += 1
+        child._sum.inc(sum(durations))
+        for bucket, count in zip(child._buckets, counts):
+            if count:
+                bucket.inc(count)
 
 
 class PrometheusMetrics(MetricsBackend):
     """Prometheus-based metrics implementation using prometheus-client."""
 
     def __init__(self):
+        super().__init__()
+        multiproc_dir = multiprocess.get_multiproc_dir()
+        if multiproc_dir is not None:
+            # Worker value files are created as soon as the metrics below exist
+            os.makedirs(multiproc_dir, exist_ok=True)
+
+        labels = ("route", "method")
         self._http_successful_request = Counter(
-            "http_successful_request", "Successful HTTP counts"
+            "http_successful_request", "Successful HTTP counts", labels
         )
-        self._http_requests = Counter("http_requests", "Total HTTP counts")
-        self._http_4xx_errors = Counter("http_error_4xx", "4xx error count")
-        self._http_5xx_errors = Counter("http_error_5xx", "5xx error count")
+        self._http_requests = Counter("http_requests", "Total HTTP counts", labels + ("status",))
+        self._http_4xx_errors = Counter("http_error_4xx", "4xx error count", labels)
+        self._http_5xx_errors = Counter("http_error_5xx", "5xx error count", labels)
         self._http_request_time_histogram = Histogram(
-            "request_processing_seconds", "Time spent processing request (Histogram)"
+            "request_processing_seconds", "Time spent processing request (Histogram)", labels
+        )
+        # Gauges are summed over live workers in multiprocess mode
+        self._task_queue_depth = Gauge(
+            "task_queue_depth", "Tasks waiting for an executor worker", multiprocess_mode="livesum"
+        )
+        self._tasks_running = Gauge(
+            "tasks_running", "Tasks currently running", multiprocess_mode="livesum"
+        )
+        self._task_queue_wait_histogram = Histogram(
+            "task_queue_wait_seconds", "Time tasks spent queued before starting"
+        )
+        self._trace_sampling = Counter(
+            "trace_sampling_decisions", "Trace sampling decisions", ("decision",)
+        )
+        self._trace_sampled = self._trace_sampling.labels("sampled")
+        self._trace_dropped = self._trace_sampling.labels("dropped")
+        self._span_queue_size = Gauge(
+            "span_queue_size", "Finished spans waiting to be exported", multiprocess_mode="livesum"
+        )
+        self._span_export_histogram = Histogram("span_export_seconds", "Time spent exporting a batch of spans")
+        self._span_batch_histogram = Histogram(
+            "span_export_batch_size", "Spans per export", buckets=BATCH_SIZE_BUCKETS
+        )
+        self._spans_dropped = Counter("spans_dropped", "Spans dropped by the span pipeline", ("reason",))
+        self._collectors = (
+            self._http_successful_request, self._http_requests,
+            self._http_4xx_errors, self._http_5xx_errors,
+            self._http_request_time_histogram, self._task_queue_depth,
+            self._tasks_running, self._task_queue_wait_histogram,
+            self._trace_sampling, self._span_queue_size, self._span_export_histogram,
+            self._span_batch_histogram, self._spans_dropped,
         )
 
-    def inc_requests(self) -> None:
-        self._http_requests.inc()
+        # Label children are cached per (route, method) so the hot path never calls labels()
+        self._series = LabelCache(lambda route, method: _PrometheusSeries(self, route, method), get_max_series())
 
-    def inc_successful(self) -> None:
-        self._http_successful_request.inc()
+        # Request duration quantiles. In multiprocess mode each worker publishes
+        # its sketch at most once per SKETCH_SAVE_INTERVAL and readers merge them.
+        self._sketch = DDSketch()
+        self._sketch_save_at = 0.0
 
-    def inc_4xx(self) -> None:
-        self._http_4xx_errors.inc()
+    def inc_requests(self, route: str = UNKNOWN, method: str = UNKNOWN, status: str = UNKNOWN) -> None:
+        self._series.get(route, method).requests(status).inc()
+        self._windows.add(requests=1)
 
-    def inc_5xx(self) -> None:
-        self._http_5xx_errors.inc()
+    def inc_successful(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
+        self._series.get(route, method).successful.inc()
+
+    def inc_4xx(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
+        self._series.get(route, method).errors_4xx.inc()
+
+    def inc_5xx(self, route: str = UNKNOWN, method: str = UNKNOWN) -> None:
+        self._series.get(route, method).errors_5xx.inc()
+        self._windows.add(errors=1)
 
     @contextmanager
-    def time_request(self) -> Iterator[None]:
-        with self._http_request_time_histogram.time():
+    def time_request(self, route: str = UNKNOWN, method: str = UNKNOWN) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
             yield
+        finally:
+            self.observe_request(route, method, time.perf_counter() - start_time)
 
-    def get_metrics_summary(self) -> dict:
-        """Return current metric values for display."""
-        histogram_buckets = []
-        for sample in self._http_request_time_histogram._child_samples():
-            histogram_buckets.append({
-                "name": f"{self._http_request_time_histogram._name}{sample.name}",
-                "le": sample.labels.get("le", ""),
-                "value": sample.value,
+    def observe_request(
+        self, route: str, method: str, seconds: float, exemplar: Optional[TraceContext] = None
+    ) -> None:
+        if exemplar is None:
+            exemplar = self._sample_exemplar(seconds)
+        if exemplar is None:
+            self._series.get(route, method).duration.observe(seconds)
+        else:
+            # Not kept in multiprocess mode, where prometheus_client does not store exemplars
+            self._series.get(route, method).duration.observe(seconds, {
+                "trace_id": format(exemplar[0], "032x"),
+                "span_id": format(exemplar[1], "016x"),
             })
+        self._sketch.add(seconds)
+        self._sketch_changed()
+        self._windows.add(latency_count=1, latency_sum=seconds)
+
+    def record_batch(self, route: str, method: str, statuses: Dict[int, int], durations: Sequence[float]) -> None:
+        series = self._series.get(route, method)
+        by_class, successful, errors_4xx, errors_5xx = tally_statuses(statuses)
+        self._windows.add(sum(by_class.values()), errors_5xx, len(durations), sum(durations))
+        for status, count in by_class.items():
+            series.requests(status).inc(count)
+        if successful:
+            series.successful.inc(successful)
+        if errors_4xx:
+            series.errors_4xx.inc(errors_4xx)
+        if errors_5xx:
+            series.errors_5xx.inc(errors_5xx)
+        series.observe_many(durations)
+        self._sketch.add_many(durations)
+        self._sketch_changed()
+
+    def flush(self) -> None:
+        super().flush()
+        if multiprocess.is_multiprocess_enabled():
+            self._save_sketch()
+
+    def _sketch_changed(self) -> None:
+        if multiprocess.is_multiprocess_enabled() and time.monotonic() >= self._sketch_save_at:
+            self._save_sketch()
+
+    def _save_sketch(self) -> None:
+        self._sketch_save_at = time.monotonic() + SKETCH_SAVE_INTERVAL
+        multiprocess.write_sketch(self._sketch)
 
+    def set_task_queue_depth(self, depth: int) -> None:
+        self._task_queue_depth.set(depth)
+
+    def set_tasks_running(self, count: int) -> None:
+        self._tasks_running.set(count)
+
+    def observe_task_queue_wait(self, seconds: float) -> None:
+        self._task_queue_wait_histogram.observe(seconds)
+
+    def observe_trace_sampling(self, sampled: bool) -> None:
+        (self._trace_sampled if sampled else self._trace_dropped).inc()
+
+    def set_span_queue_size(self, size: int) -> None:
+        self._span_queue_size.set(size)
+
+    def observe_span_export(self, batch_size: int, seconds: float) -> None:
+        self._span_export_histogram.observe(seconds)
+        self._span_batch_histogram.observe(batch_size)
+
+    def inc_spans_dropped(self, count: int, reason: str) -> None:
+        self._spans_dropped.labels(reason).inc(count)
+
+    def _collect_families(self):
+        if multiprocess.is_multiprocess_enabled():
+            return multiprocess.get_registry().collect()
+        return itertools.chain.from_iterable(c.collect() for c in self._collectors)
+
+    def export_state(self) -> "MetricState":
+        """Return the totals of every counter and histogram series.
+
+        In multiprocess mode the totals are merged across all gunicorn workers.
+        """
+        from app.metrics.persistence import HistogramState, MetricState
+
+        self.flush()
+        counters = {}
+        # {(name, labels): ({upper bound: cumulative count}, sum)}
+        histograms = {}
+        for metric in self._collect_families():
+            for sample in metric.samples:
+                if metric.type == "counter" and sample.name.endswith("_total"):
+                    key = (metric.name, tuple(sorted(sample.labels.items())))
+                    counters[key] = counters.get(key, 0.0) + sample.value
+                elif metric.type == "histogram" and not sample.name.endswith(("_created", "_count")):
+                    labels = tuple(sorted((k, v) for k, v in sample.labels.items() if k != "le"))
+                    buckets, total = histograms.setdefault((metric.name, labels), ({}, [0.0]))
+                    if sample.name.endswith("_bucket"):
+                        bound = float(sample.labels["le"])
+                        buckets[bound] = buckets.get(bound, 0.0) + sample.value
+                    else:
+                        total[0] += sample.value
+
+        states = {}
+        for key, (buckets, total) in histograms.items():
+            bounds = sorted(buckets)
+            cumulative = [int(buckets[bound]) for bound in bounds]
+            counts = [count - previous for count, previous in zip(cumulative, [0] + cumulative[:-1])]
+            states[key] = HistogramState(tuple(bounds[:-1]), tuple(counts), total[0])
+        return MetricState(counters, states, self._start_time)
+
+    def restore_state(self, state: "MetricState") -> None:
+        collectors = {collector._name: collector for collector in self._collectors}
+        for (name, labels), value in state.counters.items():
+            child = self._restored_child(collectors.get(name), Counter, labels)
+            if child is not None:
+                child.inc(value)
+        for (name, labels), histogram in state.histograms.items():
+            child = self._restored_child(collectors.get(name), Histogram, labels)
+            if child is None:
+                continue
+            if tuple(child._upper_bounds[:-1]) != histogram.bounds:
+                logger.warning("Not restoring %s%s: bucket bounds changed", name, dict(labels))
+                continue
+            # Same direct bucket update as _PrometheusSeries.observe_many()
+            child._sum.inc(histogram.sum)
+            for bucket, count in zip(child._buckets, histogram.counts):
+                if count:
+                    bucket.inc(count)
+        self._start_time = min(self._start_time, state.start_time)
+
+    @staticmethod
+    def _restored_child(metric, metric_type: type, labels: tuple):
+        """Return the child of ``metric`` for restored ``labels``, or None if they do not match."""
+        if not isinstance(metric, metric_type) or sorted(metric._labelnames) != [label for label, _ in labels]:
+            return None
+        return metric.labels(**dict(labels)) if labels else metric
+
+    def get_metrics_summary(self) -> dict:
+        """Return current metric values for display.
+
+        Counter values are totals over all label sets. In multiprocess mode
+        the values are merged across all gunicorn workers.
+        """
+        self.flush()
+        families = self._collect_families()
+        if multiprocess.is_multiprocess_enabled():
+            sketch = multiprocess.read_merged_sketch()
+        else:
+            sketch = self._sketch
+
+        counters = (
+            ("http_successful_request", self._http_successful_request),
+            ("http_requests", self._http_requests),
+            ("http_4xx_errors", self._http_4xx_errors),
+            ("http_5xx_errors", self._http_5xx_errors),
+        )
+        histogram_name = self._http_request_time_histogram._name
+        requests_name = f"{self._http_requests._name}_total"
+        sampling_name = f"{self._trace_sampling._name}_total"
+        sampling = {"sampled": 0.0, "dropped": 0.0}
+        dropped_name = f"{self._spans_dropped._name}_total"
+        spans_dropped = {}
+
+        # Every bucket is listed even before the first observation, in exposition order
+        buckets = {
+            (f"{histogram_name}_bucket", floatToGoString(bound)): 0.0
+            for bound in self._http_request_time_histogram._upper_bounds
+        }
+        buckets[(f"{histogram_name}_count", "")] = 0.0
+        buckets[(f"{histogram_name}_sum", "")] = 0.0
+
+        values = {}
+        requests_by_route = []
+        for metric in families:
+            for sample in metric.samples:
+                if sample.name.endswith("_created"):
+                    continue
+                if metric.name == histogram_name:
+                    # Sum over route/method label sets, keeping one series per bucket
+                    key = (sample.name, sample.labels.get("le", ""))
+                    buckets[key] += sample.value
+                    continue
+                values[sample.name] = values.get(sample.name, 0.0) + sample.value
+                if sample.name == sampling_name:
+                    sampling[sample.labels["decision"]] += sample.value
+                elif sample.name == dropped_name:
+                    reason = sample.labels["reason"]
+                    spans_dropped[reason] = spans_dropped.get(reason, 0.0) + sample.value
+                elif sample.name == requests_name:
+                    requests_by_route.append({
+                        "route": sample.labels["route"],
+                        "method": sample.labels["method"],
+                        "status": sample.labels["status"],
+                        "value": sample.value,
+                    })
+
+        histogram_buckets = [
+            {"name": name, "le": le, "value": value}
+            for (name, le), value in buckets.items()
+        ]
+        requests_by_route.sort(key=lambda r: (r["route"], r["method"], r["status"]))
+
+        summary = {
+            key: {
+                "name": counter._name,
+                "value": values.get(f"{counter._name}_total", 0.0),
+            }
+            for key, counter in counters
+        }
+        summary["histogram_buckets"] = histogram_buckets
+        summary["request_quantiles"] = quantile_summary(histogram_name, sketch)
+        summary["request_exemplars"] = self._exemplar_summary(histogram_name)
+        summary["request_windows"] = self._windows.summary()
+        summary["requests_by_route"] = requests_by_route
+        summary["trace_sampling"] = self._trace_sampling_summary(
+            self._trace_sampling._name, sampling["sampled"], sampling["dropped"]
+        )
+        summary.update(self._task_summary(
+            values.get(self._task_queue_depth._name, 0.0),
+            values.get(self._tasks_running._name, 0.0),
+            values.get(f"{self._task_queue_wait_histogram._name}_count", 0.0),
+            values.get(f"{self._task_queue_wait_histogram._name}_sum", 0.0),
+        ))
+        summary.update(self._span_pipeline_summary(
+            values.get(self._span_queue_size._name, 0.0),
+            values.get(f"{self._span_export_histogram._name}_count", 0.0),
+            values.get(f"{self._span_export_histogram._name}_sum", 0.0),
+            values.get(f"{self._span_batch_histogram._name}_sum", 0.0),
+            spans_dropped,
+        ))
+        return summary
+
+    def _task_summary(self, depth: float, running: float, wait_count: float, wait_sum: float) -> dict:
         return {
-            "http_successful_request": {
-                "name": self._http_successful_request._name,
-                "value": self._http_successful_request._value.get(),
-            },
-            "http_requests": {
-                "name": self._http_requests._name,
-                "value": self._http_requests._value.get(),
-            },
-            "http_4xx_errors": {
-                "name": self._http_4xx_errors._name,
-                "value": self._http_4xx_errors._value.get(),
-            },
-            "http_5xx_errors": {
-                "name": self._http_5xx_errors._name,
-                "value": self._http_5xx_errors._value.get(),
+            "task_queue_depth": {"name": self._task_queue_depth._name, "value": depth},
+            "tasks_running": {"name": self._tasks_running._name, "value": running},
+            "task_queue_wait": {
+                "name": self._task_queue_wait_histogram._name,
+                "count": wait_count,
+                "sum": wait_sum,
             },
-            "histogram_buckets": histogram_buckets,
         }
@@ -0,0 +1,99 @@
+import itertools
+import threading
+import weakref
+from typing import Callable, Dict, Generic, Hashable, List, TypeVar
+
+S = TypeVar("S")
+
+
+class _ShardOwner:
+    """Lives in thread-local storage; its finalizer retires the shard when the thread ends."""
+
+    __slots__ = ("__weakref__",)
+
+
+class ThreadShards(Generic[S]):
+    """One shard per thread or greenlet, created on first use and retired when the thread ends.
+
+    ``retire`` is called with the finished thread's shard while ``lock``
+    is held, so readers holding the same lock see every shard either live
+    or retired, never both or neither.
+    """
+
+    def __init__(self, factory: Callable[[], S], retire: Callable[[S], None], lock):
+        self._factory = factory
+        self._retire_shard = retire
+        self._lock = lock
+        self._local = threading.local()
+        self._live: Dict[int, S] = {}
+        self._tokens = itertools.count()
+
+    def get(self) -> S:
+        """Return the calling thread's shard, creating it on first use."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._new_shard()
+
+    def live(self) -> List[S]:
+        """Return the shards of threads still running. Lock must be held."""
+        return list(self._live.values())
+
+    def _new_shard(self) -> S:
+        shard = self._factory()
+        owner = _ShardOwner()
+        with self._lock:
+            token = next(self._tokens)
+            self._live[token] = shard
+        weakref.finalize(owner, self._retire, token)
+        self._local.owner = owner
+        self._local.shard = shard
+        return shard
+
+    def _retire(self, token: int) -> None:
+        with self._lock:
+            shard = self._live.pop(token, None)
+            if shard is not None:
+                self._retire_shard(shard)
+
+
+class ShardedCounters:
+    """Counters split into one shard per thread or greenlet.
+
+    Each thread only ever writes to its own shard, so increments need no lock
+    and cannot race. Shards are merged when the values are read. When a thread
+    or greenlet finishes, its shard is folded into a retired total so the
+    number of shards is bounded by the number of live threads, which matters
+    under gevent where every request runs in a fresh greenlet.
+
+    Under gevent monkey patching ``threading.local`` is greenlet-local, so
+    instances must be created after patching, as gunicorn's gevent worker does.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._retired: Dict[Hashable, int] = {}
+        self._shards: ThreadShards[dict] = ThreadShards(dict, self._retire, self._lock)
+
+    def inc(self, key: Hashable, amount: int = 1) -> None:
+        """Increment the counter for key in the calling thread's shard."""
+        counts = self._shards.get()
+        counts[key] = counts.get(key, 0) + amount
+
+    def get(self, key: Hashable) -> int:
+        """Return the merged value of a single counter."""
+        return self.values().get(key, 0)
+
+    def values(self) -> Dict[Hashable, int]:
+        """Return merged values of all counters across every shard."""
+        with self._lock:
+            totals = dict(self._retired)
+            for counts in self._shards.live():
+                # dict.copy() is atomic with respect to the owning thread's updates
+                for key, value in counts.copy().items():
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def _retire(self, counts: dict) -> None:
+        for key, value in counts.items():
+            self._retired[key] = self._retired.get(key, 0) + value
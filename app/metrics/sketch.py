@@ -0,0 +1,161 @@
+import math
+import struct
+import threading
+from typing import Dict, Iterable, Optional
+
+# Quantiles reported by get_metrics_summary()
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+_HEADER = struct.Struct("<4sdQQdI")
+_BIN = struct.Struct("<iQ")
+_MAGIC = b"DDS1"
+
+
+class DDSketch:
+    """Mergeable quantile sketch with relative-error guarantees (DDSketch).
+
+    Values are counted in logarithmic bins so any reported quantile is
+    within ``relative_accuracy`` of the true value. Inserting is one log and
+    one dict update; memory is bounded by ``max_bins``, and when values span
+    more bins than that the lowest ones are collapsed together, which only
+    affects accuracy of the smallest quantiles. Values at or below
+    ``min_value`` (including zero) are counted separately.
+
+    Sketches with the same relative accuracy merge exactly, which is how
+    per-worker sketches are combined; to_bytes()/from_bytes() move them
+    between processes.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048, min_value: float = 1e-9):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self._relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._max_bins = max_bins
+        self._min_value = min_value
+        self._bins: Dict[int, int] = {}
+        self._min_key: Optional[int] = None
+        self._max_key: Optional[int] = None
+        self._zero_count = 0
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def relative_accuracy(self) -> float:
+        return self._relative_accuracy
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def num_bins(self) -> int:
+        return len(self._bins)
+
+    def add(self, value: float) -> None:
+        with self._lock:
+            self._add(value, 1)
+
+    def add_many(self, values: Iterable[float]) -> None:
+        with self._lock:
+            for value in values:
+                self._add(value, 1)
+
+    def merge(self, other: "DDSketch") -> None:
+        """Add every value counted by other into this sketch."""
+        if other._relative_accuracy != self._relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        with other._lock:
+            bins = dict(other._bins)
+            zero_count, count, total = other._zero_count, other._count, other._sum
+        with self._lock:
+            for key, n in bins.items():
+                self._add_to_bin(key, n)
+            self._zero_count += zero_count
+            self._count += count
+            self._sum += total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the estimated q-quantile (0 <= q <= 1), or None when empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        with self._lock:
+            if self._count == 0:
+                return None
+            rank = q * (self._count - 1)
+            seen = self._zero_count
+            if rank < seen:
+                return 0.0
+            for key in sorted(self._bins):
+                seen += self._bins[key]
+                if rank < seen:
+                    return 2 * self._gamma ** key / (self._gamma + 1)
+            return 2 * self._gamma ** self._max_key / (self._gamma + 1)
+
+    def to_bytes(self) -> bytes:
+        with self._lock:
+            parts = [_HEADER.pack(
+                _MAGIC, self._relative_accuracy, self._zero_count, self._count, self._sum, len(self._bins)
+            )]
+            parts.extend(_BIN.pack(key, n) for key, n in self._bins.items())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, max_bins: int = 2048) -> "DDSketch":
+        magic, relative_accuracy, zero_count, count, total, num_bins = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a serialized DDSketch")
+        sketch = cls(relative_accuracy, max_bins=max_bins)
+        for i in range(num_bins):
+            key, n = _BIN.unpack_from(data, _HEADER.size + i * _BIN.size)
+            sketch._add_to_bin(key, n)
+        sketch._zero_count = zero_count
+        sketch._count = count
+        sketch._sum = total
+        return sketch
+
+    def _add(self, value: float, n: int) -> None:
+        if value > self._min_value:
+            self._add_to_bin(math.ceil(math.log(value) / self._log_gamma), n)
+        else:
+            self._zero_count += n
+        self._count += n
+        self._sum += value * n
+
+    def _add_to_bin(self, key: int, n: int) -> None:
+        if self._min_key is None:
+            self._min_key = self._max_key = key
+        elif key > self._max_key:
+            self._max_key = key
+            if key - self._min_key >= self._max_bins:
+                self._collapse_below(key - self._max_bins + 1)
+        elif key < self._min_key:
+            if self._max_key - key >= self._max_bins:
+                # Too low to get its own bin: count it in the lowest bin kept
+                key = self._min_key
+            else:
+                self._min_key = key
+        self._bins[key] = self._bins.get(key, 0) + n
+
+    def _collapse_below(self, new_min_key: int) -> None:
+        """Fold every bin below new_min_key into it; each key is visited once overall."""
+        folded = 0
+        for key in range(self._min_key, new_min_key):
+            folded += self._bins.pop(key, 0)
+        if folded:
+            self._bins[new_min_key] = self._bins.get(new_min_key, 0) + folded
+        self._min_key = new_min_key
+
+
+def quantile_summary(name: str, sketch: DDSketch) -> list:
+    """Return get_metrics_summary() entries for SUMMARY_QUANTILES of a sketch."""
+    return [
+        {"name": name, "quantile": str(q), "value": sketch.quantile(q)}
+        for q in SUMMARY_QUANTILES
+    ]
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from app.metrics.base import MetricsBackend
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+_snapshots_instance: Optional["MetricsSnapshots"] = None
+
+_MISSING = object()
+
+
+def dumps(payload: dict) -> bytes:
+    """Serialize a JSON response body, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def flatten_summary(summary: dict) -> Dict[str, Optional[float]]:
+    """Flatten get_metrics_summary() into {series name: value}.
+
+    Series are named like Prometheus samples, e.g.
+    ``http_requests{method="GET",route="/index",status="2xx"}``. Window
+    rates are left out; the window counts and the seconds each window
+    covers are included, and a rate is ``requests / seconds``. The seconds
+    only change while the process is younger than the window. Exemplars are left out
+    too, they are trace ids rather than values.
+    """
+    series: Dict[str, Optional[float]] = {}
+    for key in ("http_successful_request", "http_requests", "http_4xx_errors", "http_5xx_errors",
+                "task_queue_depth", "tasks_running", "span_queue_size"):
+        if key in summary:
+            series[summary[key]["name"]] = summary[key]["value"]
+    for bucket in summary.get("histogram_buckets", ()):
+        name = f'{bucket["name"]}{{le="{bucket["le"]}"}}' if bucket["le"] else bucket["name"]
+        series[name] = bucket["value"]
+    for entry in summary.get("requests_by_route", ()):
+        series[f'http_requests{{method="{entry["method"]}",route="{entry["route"]}",status="{entry["status"]}"}}'] = entry["value"]
+    for entry in summary.get("request_quantiles", ()):
+        series[f'{entry["name"]}{{quantile="{entry["quantile"]}"}}'] = entry["value"]
+    for entry in summary.get("request_windows", ()):
+        for field in ("requests", "seconds", "errors_5xx", "error_ratio", "latency_avg"):
+            series[f'request_window_{field}{{window="{entry["window"]}"}}'] = entry[field]
+    if "trace_sampling" in summary:
+        sampling = summary["trace_sampling"]
+        for decision in ("sampled", "dropped"):
+            series[f'{sampling["name"]}{{decision="{decision}"}}'] = sampling[decision]
+    for key in ("task_queue_wait", "span_export", "span_export_batch_size"):
+        if key in summary:
+            histogram = summary[key]
+            series[f'{histogram["name"]}_count'] = histogram["count"]
+            series[f'{histogram["name"]}_sum'] = histogram["sum"]
+    if "spans_dropped" in summary:
+        dropped = summary["spans_dropped"]
+        for reason in ("queue_full", "export_failed"):
+            series[f'{dropped["name"]}{{reason="{reason}"}}'] = dropped[reason]
+    return series
+
+
+class MetricsSnapshots:
+    """Versioned snapshots of the metrics summary for incremental polling.
+
+    Each snapshot is compared with the previous one; if any series changed,
+    the version moves forward and the changed series are stamped with it, so
+    changed_since() returns only what a client has not seen. Versions are
+    nanosecond timestamps forced to increase, but they only mean something
+    to the worker that issued them: given a later version from another
+    worker, changes this one stamped earlier are left out. Nothing is tracked on
+    the request path; a snapshot costs one get_metrics_summary() call and is
+    reused for ``ttl`` seconds.
+    """
+
+    def __init__(self, metrics: MetricsBackend, ttl: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self._metrics = metrics
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._values: Dict[str, Optional[float]] = {}
+        self._changed_at: Dict[str, int] = {}
+        self._version = 0
+        self._expires_at = float("-inf")
+
+    def changed_since(self, since: Optional[int] = None) -> Tuple[int, Dict[str, Optional[float]]]:
+        """Return (current version, series changed after since); every series when since is None."""
+        with self._lock:
+            if self._clock() >= self._expires_at:
+                self._refresh()
+            if since is None:
+                return self._version, dict(self._values)
+            return self._version, {
+                name: self._values[name]
+                for name, version in self._changed_at.items()
+                if version > since and name in self._values
+            }
+
+    def _refresh(self) -> None:
+        """Take a new snapshot and stamp changed series. Lock must be held."""
+        values = flatten_summary(self._metrics.get_metrics_summary())
+        changed = [name for name, value in values.items() if self._values.get(name, _MISSING) != value]
+        if changed:
+            self._version = max(time.time_ns(), self._version + 1)
+            for name in changed:
+                self._changed_at[name] = self._version
+        self._values = values
+        self._expires_at = self._clock() + self._ttl
+
+
+def get_metrics_snapshots() -> MetricsSnapshots:
+    """Factory function to get the shared snapshot store for /api/metrics.
+
+    Snapshots are reused for METRICS_CACHE_TTL seconds, like /metrics scrapes.
+    """
+    global _snapshots_instance
+
+    if _snapshots_instance is not None:
+        return _snapshots_instance
+
+    from app.metrics import get_metrics_backend
+    from app.metrics.exposition import get_cache_ttl
+
+    _snapshots_instance = MetricsSnapshots(get_metrics_backend(), ttl=get_cache_ttl())
+    return _snapshots_instance
@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from app.metrics.snapshot import MetricsSnapshots, dumps
+
+logger = logging.getLogger(__name__)
+
+_stream_instance: Optional["MetricsStream"] = None
+
+# Seconds between keepalive comments on an idle stream, so proxies keep it open
+HEARTBEAT_INTERVAL = 15.0
+
+# Milliseconds the browser waits before reconnecting a closed stream
+RETRY_MS = 2000
+
+
+def get_stream_interval() -> float:
+    """Return how often metric deltas are pushed to stream clients, in seconds.
+
+    Environment variables:
+        METRICS_STREAM_INTERVAL: Seconds between summaries taken for
+            /api/metrics/stream (default: 1, minimum 0.1).
+    """
+    return max(float(os.environ.get("METRICS_STREAM_INTERVAL", "1")), 0.1)
+
+
+def get_stream_max_age() -> float:
+    """Return how long one stream response stays open, in seconds.
+
+    Environment variables:
+        METRICS_STREAM_MAX_AGE: Seconds after which a stream is closed and the
+            browser reconnects where it left off (default: 300). Set to 0 to
+            keep streams open until the client goes away.
+    """
+    return max(float(os.environ.get("METRICS_STREAM_MAX_AGE", "300")), 0.0)
+
+
+def format_event(version: int, since: Optional[int], series: Dict[str, Optional[float]]) -> bytes:
+    """Encode one Server-Sent Event carrying the series changed after since."""
+    data = dumps({"version": version, "since": since, "series": series})
+    return b"id: %d\nevent: metrics\ndata: %s\n\n" % (version, data)
+
+
+class MetricsStream:
+    """Pushes metric deltas to every /api/metrics/stream client of a process.
+
+    A single producer thread takes a snapshot every ``interval`` seconds and
+    encodes the series that changed since its previous one into a shared
+    event, so the summary is built once per tick however many clients are
+    connected. Clients that kept up send the shared bytes as they are (values
+    are absolute, so a delta reaching back before what a client has seen is
+    harmless); a client that missed an event, e.g. after resuming with
+    Last-Event-ID, gets its own delta from the snapshot store. The producer starts with the first client
+    and stops once none are left.
+
+    Only threading primitives are used, so under gunicorn's gevent worker,
+    which monkey-patches them, the producer and every client are greenlets
+    and an open stream does not occupy a worker.
+    """
+
+    def __init__(
+        self,
+        snapshots: MetricsSnapshots,
+        interval: float = 1.0,
+        heartbeat: float = HEARTBEAT_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._snapshots = snapshots
+        self._interval = interval
+        self._heartbeat = heartbeat
+        self._clock = clock
+        self._cond = threading.Condition()
+        # (previous version, version, encoded event) of the latest tick
+        self._event: Optional[Tuple[int, int, bytes]] = None
+        self._version = 0
+        self._subscribers = 0
+        self._producer: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    def tick(self) -> bool:
+        """Publish the series changed since the last tick; return whether anything changed."""
+        version, series = self._snapshots.changed_since(self._version)
+        if version <= self._version:
+            return False
+        payload = format_event(version, self._version, series)
+        with self._cond:
+            self._event = (self._version, version, payload)
+            self._version = version
+            self._cond.notify_all()
+        return True
+
+    def events(self, since: Optional[int] = None, max_age: float = 0.0) -> Iterator[bytes]:
+        """Yield encoded events for one client, starting after version since.
+
+        Without since, the first event carries every series. The iterator
+        ends after max_age seconds (never when 0) so the client reconnects.
+        """
+        deadline = self._clock() + max_age if max_age else None
+        self._subscribe()
+        try:
+            yield b"retry: %d\n\n" % RETRY_MS
+            last, series = self._snapshots.changed_since(since)
+            with self._cond:
+                if self._event is None:
+                    # Nothing published yet: start the first delta from here, not from scratch
+                    self._version = max(self._version, last)
+            if since is None or last > since:
+                yield format_event(last, since, series)
+            while True:
+                timeout = self._heartbeat
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        return
+                    timeout = min(timeout, remaining)
+                with self._cond:
+                    if self._event is None or self._event[1] <= last:
+                        self._cond.wait(timeout)
+                    event = self._event
+                if event is None or event[1] <= last:
+                    yield b": keepalive\n\n"
+                    continue
+                previous, version, payload = event
+                if previous > last:
+                    # Missed an event; the shared delta would leave out its changes
+                    version, series = self._snapshots.changed_since(last)
+                    payload = format_event(version, last, series)
+                last = version
+                yield payload
+        finally:
+            self._unsubscribe()
+
+    def close(self) -> None:
+        """Stop the producer."""
+        self._stopped.set()
+
+    def _subscribe(self) -> None:
+        with self._cond:
+            self._subscribers += 1
+            if self._producer is None and not self._stopped.is_set():
+                self._producer = threading.Thread(target=self._run, name="metrics-stream", daemon=True)
+                self._producer.start()
+
+    def _unsubscribe(self) -> None:
+        with self._cond:
+            self._subscribers -= 1
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            with self._cond:
+                if not self._subscribers:
+                    self._producer = None
+                    return
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Failed to publish metrics stream event")
+
+
+def get_metrics_stream() -> MetricsStream:
+    """Factory function to get the shared producer for /api/metrics/stream.
+
+    See get_stream_interval() for configuration.
+    """
+    global _stream_instance
+
+    if _stream_instance is not None:
+        return _stream_instance
+
+    from app.metrics.snapshot import get_metrics_snapshots
+
+    _stream_instance = MetricsStream(get_metrics_snapshots(), interval=get_stream_interval())
+    return _stream_instance
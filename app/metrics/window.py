@@ -0,0 +1,112 @@
+import math
+import threading
+import time
+from array import array
+from typing import Callable, List, Tuple
+
+# (label, seconds) of the windows reported by get_metrics_summary()
+WINDOWS: Tuple[Tuple[str, int], ...] = (("1m", 60), ("5m", 300), ("15m", 900))
+
+
+class SlidingWindow:
+    """Request rate, 5xx ratio and mean latency over recent time windows.
+
+    A ring of per-second slots, each holding the running totals as they were
+    at the start of that second. The totals over the last N seconds are the
+    current totals minus one slot, so every window lookup is O(1), and memory
+    is fixed by ``span`` rather than by traffic. Adding only bumps the
+    running totals; slots are written once per elapsed second.
+    """
+
+    def __init__(self, span: int = WINDOWS[-1][1], clock: Callable[[], float] = time.time):
+        self._size = span + 1
+        self._clock = clock
+        self._started = clock()
+        self._current = int(self._started)
+        self._slot_second = array("q", [-1] * self._size)
+        self._slot_requests = array("q", [0] * self._size)
+        self._slot_errors = array("q", [0] * self._size)
+        self._slot_latency_count = array("q", [0] * self._size)
+        self._slot_latency_sum = array("d", [0.0] * self._size)
+        self._requests = 0
+        self._errors = 0
+        self._latency_count = 0
+        self._latency_sum = 0.0
+        self._lock = threading.Lock()
+        self._stamp(self._current)
+
+    def add(self, requests: int = 0, errors: int = 0, latency_count: int = 0, latency_sum: float = 0.0) -> None:
+        second = int(self._clock())
+        with self._lock:
+            if second != self._current:
+                self._roll(second)
+            self._requests += requests
+            self._errors += errors
+            self._latency_count += latency_count
+            self._latency_sum += latency_sum
+
+    def totals(self, seconds: int) -> Tuple[int, int, int, float, float]:
+        """Return (requests, errors, latency count, latency sum, covered seconds) of the last window."""
+        if not 0 < seconds < self._size:
+            raise ValueError(f"Window must be between 1 and {self._size - 1} seconds")
+        now = self._clock()
+        second = int(now)
+        with self._lock:
+            if second > self._current:
+                self._roll(second)
+            start = self._current - seconds + 1
+            slot = start % self._size
+            if self._slot_second[slot] == start:
+                base = (
+                    self._slot_requests[slot], self._slot_errors[slot],
+                    self._slot_latency_count[slot], self._slot_latency_sum[slot],
+                )
+            else:
+                # The window reaches back before the wheel was created
+                base = (0, 0, 0, 0.0)
+                start = self._started
+            return (
+                self._requests - base[0],
+                self._errors - base[1],
+                self._latency_count - base[2],
+                self._latency_sum - base[3],
+                max(now - start, 1e-9),
+            )
+
+    def summary(self) -> List[dict]:
+        """Return get_metrics_summary() entries for every window in WINDOWS.
+
+        ``seconds`` is the part of the window the process has been up for,
+        rounded up to whole seconds; ``rate`` is ``requests / seconds``.
+        """
+        entries = []
+        for label, seconds in WINDOWS:
+            requests, errors, latency_count, latency_sum, covered = self.totals(seconds)
+            covered = math.ceil(covered)
+            entries.append({
+                "window": label,
+                "requests": requests,
+                "seconds": covered,
+                "rate": requests / covered,
+                "errors_5xx": errors,
+                "error_ratio": errors / requests if requests else 0.0,
+                "latency_avg": latency_sum / latency_count if latency_count else None,
+            })
+        return entries
+
+    def _roll(self, second: int) -> None:
+        """Stamp the totals into every slot after the current second up to second. Lock must be held."""
+        if second <= self._current:
+            # Clock went backwards; keep counting into the current second
+            return
+        for s in range(max(self._current + 1, second - self._size + 1), second + 1):
+            self._stamp(s)
+        self._current = second
+
+    def _stamp(self, second: int) -> None:
+        slot = second % self._size
+        self._slot_second[slot] = second
+        self._slot_requests[slot] = self._requests
+        self._slot_errors[slot] = self._errors
+        self._slot_latency_count[slot] = self._latency_count
+        self._slot_latency_sum[slot] = self._latency_sum
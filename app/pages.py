@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from flask import Flask, current_app, render_template, request
+
+
+def get_page_cache_size() -> int:
+    """Return the number of rendered pages kept in memory.
+
+    Environment variables:
+        PAGE_CACHE_SIZE: Rendered pages kept per worker, least recently used
+            evicted first (default: 128). Set to 0 to render on every request.
+    """
+    return max(int(os.environ.get("PAGE_CACHE_SIZE", "128")), 0)
+
+
+def get_template_cache_dir() -> Optional[str]:
+    """Return the directory compiled templates are cached in, or None to keep them in memory only.
+
+    Environment variables:
+        TEMPLATE_CACHE_DIR: Directory for Jinja bytecode shared by workers and
+            reused after restarts (default: not set)
+    """
+    return os.environ.get("TEMPLATE_CACHE_DIR") or None
+
+
+class PageCache:
+    """Bounded LRU cache of rendered pages, keyed by template and context.
+
+    Only for views whose output depends on nothing but the template and the
+    context passed to render(), such as the index and error pages.
+    Contexts with unhashable values are rendered every time.
+    """
+
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._pages: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, key: Hashable, page: str) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+
+def init_pages(app: Flask) -> None:
+    """Set up the page cache and compile every template before the first request.
+
+    Compiled templates stay in Jinja's in-memory cache for the life of the
+    worker; with TEMPLATE_CACHE_DIR set their bytecode is also written
+    there, so later workers load it instead of compiling. No pages are
+    cached while templates reload on change (debug mode).
+    """
+    cache_dir = get_template_cache_dir()
+    if cache_dir is not None:
+        from jinja2 import FileSystemBytecodeCache
+
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        app.jinja_env.get_template(name)
+
+    max_size = 0 if app.jinja_env.auto_reload else get_page_cache_size()
+    app.extensions["page_cache"] = PageCache(max_size)
+
+
+def render_page(template_name: str, **context) -> str:
+    """Render a template like render_template(), reusing the page rendered for the same context.
+
+    URLs in the page depend on the application root, so it is part of the key.
+    """
+    cache = current_app.extensions.get("page_cache")
+    if cache is None or cache.max_size <= 0:
+        return render_template(template_name, **context)
+    try:
+        key = (template_name, request.script_root, frozenset(context.items()))
+        page = cache.get(key)
+    except TypeError:
+        return render_template(template_name, **context)
+    if page is None:
+        page = render_template(template_name, **context)
+        cache.put(key, page)
+    return page
@@ -0,0 +1,279 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.sampling import (
+    ALWAYS_ON,
+    Decision,
+    ParentBased,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import Link, SpanKind, StatusCode, get_current_span
+from opentelemetry.trace.span import TraceState
+from opentelemetry.util.types import Attributes
+
+from app.metrics.base import MetricsBackend
+
+
+def get_sampler_type() -> str:
+    """Return the configured sampler type string.
+
+    Environment variables:
+        OTEL_SAMPLER: 'always_on' (default), 'ratio' or 'rate_limit'
+    """
+    return os.environ.get("OTEL_SAMPLER", "always_on").lower()
+
+
+def get_sampler_ratio() -> float:
+    """Return the fraction of root traces kept by the 'ratio' sampler.
+
+    Environment variables:
+        OTEL_SAMPLER_RATIO: Fraction between 0 and 1 (default: 1)
+    """
+    return min(max(float(os.environ.get("OTEL_SAMPLER_RATIO", "1")), 0.0), 1.0)
+
+
+def get_sampler_rate() -> float:
+    """Return the root traces per second kept by the 'rate_limit' sampler.
+
+    Environment variables:
+        OTEL_SAMPLER_RATE: Traces per second per worker (default: 10)
+    """
+    return max(float(os.environ.get("OTEL_SAMPLER_RATE", "10")), 0.0)
+
+
+def get_tail_sampling_enabled() -> bool:
+    """Return True when finished traces are filtered by TailSamplingSpanProcessor.
+
+    Environment variables:
+        OTEL_TAIL_SAMPLING: Set to 'true' to keep only failed, slow and a
+            fraction of the other traces (default: false)
+    """
+    return os.environ.get("OTEL_TAIL_SAMPLING", "false").lower() == "true"
+
+
+def get_tail_sampling_latency() -> float:
+    """Return the root span duration above which a trace is always kept.
+
+    Environment variables:
+        OTEL_TAIL_SAMPLING_LATENCY: Seconds (default: 1)
+    """
+    return float(os.environ.get("OTEL_TAIL_SAMPLING_LATENCY", "1"))
+
+
+def get_tail_sampling_ratio() -> float:
+    """Return the fraction of fast, successful traces kept by tail sampling.
+
+    Environment variables:
+        OTEL_TAIL_SAMPLING_RATIO: Fraction between 0 and 1 (default: 0.05)
+    """
+    return min(max(float(os.environ.get("OTEL_TAIL_SAMPLING_RATIO", "0.05")), 0.0), 1.0)
+
+
+def get_tail_sampling_max_spans() -> int:
+    """Return the maximum number of spans buffered while traces are open.
+
+    Environment variables:
+        OTEL_TAIL_SAMPLING_MAX_SPANS: Spans per worker (default: 10000)
+    """
+    return max(int(os.environ.get("OTEL_TAIL_SAMPLING_MAX_SPANS", "10000")), 1)
+
+
+def _parent_trace_state(parent_context: Optional[Context]) -> Optional[TraceState]:
+    return get_current_span(parent_context).get_span_context().trace_state
+
+
+class TokenBucketSampler(Sampler):
+    """Samples at most ``rate`` traces per second, allowing bursts of ``burst``.
+
+    The bucket refills continuously, so the cap holds per worker however
+    traffic is spread over time, and idle periods let through at most one
+    burst. Meant as the root sampler of a ParentBased sampler, so the traces
+    it keeps are sampled end to end.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._rate = rate
+        self._burst = burst if burst is not None else max(rate, 1.0)
+        self._clock = clock
+        self._tokens = self._burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def should_sample(
+        self,
+        parent_context: Optional[Context],
+        trace_id: int,
+        name: str,
+        kind: Optional[SpanKind] = None,
+        attributes: Attributes = None,
+        links: Optional[Sequence[Link]] = None,
+        trace_state: Optional[TraceState] = None,
+    ) -> SamplingResult:
+        now = self._clock()
+        with self._lock:
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            sampled = self._tokens >= 1.0
+            if sampled:
+                self._tokens -= 1.0
+        if not sampled:
+            return SamplingResult(Decision.DROP, None, _parent_trace_state(parent_context))
+        return SamplingResult(Decision.RECORD_AND_SAMPLE, attributes, _parent_trace_state(parent_context))
+
+    def get_description(self) -> str:
+        return f"TokenBucketSampler{{{self._rate}/s, burst={self._burst}}}"
+
+
+class ReportingSampler(Sampler):
+    """Counts every decision of the wrapped sampler in the metrics backend."""
+
+    def __init__(self, delegate: Sampler, metrics: MetricsBackend):
+        self._delegate = delegate
+        self._metrics = metrics
+
+    def should_sample(
+        self,
+        parent_context: Optional[Context],
+        trace_id: int,
+        name: str,
+        kind: Optional[SpanKind] = None,
+        attributes: Attributes = None,
+        links: Optional[Sequence[Link]] = None,
+        trace_state: Optional[TraceState] = None,
+    ) -> SamplingResult:
+        result = self._delegate.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+        self._metrics.observe_trace_sampling(result.decision.is_sampled())
+        return result
+
+    def get_description(self) -> str:
+        return self._delegate.get_description()
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """Forwards whole traces to ``delegate`` only when they are worth keeping.
+
+    Finished spans are buffered per trace until the trace's local root span
+    ends. The trace is then kept if any span failed or the root took at
+    least ``latency`` seconds, and otherwise with probability ``ratio``,
+    chosen by trace id like TraceIdRatioBased so the choice is the same in
+    every process. Kept traces are passed to ``delegate.on_end`` span by
+    span; dropped ones are discarded.
+
+    At most ``max_spans`` spans are buffered. Beyond that the oldest open
+    trace is decided early on the spans seen so far; if it is dropped, its
+    later spans are buffered and decided again, so a failure or a slow root
+    is kept even in a trace that was evicted. Decisions of recent traces
+    are remembered otherwise, so spans ending after their trace was decided
+    follow it.
+
+    Head sampling decides before a request has run, so it cannot keep slow
+    or failed requests; use this with OTEL_SAMPLER=always_on, or a rate
+    limit well above the expected traffic.
+    """
+
+    def __init__(self, delegate: SpanProcessor, latency: float = 1.0, ratio: float = 0.05, max_spans: int = 10000):
+        self._delegate = delegate
+        self._latency_ns = int(latency * 1e9)
+        self._bound = round(ratio * (1 << 64))
+        self._max_spans = max_spans
+        self._pending: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+        self._decided: "OrderedDict[int, bool]" = OrderedDict()
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self.kept = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    @property
+    def buffered_spans(self) -> int:
+        return self._buffered
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        self._delegate.on_start(span, parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        decisions = []
+        with self._lock:
+            decided = self._decided.get(trace_id)
+            if decided is None:
+                spans = self._pending.setdefault(trace_id, [])
+                spans.append(span)
+                self._buffered += 1
+                if span.parent is None or span.parent.is_remote:
+                    decisions.append(self._decide(trace_id, span))
+                while self._buffered > self._max_spans:
+                    self.evicted += 1
+                    decisions.append(self._decide(next(iter(self._pending)), None))
+
+        if decided:
+            self._delegate.on_end(span)
+        for keep, spans in decisions:
+            if keep:
+                for kept_span in spans:
+                    self._delegate.on_end(kept_span)
+
+    def _decide(self, trace_id: int, root: Optional[ReadableSpan]):
+        """Decide a pending trace; must be called with the lock held."""
+        spans = self._pending.pop(trace_id)
+        self._buffered -= len(spans)
+        if root is not None:
+            slow = root.end_time - root.start_time >= self._latency_ns
+        else:
+            slow = any(span.end_time - span.start_time >= self._latency_ns for span in spans)
+        keep = (
+            slow
+            or any(span.status.status_code is StatusCode.ERROR for span in spans)
+            or trace_id & 0xFFFFFFFFFFFFFFFF < self._bound
+        )
+        if keep:
+            self.kept += 1
+        else:
+            self.dropped += 1
+
+        if keep or root is not None:
+            self._decided[trace_id] = keep
+            if len(self._decided) > self._max_spans:
+                self._decided.popitem(last=False)
+        return keep, spans
+
+    def shutdown(self) -> None:
+        with self._lock:
+            decisions = [self._decide(trace_id, None) for trace_id in list(self._pending)]
+        for keep, spans in decisions:
+            if keep:
+                for span in spans:
+                    self._delegate.on_end(span)
+        self._delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self._delegate.force_flush(timeout_millis)
+
+
+def create_sampler(metrics: Optional[MetricsBackend] = None) -> Sampler:
+    """Create the configured sampler.
+
+    Every sampler follows the decision of a parent span, so distributed
+    traces are kept or dropped as a whole; the configured sampler decides
+    for root spans only. With metrics, each decision is counted as
+    trace_sampling_decisions{decision="sampled"|"dropped"}.
+    """
+    sampler_type = get_sampler_type()
+
+    if sampler_type == "ratio":
+        sampler: Sampler = ParentBased(TraceIdRatioBased(get_sampler_ratio()))
+    elif sampler_type == "rate_limit":
+        sampler = ParentBased(TokenBucketSampler(get_sampler_rate()))
+    else:
+        sampler = ParentBased(ALWAYS_ON)
+
+    if metrics is not None:
+        sampler = ReportingSampler(sampler, metrics)
+    return sampler
@@ -0,0 +1,230 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Sequence
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+from app.metrics.base import MetricsBackend
+
+logger = logging.getLogger(__name__)
+
+# Smallest batch the adaptive processor shrinks to when exports fail
+MIN_EXPORT_BATCH_SIZE = 16
+
+# Longest the adaptive processor backs off to, as a multiple of the configured schedule delay
+MAX_SCHEDULE_DELAY_FACTOR = 8
+
+
+def get_schedule_delay() -> float:
+    """Return the seconds a partial batch waits before it is exported.
+
+    Environment variables:
+        OTEL_BSP_SCHEDULE_DELAY: Milliseconds (default: 5000)
+    """
+    return max(float(os.environ.get("OTEL_BSP_SCHEDULE_DELAY", "5000")), 0.0) / 1000
+
+
+def get_max_queue_size() -> int:
+    """Return the number of finished spans queued before new ones are dropped.
+
+    Environment variables:
+        OTEL_BSP_MAX_QUEUE_SIZE: Spans per worker (default: 2048)
+    """
+    return max(int(os.environ.get("OTEL_BSP_MAX_QUEUE_SIZE", "2048")), 1)
+
+
+def get_max_export_batch_size() -> int:
+    """Return the largest number of spans sent in one export.
+
+    Environment variables:
+        OTEL_BSP_MAX_EXPORT_BATCH_SIZE: Spans (default: 512)
+    """
+    return max(int(os.environ.get("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")), 1)
+
+
+def get_adaptive_batching() -> bool:
+    """Return True when batch size and schedule delay follow export latency.
+
+    Environment variables:
+        OTEL_BSP_ADAPTIVE: Set to 'false' to always export with the
+            configured batch size and delay (default: true)
+    """
+    return os.environ.get("OTEL_BSP_ADAPTIVE", "true").lower() == "true"
+
+
+def get_target_export_latency() -> float:
+    """Return the export latency above which adaptive batching backs off.
+
+    Environment variables:
+        OTEL_BSP_TARGET_LATENCY: Milliseconds (default: 1000)
+    """
+    return max(float(os.environ.get("OTEL_BSP_TARGET_LATENCY", "1000")), 0.0) / 1000
+
+
+class AdaptiveBatchSpanProcessor(SpanProcessor):
+    """Batches finished spans to an exporter and reports on the pipeline.
+
+    Works like the SDK's BatchSpanProcessor: spans are queued, and a
+    background thread exports them once ``batch_size`` are waiting or
+    ``schedule_delay`` seconds have passed; when the queue is full, new
+    spans are dropped. Unlike it, queue size, export latency, batch size
+    and dropped spans (``queue_full`` or ``export_failed``) are reported
+    to ``metrics``, so a slow collector shows up before spans go missing.
+
+    With ``adaptive`` the processor backs off a collector that is
+    struggling. A failed export, which includes a timed-out one, halves
+    the batch size and doubles the schedule delay. An export that succeeds
+    but takes longer than ``target_latency`` only doubles the delay: a slow
+    collector's latency is mostly per request, so smaller batches would
+    drain the queue more slowly and drop more spans. Each export faster
+    than half the target moves both back toward their configured values.
+    Batches never grow beyond ``max_export_batch_size`` and the delay never
+    drops below ``schedule_delay``.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        metrics: Optional[MetricsBackend] = None,
+        max_queue_size: int = 2048,
+        max_export_batch_size: int = 512,
+        schedule_delay: float = 5.0,
+        adaptive: bool = True,
+        target_latency: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._exporter = exporter
+        self._metrics = metrics
+        self._max_queue_size = max_queue_size
+        self._max_export_batch_size = max_export_batch_size
+        self._min_export_batch_size = min(MIN_EXPORT_BATCH_SIZE, max_export_batch_size)
+        self._base_schedule_delay = schedule_delay
+        self._adaptive = adaptive
+        self._target_latency = target_latency
+        self._clock = clock
+
+        self.batch_size = max_export_batch_size
+        self.schedule_delay = schedule_delay
+
+        self._queue: Deque[ReadableSpan] = deque()
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._shutdown = False
+        # force_flush() requests and the last one the worker completed
+        self._flush_requested = 0
+        self._flushed = 0
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._queue)
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        pass
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if not span.context.trace_flags.sampled:
+            return
+        with self._condition:
+            if self._shutdown:
+                return
+            dropped = len(self._queue) >= self._max_queue_size
+            if not dropped:
+                self._queue.append(span)
+                if self._worker is None:
+                    self._start_worker()
+                if len(self._queue) == self.batch_size:
+                    self._condition.notify()
+        if dropped and self._metrics is not None:
+            self._metrics.inc_spans_dropped(1, "queue_full")
+
+    def _start_worker(self) -> None:
+        """Start the export thread; must be called with the lock held."""
+        self._worker = threading.Thread(target=self._run, name="span-export", daemon=True)
+        self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                deadline = self._clock() + self.schedule_delay
+                while (
+                    not self._shutdown
+                    and self._flush_requested == self._flushed
+                    and len(self._queue) < self.batch_size
+                ):
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._shutdown and not self._queue:
+                    self._flushed = self._flush_requested
+                    self._condition.notify_all()
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                flush_target = self._flush_requested
+
+            if batch:
+                self._export(batch)
+
+            with self._condition:
+                queue_size = len(self._queue)
+                if not queue_size and flush_target > self._flushed:
+                    self._flushed = flush_target
+                    self._condition.notify_all()
+            if self._metrics is not None:
+                self._metrics.set_span_queue_size(queue_size)
+
+    def _export(self, batch: Sequence[ReadableSpan]) -> None:
+        start = self._clock()
+        try:
+            succeeded = self._exporter.export(batch) is SpanExportResult.SUCCESS
+        except Exception:
+            logger.exception("Exception while exporting %d spans", len(batch))
+            succeeded = False
+        latency = self._clock() - start
+
+        if self._metrics is not None:
+            self._metrics.observe_span_export(len(batch), latency)
+            if not succeeded:
+                self._metrics.inc_spans_dropped(len(batch), "export_failed")
+        if self._adaptive:
+            self._adapt(latency, succeeded)
+
+    def _adapt(self, latency: float, succeeded: bool = True) -> None:
+        """Move batch size and schedule delay after an export that took ``latency`` seconds."""
+        if not succeeded:
+            self.batch_size = max(self._min_export_batch_size, self.batch_size // 2)
+        if not succeeded or latency > self._target_latency:
+            self.schedule_delay = min(
+                self._base_schedule_delay * MAX_SCHEDULE_DELAY_FACTOR, self.schedule_delay * 2
+            )
+        elif latency <= self._target_latency / 2:
+            self.batch_size = min(self._max_export_batch_size, self.batch_size * 2)
+            self.schedule_delay = max(self._base_schedule_delay, self.schedule_delay / 2)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Export every queued span; return False if that takes longer than the timeout."""
+        with self._condition:
+            if self._worker is None or not self._worker.is_alive():
+                return not self._queue
+            self._flush_requested += 1
+            target = self._flush_requested
+            self._condition.notify_all()
+            flushed = self._condition.wait_for(lambda: self._flushed >= target, timeout_millis / 1000)
+        return flushed
+
+    def shutdown(self) -> None:
+        """Export the remaining spans, stop the worker and shut down the exporter."""
+        with self._condition:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            self._condition.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join()
+        self._exporter.shutdown()
@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.metrics.base import MetricsBackend
+
+_executor_instance: Optional["TaskExecutor"] = None
+
+# Job currently running on this thread, used by report_progress()
+_current = threading.local()
+
+
+class TaskQueueFull(Exception):
+    """Raised when a task is submitted while the executor queue is full."""
+
+
+def report_progress(fraction: float) -> None:
+    """Report progress of the running task as a fraction between 0 and 1.
+
+    A no-op outside a thread-mode task; process-mode tasks only report the
+    queued/running/finished state.
+    """
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.progress = min(max(fraction, 0.0), 1.0)
+
+
+class Job:
+    """State of one submitted task."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.state = "queued"
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("succeeded", "failed")
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until the task finishes; cooperative under gevent monkey patching."""
+        self.future.exception(timeout=timeout)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "progress": self.progress,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class TaskExecutor:
+    """Bounded executor that runs tasks off the request worker.
+
+    Tasks always run on a thread pool so their lifecycle can be tracked; in
+    process mode each pool thread hands the call to a process pool of the
+    same size and waits for it. At most ``max_queue`` tasks may wait for a
+    free worker, after which submit() raises TaskQueueFull. Finished jobs are
+    kept for status lookups until ``max_jobs`` is exceeded, oldest first.
+    """
+
+    def __init__(
+        self,
+        metrics: MetricsBackend,
+        mode: str = "thread",
+        max_workers: int = 4,
+        max_queue: int = 16,
+        max_jobs: int = 1000,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown task executor mode: {mode}")
+        self.mode = mode
+        self._metrics = metrics
+        self._max_queue = max_queue
+        self._max_jobs = max_jobs
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task")
+        self._processes = None
+        if mode == "process":
+            # Pulls in multiprocessing, which thread mode never needs
+            from concurrent.futures import ProcessPoolExecutor
+            self._processes = ProcessPoolExecutor(max_workers=max_workers)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def submit(self, func: Callable, *args) -> Job:
+        """Queue func(*args) and return its Job without waiting for it."""
+        job = Job()
+        with self._lock:
+            if self._queued >= self._max_queue:
+                raise TaskQueueFull(f"{self._queued} tasks already queued")
+            self._queued += 1
+            self._jobs[job.id] = job
+            self._evict_finished()
+            self._metrics.set_task_queue_depth(self._queued)
+        job.future = self._threads.submit(self._run, job, func, args)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
+
+    def _run(self, job: Job, func: Callable, args: tuple) -> None:
+        job.started_at = time.time()
+        job.state = "running"
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._metrics.set_task_queue_depth(self._queued)
+            self._metrics.set_tasks_running(self._running)
+            self._metrics.observe_task_queue_wait(job.started_at - job.submitted_at)
+
+        _current.job = job
+        try:
+            if self._processes is not None:
+                self._processes.submit(func, *args).result()
+            else:
+                func(*args)
+            job.progress = 1.0
+            job.state = "succeeded"
+        except Exception as e:
+            job.error = repr(e)
+            job.state = "failed"
+            raise
+        finally:
+            _current.job = None
+            job.finished_at = time.time()
+            with self._lock:
+                self._running -= 1
+                self._metrics.set_tasks_running(self._running)
+
+    def _evict_finished(self) -> None:
+        """Drop the oldest finished jobs beyond max_jobs. Lock must be held."""
+        excess = len(self._jobs) - self._max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done][:excess]:
+            del self._jobs[job_id]
+
+
+def get_task_executor() -> TaskExecutor:
+    """Factory function to get the shared task executor.
+
+    Environment variables:
+        TASK_EXECUTOR: 'thread' (default) or 'process'
+        TASK_WORKERS: Maximum tasks running at once (default: 4)
+        TASK_QUEUE_SIZE: Maximum tasks waiting for a worker (default: 16)
+    """
+    global _executor_instance
+
+    if _executor_instance is not None:
+        return _executor_instance
+
+    from app.metrics import get_metrics_backend
+
+    _executor_instance = TaskExecutor(
+        get_metrics_backend(),
+        mode=os.environ.get("TASK_EXECUTOR", "thread").lower(),
+        max_workers=int(os.environ.get("TASK_WORKERS", "4")),
+        max_queue=int(os.environ.get("TASK_QUEUE_SIZE", "16")),
+    )
+    return _executor_instance
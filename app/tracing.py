@@ -1,44 +1,193 @@
 import os
+import threading
+from typing import Optional
 
-from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
-from opentelemetry.sdk.resources import Resource, SERVICE_NAME
-from opentelemetry.instrumentation.flask import FlaskInstrumentor
+# Keep-alive connections kept per collector host by the shared OTLP/HTTP
+# session: one for the span export thread and one for the metric reader
+OTLP_HTTP_POOL_SIZE = 2
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_exporter_type() -> str:
+    """Return the configured exporter type string.
+
+    Environment variables:
+        OTEL_EXPORTER: 'console' (default), 'otlp' (gRPC), 'otlp_http'
+            (protobuf over HTTP), or 'none' to disable tracing and, unless
+            OTEL_METRICS_EXPORTER says otherwise, OTel metric export
+    """
+    return os.environ.get("OTEL_EXPORTER", "console").lower()
+
+
+def get_metrics_exporter_type() -> str:
+    """Return the exporter type of the OTel metrics backend.
+
+    Environment variables:
+        OTEL_METRICS_EXPORTER: 'console', 'otlp', 'otlp_http', 'prometheus'
+            to serve OTel metrics at /metrics instead of pushing them, or
+            'none' (default: OTEL_EXPORTER)
+    """
+    return os.environ.get("OTEL_METRICS_EXPORTER", get_exporter_type()).lower()
+
+
+def get_otlp_endpoint(exporter_type: Optional[str] = None) -> str:
+    """Return the OTLP collector base URL for ``exporter_type`` (default: the span exporter).
+
+    Environment variables:
+        OTEL_EXPORTER_OTLP_ENDPOINT: Collector URL (default:
+            http://localhost:4317 for 'otlp', http://localhost:4318 for
+            'otlp_http')
+    """
+    exporter_type = exporter_type or get_exporter_type()
+    default = "http://localhost:4318" if exporter_type == "otlp_http" else "http://localhost:4317"
+    return os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", default)
+
+
+def get_otlp_compression(exporter_type: Optional[str] = None) -> str:
+    """Return the compression of OTLP export requests for ``exporter_type`` (default: the span exporter).
+
+    Environment variables:
+        OTEL_EXPORTER_OTLP_COMPRESSION: 'gzip', 'deflate' or 'none'
+            (default: 'gzip' for 'otlp_http', 'none' for 'otlp')
+    """
+    exporter_type = exporter_type or get_exporter_type()
+    default = "gzip" if exporter_type == "otlp_http" else "none"
+    return os.environ.get("OTEL_EXPORTER_OTLP_COMPRESSION", default).lower()
+
+
+def get_otlp_http_session():
+    """Return the requests session shared by the OTLP/HTTP span and metric exporters.
+
+    Both exporters post to the same collector, so one pool of keep-alive
+    connections serves them and each export reuses an open connection
+    instead of paying for a new TCP (and TLS) handshake.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OTLP_HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def otlp_grpc_compression():
+    """Return the grpc.Compression for get_otlp_compression()."""
+    from grpc import Compression
+
+    return {"gzip": Compression.Gzip, "deflate": Compression.Deflate}.get(
+        get_otlp_compression("otlp"), Compression.NoCompression
+    )
+
+
+def otlp_http_compression():
+    """Return the OTLP/HTTP Compression for get_otlp_compression()."""
+    from opentelemetry.exporter.otlp.proto.http import Compression
+
+    return {"gzip": Compression.Gzip, "deflate": Compression.Deflate}.get(
+        get_otlp_compression("otlp_http"), Compression.NoCompression
+    )
+
+
+def get_excluded_urls() -> str:
+    """Return the comma-separated URL patterns that are never traced.
+
+    Metrics scrapes and dashboard polling are excluded by default, so
+    watching the app does not add spans or sampling decisions.
+
+    Environment variables:
+        OTEL_PYTHON_FLASK_EXCLUDED_URLS: Regular expressions matched against
+            the request URL (default: /metrics,/api/metrics)
+    """
+    return os.environ.get("OTEL_PYTHON_FLASK_EXCLUDED_URLS", "/metrics,/api/metrics")
 
 
 def _create_span_exporter():
     """Create the appropriate span exporter based on configuration.
 
+    The exporter modules are imported here, so the OTLP/gRPC and OTLP/HTTP
+    stacks are only loaded when they are configured.
+
     Environment variables:
-        OTEL_EXPORTER: 'console' (default) or 'otlp'
-        OTEL_EXPORTER_OTLP_ENDPOINT: OTLP endpoint URL (default: http://localhost:4317)
-        OTEL_EXPORTER_OTLP_INSECURE: Set to 'true' for insecure connection
+        OTEL_EXPORTER: 'console' (default), 'otlp' or 'otlp_http'
+        OTEL_EXPORTER_OTLP_ENDPOINT: OTLP endpoint URL, see get_otlp_endpoint()
+        OTEL_EXPORTER_OTLP_INSECURE: Set to 'true' for insecure gRPC connection
+        OTEL_EXPORTER_OTLP_COMPRESSION: See get_otlp_compression()
     """
-    exporter_type = os.environ.get("OTEL_EXPORTER", "console").lower()
+    exporter_type = get_exporter_type()
 
     if exporter_type == "otlp":
         from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 
-        endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
         insecure = os.environ.get("OTEL_EXPORTER_OTLP_INSECURE", "true").lower() == "true"
 
-        return OTLPSpanExporter(endpoint=endpoint, insecure=insecure)
+        return OTLPSpanExporter(endpoint=get_otlp_endpoint(), insecure=insecure, compression=otlp_grpc_compression())
+    elif exporter_type == "otlp_http":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(
+            endpoint=f"{get_otlp_endpoint().rstrip('/')}/v1/traces",
+            compression=otlp_http_compression(),
+            session=get_otlp_http_session(),
+        )
     else:
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
         return ConsoleSpanExporter()
 
 
-def init_tracing(app):
+def init_tracing(app, metrics=None):
     """Initialize OpenTelemetry tracing.
 
-    Uses OTEL_EXPORTER env var to select console (default) or otlp exporter.
+    Uses OTEL_EXPORTER env var to select console (default), otlp or otlp_http exporter.
+    With OTEL_EXPORTER=none tracing is disabled and neither the OTel SDK
+    nor the Flask instrumentation is imported. Traces are sampled as configured
+    by OTEL_SAMPLER (see app.sampling); sampling decisions are counted in
+    metrics when given. With OTEL_TAIL_SAMPLING=true finished traces are
+    filtered by a TailSamplingSpanProcessor before export. Spans are
+    exported by an AdaptiveBatchSpanProcessor, which reports queue size,
+    export latency, batch size and dropped spans to metrics.
     """
+    if get_exporter_type() == "none":
+        return
+
+    from opentelemetry import trace
+    from opentelemetry.instrumentation.flask import FlaskInstrumentor
+    from opentelemetry.sdk.resources import Resource, SERVICE_NAME
+    from opentelemetry.sdk.trace import TracerProvider
+
+    from app import sampling, span_pipeline
+
     resource = Resource(attributes={
         SERVICE_NAME: "prom-metrics-app"
     })
-    provider = TracerProvider(resource=resource)
-    processor = BatchSpanProcessor(_create_span_exporter())
+    provider = TracerProvider(resource=resource, sampler=sampling.create_sampler(metrics))
+    processor = span_pipeline.AdaptiveBatchSpanProcessor(
+        _create_span_exporter(),
+        metrics,
+        max_queue_size=span_pipeline.get_max_queue_size(),
+        max_export_batch_size=span_pipeline.get_max_export_batch_size(),
+        schedule_delay=span_pipeline.get_schedule_delay(),
+        adaptive=span_pipeline.get_adaptive_batching(),
+        target_latency=span_pipeline.get_target_export_latency(),
+    )
+    if sampling.get_tail_sampling_enabled():
+        processor = sampling.TailSamplingSpanProcessor(
+            processor,
+            latency=sampling.get_tail_sampling_latency(),
+            ratio=sampling.get_tail_sampling_ratio(),
+            max_spans=sampling.get_tail_sampling_max_spans(),
+        )
     provider.add_span_processor(processor)
     trace.set_tracer_provider(provider)
 
-    FlaskInstrumentor().instrument_app(app)
+    # The global provider can only be set once per process; the app uses its own either way
+    FlaskInstrumentor().instrument_app(app, tracer_provider=provider, excluded_urls=get_excluded_urls())
+    app.extensions["tracer_provider"] = provider
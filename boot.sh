@@ -1,3 +1,12 @@
 #!/bin/bash
 source venv/bin/activate
-exec gunicorn -b :5000 --timeout 90 --worker-class=gevent --access-logfile - --error-logfile - prom-metrics-app:app
+WORKERS="${GUNICORN_WORKERS:-1}"
+# Share metrics between gunicorn workers (see gunicorn.conf.py). A single worker
+# is left in single-process mode, where prometheus_client keeps exemplars.
+if [ "$WORKERS" -gt 1 ]; then
+    # Aggregate Prometheus metrics across gunicorn workers
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prom-metrics-app}"
+    # Export OTel metrics of all workers from one elected worker
+    export OTEL_MULTIPROC_DIR="${OTEL_MULTIPROC_DIR:-/dev/shm/prom-metrics-app-otel}"
+fi
+exec gunicorn -b :5000 --timeout 90 --worker-class=gevent --workers "$WORKERS" --config gunicorn.conf.py --access-logfile - --error-logfile - prom-metrics-app:app
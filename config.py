@@ -12,3 +12,4 @@ class Config(object):
     SECRET_KEY = os.environ.get("SECRET_KEY") or secrets.token_hex(32)
     LOG_TO_STDOUT = os.environ.get("LOG_TO_STDOUT")
     METRICS_BACKEND = os.environ.get("METRICS_BACKEND", "prometheus")
+    TASK_DURATION = float(os.environ.get("TASK_DURATION", "5"))
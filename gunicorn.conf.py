@@ -0,0 +1,24 @@
+"""Gunicorn server hooks.
+
+Keeps the Prometheus multiprocess directory (PROMETHEUS_MULTIPROC_DIR, see
+boot.sh) and the OTel shared directory (OTEL_MULTIPROC_DIR) consistent
+across worker restarts, starts a new metric snapshot run so one worker
+restores the totals of the previous run (METRICS_SNAPSHOT_PATH), and makes
+exiting workers apply their buffered request metrics first.
+"""
+from app.metrics import flush_metrics_backend, multiprocess, otel_multiprocess, persistence
+
+
+def on_starting(server):
+    multiprocess.prepare_multiproc_dir()
+    otel_multiprocess.prepare_otel_multiproc_dir()
+    persistence.start_snapshot_run()
+
+
+def child_exit(server, worker):
+    multiprocess.mark_worker_dead(worker.pid)
+    otel_multiprocess.mark_worker_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    flush_metrics_backend()
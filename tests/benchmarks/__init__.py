@@ -0,0 +1,5 @@
+"""Standalone benchmarks.
+
+Benchmark modules are named ``bench_*.py`` so pytest does not collect them.
+Run one with ``python -m tests.benchmarks.<module>`` from the project root.
+"""
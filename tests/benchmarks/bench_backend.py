@@ -0,0 +1,235 @@
+"""Hot-path and summary cost of the MetricsBackend implementations.
+
+Times inc_requests, time_request, time_request_decorator and
+record_request on PrometheusMetrics and OTelMetrics, single-threaded and
+spread over N threads or N gevent greenlets, and get_metrics_summary() as
+the number of labelled series grows. Every backend and concurrency mode
+runs in a fresh interpreter; greenlet runs monkey-patch first, as
+gunicorn's gevent worker does. Each case is the best of --repeat runs,
+with the cost of an empty call subtracted.
+
+Results can be written as JSON and compared with an earlier run: any case
+slower than the baseline by more than --threshold is reported and the
+exit status is 1, so two commits can be compared with
+
+    python -m tests.benchmarks.bench_backend --output base.json    # on the old commit
+    python -m tests.benchmarks.bench_backend --baseline base.json  # on the new one
+
+Usage:
+    python -m tests.benchmarks.bench_backend [--concurrency 1,4,16] [--ops 20000]
+        [--series 1,10,100,1000] [--output FILE] [--baseline FILE] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BACKENDS = ("prometheus", "otel")
+HOT_PATH = ("inc_requests", "time_request", "time_request_decorator", "record_request")
+RESULT_PREFIX = '{"results"'
+
+
+def _hot_path_cases(metrics):
+    """Return {name: zero-argument callable} for every hot-path operation."""
+    def timed_block():
+        with metrics.time_request("/index", "GET"):
+            pass
+
+    @metrics.time_request_decorator(labels=lambda: ("/index", "GET"))
+    def decorated():
+        pass
+
+    return {
+        "noop": lambda: None,
+        "inc_requests": lambda: metrics.inc_requests("/index", "GET", "2xx"),
+        "time_request": timed_block,
+        "time_request_decorator": decorated,
+        "record_request": lambda: metrics.record_request("/index", "GET", 200, 0.01),
+    }
+
+
+def _run_concurrent(func, workers, ops, greenlets):
+    """Return wall-clock ns per call of func, called ops times in total by workers."""
+    per_worker = max(ops // workers, 1)
+
+    def work():
+        for _ in range(per_worker):
+            func()
+
+    start = time.perf_counter_ns()
+    if greenlets:
+        import gevent
+        gevent.joinall([gevent.spawn(work) for _ in range(workers)])
+    else:
+        import threading
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return (time.perf_counter_ns() - start) / (per_worker * workers)
+
+
+def _summary_ns(metrics, repeat):
+    """Return ns per get_metrics_summary() call, the best of repeat runs."""
+    calls = 20
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            metrics.get_metrics_summary()
+        best = min(best, (time.perf_counter_ns() - start) / calls)
+    return best
+
+
+def _child(args):
+    if args.mode == "greenlets":
+        from gevent import monkey
+        monkey.patch_all()
+
+    os.environ["METRICS_BACKEND"] = args.backend
+    os.environ.setdefault("OTEL_EXPORTER", "console")
+    os.environ["METRICS_MAX_SERIES"] = str(max(_int_list(args.series)) + 10)
+    from app.metrics import get_metrics_backend
+
+    metrics = get_metrics_backend()
+    cases = _hot_path_cases(metrics)
+    for func in cases.values():
+        func()  # resolve label children up front
+
+    results = {}
+    for workers in _int_list(args.concurrency):
+        if args.mode == "threads" and workers == 1:
+            label = "threads=1"
+        else:
+            label = f"{args.mode}={workers}"
+        timings = {
+            name: min(_run_concurrent(func, workers, args.ops, args.mode == "greenlets") for _ in range(args.repeat))
+            for name, func in cases.items()
+        }
+        for name in HOT_PATH:
+            results[f"{args.backend}/{name}/{label}"] = max(timings[name] - timings["noop"], 0.0)
+
+    if args.mode == "threads":
+        recorded = 0
+        for series in sorted(_int_list(args.series)):
+            # Label sets stay registered, so only the new routes are recorded
+            for i in range(recorded, series):
+                metrics.record_request(f"/route/{i}", "GET", 200, 0.01 * (i % 10))
+            recorded = series
+            metrics.flush()
+            results[f"{args.backend}/get_metrics_summary/series={series}"] = _summary_ns(metrics, args.repeat)
+    print(json.dumps({"results": results}))
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+def _run_child(backend, mode, args):
+    command = [
+        sys.executable, "-m", "tests.benchmarks.bench_backend", "--child",
+        "--backend", backend, "--mode", mode, "--concurrency", args.concurrency,
+        "--ops", str(args.ops), "--series", args.series, "--repeat", str(args.repeat),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    # The OTel console exporter may print its final export after our line
+    return json.loads(next(line for line in output.splitlines() if line.startswith(RESULT_PREFIX)))["results"]
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "unit": "ns/op",
+    }
+
+
+def compare(baseline, current, threshold):
+    """Return (case, baseline ns, current ns, ratio, regressed) for cases present in both runs.
+
+    A case regressed when it is more than threshold (a fraction) slower than
+    the baseline.
+    """
+    rows = []
+    for case, base in baseline.items():
+        if case not in current:
+            continue
+        now = current[case]
+        ratio = now / base if base else float("inf") if now else 1.0
+        rows.append((case, base, now, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16", help="Thread and greenlet counts")
+    parser.add_argument("--ops", type=int, default=20000, help="Calls per case, split across workers")
+    parser.add_argument("--series", default="1,10,100,1000", help="Route label sets for get_metrics_summary()")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is kept")
+    parser.add_argument("--no-greenlets", action="store_true", help="Skip gevent runs")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with results from an earlier --output")
+    parser.add_argument("--results", help="Compare this results file instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown against the baseline")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=("threads", "greenlets"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    if args.results:
+        with open(args.results) as f:
+            report = json.load(f)
+    else:
+        modes = ["threads"]
+        if not args.no_greenlets:
+            try:
+                import gevent  # noqa: F401
+                modes.append("greenlets")
+            except ImportError:
+                print("gevent is not installed, skipping greenlet runs")
+        results = {}
+        for backend in BACKENDS:
+            for mode in modes:
+                results.update(_run_child(backend, mode, args))
+        report = {"meta": run_metadata(), "results": results}
+
+        print(f"{'case':>52} {'ns/op':>12}")
+        for case, value in report["results"].items():
+            print(f"{case:>52} {value:>12.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(baseline["results"], report["results"], args.threshold)
+        print(f"\nagainst {baseline['meta'].get('commit')} (threshold +{args.threshold:.0%})")
+        print(f"{'case':>52} {'base':>12} {'now':>12} {'change':>8}")
+        for case, base, now, ratio, regressed in rows:
+            flag = "  REGRESSED" if regressed else ""
+            print(f"{case:>52} {base:>12.0f} {now:>12.0f} {ratio - 1:>+8.1%}{flag}")
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
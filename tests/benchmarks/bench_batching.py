@@ -0,0 +1,135 @@
+"""Lock acquisitions and per-request cost of recording request metrics, with and without batching.
+
+Each configuration runs in a fresh interpreter. Several threads call
+record_request() as the request middleware would; with batching the
+requests are buffered per thread and applied by a background flush. Lock
+acquisitions are counted in a separate run in which threading.Lock is
+replaced by a counting wrapper before prometheus_client and the OTel SDK
+are imported, so the timed run is not slowed down by the counting.
+
+Usage:
+    python -m tests.benchmarks.bench_batching [--threads 8] [--requests 20000]
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROUTES = ("/", "/index", "/do_task", "/view_metrics")
+STATUSES = (200, 200, 200, 404)
+
+
+def _install_counting_locks(counter):
+    """Replace threading.Lock with a wrapper counting every acquisition."""
+    import _thread
+
+    class CountingLock:
+        __slots__ = ("_lock",)
+
+        def __init__(self):
+            self._lock = _thread.allocate_lock()
+
+        def acquire(self, blocking=True, timeout=-1):
+            next(counter)
+            return self._lock.acquire(blocking, timeout)
+
+        def release(self):
+            self._lock.release()
+
+        def locked(self):
+            return self._lock.locked()
+
+        __enter__ = acquire
+
+        def __exit__(self, *args):
+            self._lock.release()
+
+    threading.Lock = CountingLock
+
+
+def _child(backend, interval, threads, requests, count_locks):
+    counter = itertools.count()
+    if count_locks:
+        _install_counting_locks(counter)
+
+    os.environ["METRICS_BACKEND"] = backend
+    os.environ["METRICS_BATCH_INTERVAL"] = str(interval)
+    os.environ.setdefault("OTEL_EXPORTER", "console")
+    from app.metrics import get_metrics_backend
+
+    metrics = get_metrics_backend()
+    for route in ROUTES:
+        metrics.record_request(route, "GET", 200, 0.01)  # resolve label children up front
+    metrics.flush()
+
+    def work(seed):
+        for i in range(requests):
+            metrics.record_request(ROUTES[(seed + i) % len(ROUTES)], "GET", STATUSES[i % len(STATUSES)], 0.01 * (i % 7))
+
+    workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    locks_before = next(counter)
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    metrics.flush()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    locks = next(counter) - locks_before - 1
+
+    total = threads * requests
+    assert metrics.get_metrics_summary()["http_requests"]["value"] == total + len(ROUTES)
+    print(json.dumps({
+        "us_per_request": elapsed / total * 1e6,
+        "cpu_us_per_request": cpu / total * 1e6,
+        "locks_per_request": locks / total,
+    }))
+
+
+def _run(backend, interval, threads, requests, count_locks):
+    args = [
+        sys.executable, "-m", "tests.benchmarks.bench_batching", "--child",
+        "--backend", backend, "--interval", str(interval),
+        "--threads", str(threads), "--requests", str(requests),
+    ]
+    if count_locks:
+        args.append("--count-locks")
+    output = subprocess.run(args, check=True, capture_output=True, text=True).stdout
+    # The OTel console exporter prints its final export after our line
+    return json.loads(next(line for line in output.splitlines() if line.startswith('{"us_per_request"')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent request threads")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per thread")
+    parser.add_argument("--interval", type=float, default=1.0, help="Batch interval when batching")
+    parser.add_argument("--backend", choices=("prometheus", "otel"), help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--count-locks", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.backend, args.interval, args.threads, args.requests, args.count_locks)
+        return
+
+    print(f"{args.threads} threads x {args.requests} requests")
+    print(f"{'backend':>11} {'mode':>10} {'locks/req':>10} {'us/req':>8} {'cpu us/req':>11}")
+    for backend in ("prometheus", "otel"):
+        for mode, interval in (("direct", 0), ("batched", args.interval)):
+            timed = _run(backend, interval, args.threads, args.requests, count_locks=False)
+            counted = _run(backend, interval, args.threads, min(args.requests, 5000), count_locks=True)
+            print(
+                f"{backend:>11} {mode:>10} {counted['locks_per_request']:>10.2f} "
+                f"{timed['us_per_request']:>8.2f} {timed['cpu_us_per_request']:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
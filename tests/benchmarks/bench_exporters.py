@@ -0,0 +1,103 @@
+"""Bytes on the wire and export latency of each OTLP exporter mode.
+
+Exports the same batches of Flask-like request spans, and the metrics of
+the OTel backend after the same requests, through OTLP/gRPC and OTLP/HTTP
+with and without gzip, to a local stand-in collector (tests/collector.py).
+Reports wire bytes per span export and metric export, the protobuf payload
+size, mean and p99 span export latency, and how many connections were
+opened. ``--delay`` adds collector-side latency to every export.
+
+Usage:
+    python -m tests.benchmarks.bench_exporters [--batches 50] [--batch-size 512] [--delay 0]
+"""
+import argparse
+import os
+import time
+
+os.environ["METRICS_BACKEND"] = "otel"
+
+from opentelemetry.sdk.metrics import MeterProvider  # noqa: E402
+
+from tests.collector import StandInCollector, make_spans  # noqa: E402
+
+MODES = (
+    ("otlp", "none"),
+    ("otlp", "gzip"),
+    ("otlp_http", "none"),
+    ("otlp_http", "gzip"),
+)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _run(collector, exporter_type, compression, spans, batches):
+    import app.tracing
+    from app.metrics.otel import _create_metric_reader
+    from app.tracing import _create_span_exporter
+
+    proxy = collector.grpc if exporter_type == "otlp" else collector.http
+    endpoint = collector.grpc_endpoint if exporter_type == "otlp" else collector.http_endpoint
+    os.environ.update(
+        OTEL_EXPORTER=exporter_type, OTEL_EXPORTER_OTLP_ENDPOINT=endpoint, OTEL_EXPORTER_OTLP_COMPRESSION=compression,
+    )
+    app.tracing._http_session = None
+    collector.exports.clear()
+    wire_before, connections_before = proxy.wire_bytes, proxy.connections
+
+    exporter = _create_span_exporter()
+    latencies = []
+    for _ in range(batches):
+        start = time.perf_counter()
+        exporter.export(spans)
+        latencies.append(time.perf_counter() - start)
+    span_wire = (proxy.wire_bytes - wire_before) / batches
+    payload = sum(export.payload_bytes for export in collector.signal("traces")) / batches
+
+    reader = _create_metric_reader()
+    provider = MeterProvider(metric_readers=[reader])
+    histogram = provider.get_meter(__name__).create_histogram("request_processing_seconds")
+    for i in range(1000):
+        histogram.record(i / 1000, {"route": f"/route/{i % 20}", "method": "GET"})
+    wire_before = proxy.wire_bytes
+    reader.force_flush()
+    metric_wire = proxy.wire_bytes - wire_before
+    provider.shutdown()
+    exporter.shutdown()
+
+    return {
+        "mode": f"{exporter_type}/{compression}",
+        "span_wire": span_wire,
+        "payload": payload,
+        "metric_wire": metric_wire,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "connections": proxy.connections - connections_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--delay", type=float, default=0.0, help="collector latency per export, seconds")
+    args = parser.parse_args()
+
+    spans = make_spans(args.batch_size)
+    with StandInCollector(delay=args.delay) as collector:
+        rows = [_run(collector, *mode, spans, args.batches) for mode in MODES]
+
+    print(f"{args.batches} exports of {args.batch_size} spans")
+    print(f"{'mode':<16} {'span B/export':>14} {'payload B':>10} {'metric B':>9} "
+          f"{'mean ms':>8} {'p99 ms':>8} {'conns':>6}")
+    for row in rows:
+        print(
+            f"{row['mode']:<16} {row['span_wire']:>14.0f} {row['payload']:>10.0f} {row['metric_wire']:>9} "
+            f"{row['mean_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['connections']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""End-to-end throughput, latency and instrumentation overhead under a request mix.
+
+Drives create_app() through its WSGI interface from several threads with a
+weighted mix of /index, /do_task (with TASK_DURATION shortened), unknown
+URLs (404) and /metrics scrapes. Every METRICS_BACKEND and OTEL_EXPORTER
+combination runs in a fresh interpreter, next to a "bare" run of the same
+app with tracing and request metrics removed. The difference in process
+CPU time per request, which includes background span export, is the
+per-request instrumentation overhead; latency differences are inflated by
+the threads queueing for the GIL.
+
+With --url the same mix is sent over HTTP to a running server instead,
+e.g. a local gunicorn started with boot.sh, and only that server's
+configuration is measured.
+
+Usage:
+    python -m tests.benchmarks.bench_load [--concurrency 8] [--requests 5000]
+        [--mix index=70,do_task=10,404=10,metrics=10] [--exporters console,otlp]
+        [--url http://localhost:5000] [--output FILE]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BACKENDS = ("prometheus", "otel")
+PATHS = {
+    "index": "/index",
+    "do_task": "/do_task",
+    "404": "/no-such-page",
+    "metrics": "/metrics",
+}
+RESULT_PREFIX = '{"load"'
+
+
+def _parse_mix(value):
+    """Parse 'index=70,404=10' into a list of paths to draw requests from."""
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in PATHS:
+            raise argparse.ArgumentTypeError(f"unknown route {name!r}, expected one of {', '.join(PATHS)}")
+        weights[PATHS[name]] = int(weight or 1)
+    return [path for path, weight in weights.items() for _ in range(weight)]
+
+
+def _drive(send, paths, concurrency, requests):
+    """Send requests spread over concurrency threads; return (elapsed, cpu, latencies, statuses)."""
+    per_thread = max(requests // concurrency, 1)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def work(seed):
+        rng = random.Random(seed)
+        local_latencies = []
+        local_statuses = {}
+        for _ in range(per_thread):
+            path = rng.choice(paths)
+            start = time.perf_counter()
+            status = send(path)
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(concurrency)]
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, time.process_time() - cpu_start, latencies, statuses
+
+
+def _report(elapsed, cpu, latencies, statuses):
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "cpu_us": cpu / len(latencies) * 1e6,
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def _strip_instrumentation(app):
+    """Remove tracing and request metrics from app, keeping the /metrics mount."""
+    from opentelemetry.instrumentation.flask import FlaskInstrumentor
+    from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+    mounts = getattr(app.wsgi_app, "mounts", None)
+    # Restores the wsgi_app from before instrumentation, dropping every wrapper added since
+    FlaskInstrumentor().uninstrument_app(app)
+    if mounts:
+        app.wsgi_app = DispatcherMiddleware(app.wsgi_app, mounts)
+
+
+def _child(args):
+    os.environ["METRICS_BACKEND"] = args.backend
+    os.environ["OTEL_EXPORTER"] = args.exporter if args.exporter != "bare" else "console"
+    os.environ.setdefault("TASK_DURATION", str(args.task_duration))
+    os.environ.setdefault("TASK_QUEUE_SIZE", str(max(16, args.concurrency * 2)))
+    from werkzeug.test import Client
+
+    from app import create_app
+
+    app = create_app()
+    if args.exporter == "bare":
+        _strip_instrumentation(app)
+
+    local = threading.local()
+
+    def send(path):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = Client(app)
+        response = client.get(path)
+        response.close()
+        return response.status_code
+
+    paths = _parse_mix(args.mix)
+    _drive(send, paths, args.concurrency, min(args.requests, 500))  # warm up
+    result = _report(*_drive(send, paths, args.concurrency, args.requests))
+    print(json.dumps({"load": result}))
+
+
+def _run_child(backend, exporter, args):
+    command = [
+        sys.executable, "-m", "tests.benchmarks.bench_load", "--child",
+        "--backend", backend, "--exporter", exporter, "--mix", args.mix,
+        "--concurrency", str(args.concurrency), "--requests", str(args.requests),
+        "--task-duration", str(args.task_duration),
+    ]
+    env = dict(os.environ, LOG_TO_STDOUT="1")
+    output = subprocess.run(command, check=True, capture_output=True, text=True, env=env).stdout
+    # Console span output shares stdout with our line
+    return json.loads(next(line for line in output.splitlines() if line.startswith(RESULT_PREFIX)))["load"]
+
+
+def _run_url(args):
+    import requests
+
+    local = threading.local()
+    base = args.url.rstrip("/")
+
+    def send(path):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        return session.get(base + path).status_code
+
+    paths = _parse_mix(args.mix)
+    _drive(send, paths, args.concurrency, min(args.requests, 500))
+    return _report(*_drive(send, paths, args.concurrency, args.requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per configuration")
+    parser.add_argument("--mix", default="index=70,do_task=10,404=10,metrics=10", help="Weighted route mix")
+    parser.add_argument("--exporters", default="console,otlp", help="OTEL_EXPORTER values to compare")
+    parser.add_argument("--task-duration", type=float, default=0.01, help="TASK_DURATION for /do_task")
+    parser.add_argument("--url", help="Load a running server instead of in-process apps")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--exporter", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    try:
+        _parse_mix(args.mix)
+    except (argparse.ArgumentTypeError, ValueError) as exc:
+        parser.error(str(exc))
+
+    if args.child:
+        _child(args)
+        return
+
+    print(f"{args.concurrency} threads x {args.requests} requests, mix {args.mix}")
+    header = f"{'backend':>11} {'exporter':>9} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'cpu us':>8} {'overhead us':>12}  statuses"
+    results = {}
+    if args.url:
+        results[args.url] = result = _run_url(args)
+        print(header)
+        print(f"{'-':>11} {'-':>9} {result['rps']:>8.0f} {result['p50_ms']:>8.2f} {result['p90_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {'-':>8} {'-':>12}  {result['statuses']}")
+    else:
+        rows = []
+        for backend in BACKENDS:
+            bare = _run_child(backend, "bare", args)
+            results[f"{backend}/bare"] = bare
+            rows.append((backend, "bare", bare, None))
+            for exporter in args.exporters.split(","):
+                result = _run_child(backend, exporter, args)
+                result["overhead_us"] = result["cpu_us"] - bare["cpu_us"]
+                results[f"{backend}/{exporter}"] = result
+                rows.append((backend, exporter, result, result["overhead_us"]))
+        print(header)
+        for backend, exporter, result, overhead in rows:
+            overhead = "-" if overhead is None else f"{overhead:.0f}"
+            print(f"{backend:>11} {exporter:>9} {result['rps']:>8.0f} {result['p50_ms']:>8.2f} "
+                  f"{result['p90_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['cpu_us']:>8.0f} {overhead:>12}  "
+                  f"{result['statuses']}")
+
+    if args.output:
+        from tests.benchmarks.bench_backend import run_metadata
+
+        with open(args.output, "w") as f:
+            json.dump({"meta": run_metadata(), "results": results}, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
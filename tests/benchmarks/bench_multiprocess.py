@@ -0,0 +1,92 @@
+"""Cost of a multiprocess /metrics scrape as the number of workers grows.
+
+Each simulated worker is a forked process that records traffic through
+PrometheusMetrics and exits, leaving its mmap files behind. The scrape is
+timed with every worker file present, and again after the dead workers have
+been folded into archive files by mark_worker_dead.
+
+Usage:
+    python -m tests.benchmarks.bench_multiprocess [--workers 1,2,4,8,16,32]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+# The multiprocess value class is chosen when prometheus_client is imported,
+# so the directory must be configured before anything imports it.
+os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="bench-multiproc-")
+
+from prometheus_client import generate_latest  # noqa: E402
+
+from app.metrics import multiprocess  # noqa: E402
+
+
+def _worker(requests):
+    from app.metrics.prometheus import PrometheusMetrics
+
+    metrics = PrometheusMetrics()
+    for i in range(requests):
+        metrics.inc_requests()
+        if i % 10 == 0:
+            metrics.inc_4xx()
+        else:
+            metrics.inc_successful()
+        with metrics.time_request():
+            pass
+
+
+def _spawn_workers(count, requests):
+    ctx = multiprocessing.get_context("fork")
+    pids = []
+    for _ in range(count):
+        process = ctx.Process(target=_worker, args=(requests,))
+        process.start()
+        process.join()
+        pids.append(process.pid)
+    return pids
+
+
+def _time_scrape(iterations):
+    registry = multiprocess.get_registry()
+    generate_latest(registry)  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        output = generate_latest(registry)
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations, len(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4,8,16,32",
+                        help="Comma separated worker counts to measure")
+    parser.add_argument("--requests", type=int, default=100,
+                        help="Requests recorded by each worker")
+    parser.add_argument("--iterations", type=int, default=50,
+                        help="Scrapes timed per measurement")
+    args = parser.parse_args()
+
+    path = multiprocess.get_multiproc_dir()
+    print(f"{'workers':>8} {'files':>6} {'scrape ms':>10} {'archived ms':>12} {'bytes':>7}")
+    try:
+        for count in (int(w) for w in args.workers.split(",")):
+            multiprocess.prepare_multiproc_dir()
+            pids = _spawn_workers(count, args.requests)
+
+            files = len(os.listdir(path))
+            per_scrape, size = _time_scrape(args.iterations)
+
+            for pid in pids:
+                multiprocess.mark_worker_dead(pid)
+            archived, _ = _time_scrape(args.iterations)
+
+            print(f"{count:>8} {files:>6} {per_scrape * 1000:>10.3f} {archived * 1000:>12.3f} {size:>7}")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
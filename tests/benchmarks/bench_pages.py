@@ -0,0 +1,89 @@
+"""404 latency and CPU with and without the rendered-page cache and template precompilation.
+
+Sends unknown URLs through create_app()'s full WSGI stack, request
+metrics included, as a 404 flood from a scanner would. Steady state is
+measured with the page cache disabled (every 404 renders errors/404.html)
+and enabled. The cold rows time the first 404 after a worker boots, with
+Jinja's compiled-template cache emptied, when templates are compiled on
+that request versus by init_pages() at startup.
+
+Usage:
+    python -m tests.benchmarks.bench_pages [--requests 5000] [--cold 20]
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("OTEL_EXPORTER", "none")
+
+from werkzeug.test import Client  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.pages import PageCache, get_page_cache_size, init_pages  # noqa: E402
+from config import Config  # noqa: E402
+
+
+class BenchConfig(Config):
+    TESTING = True
+
+
+def _steady(app, client, cache_size, requests):
+    app.extensions["page_cache"] = PageCache(cache_size)
+    client.get("/warm-up")
+    latencies = []
+    cpu_start = time.process_time()
+    for i in range(requests):
+        start = time.perf_counter()
+        client.get(f"/no-such-page/{i}")
+        latencies.append(time.perf_counter() - start)
+    cpu = time.process_time() - cpu_start
+    latencies.sort()
+    return {
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        "cpu_us": cpu / requests * 1e6,
+    }
+
+
+def _cold(app, client, precompile, runs):
+    startup, first = [], []
+    for _ in range(runs):
+        app.jinja_env.cache.clear()
+        start = time.perf_counter()
+        if precompile:
+            init_pages(app)
+        else:
+            app.extensions["page_cache"] = PageCache(get_page_cache_size())
+        startup.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        client.get("/no-such-page")
+        first.append(time.perf_counter() - start)
+    return statistics.median(startup) * 1000, statistics.median(first) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000, help="404s per steady-state mode")
+    parser.add_argument("--cold", type=int, default=20, help="Simulated worker boots per cold mode")
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    client = Client(app)
+
+    print(f"{args.requests} requests to unknown URLs")
+    print(f"{'mode':<22} {'p50 us':>8} {'p99 us':>8} {'cpu us/req':>11}")
+    for name, size in (("render every time", 0), ("page cache", get_page_cache_size())):
+        result = _steady(app, client, size, args.requests)
+        print(f"{name:<22} {result['p50_us']:>8.1f} {result['p99_us']:>8.1f} {result['cpu_us']:>11.1f}")
+
+    print()
+    print(f"first 404 after boot, median of {args.cold}")
+    print(f"{'mode':<22} {'startup ms':>11} {'first 404 ms':>13}")
+    for name, precompile in (("compile on request", False), ("precompiled", True)):
+        startup, first = _cold(app, client, precompile, args.cold)
+        print(f"{name:<22} {startup:>11.2f} {first:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
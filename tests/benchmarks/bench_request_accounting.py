@@ -0,0 +1,83 @@
+"""Per-request overhead of WSGI request accounting versus per-view decorators.
+
+The same trivial Flask view is served by three apps: one without metrics,
+one instrumented the old way (time_request_decorator plus
+inc_successful/inc_requests calls inside the view), and one recorded by
+RequestMetricsMiddleware. Requests are driven straight through the WSGI
+callable so the numbers are dominated by Flask and the metrics code.
+
+Usage:
+    python -m tests.benchmarks.bench_request_accounting [--backend prometheus] [--requests 20000]
+"""
+import argparse
+import os
+import time
+
+from flask import Flask
+from werkzeug.test import EnvironBuilder
+
+from app.metrics.labels import request_labels
+from app.metrics.middleware import init_request_metrics
+
+
+def _build_app(metrics, mode):
+    app = Flask(__name__)
+
+    if mode == "decorator":
+        @app.route("/")
+        @metrics.time_request_decorator(labels=request_labels)
+        def index():
+            route, method = request_labels()
+            metrics.inc_successful(route, method)
+            metrics.inc_requests(route, method, "2xx")
+            return "ok"
+    else:
+        @app.route("/")
+        def index():
+            return "ok"
+
+    if mode == "middleware":
+        init_request_metrics(app, metrics)
+    return app
+
+
+def _measure(app, requests):
+    environ = EnvironBuilder(path="/").get_environ()
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        body = app(dict(environ), start_response)
+        for _chunk in body:
+            pass
+        body.close()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("prometheus", "otel"), default="prometheus")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per mode")
+    args = parser.parse_args()
+
+    os.environ["METRICS_BACKEND"] = args.backend
+    from app.metrics import get_metrics_backend
+
+    metrics = get_metrics_backend()
+    apps = {mode: _build_app(metrics, mode) for mode in ("none", "decorator", "middleware")}
+    for app in apps.values():
+        _measure(app, 1000)  # warm up label caches and Werkzeug internals
+
+    print(f"{args.backend} backend, {args.requests} requests per mode")
+    print(f"{'mode':>12} {'us/request':>11} {'overhead us':>12}")
+    baseline = None
+    for name, app in apps.items():
+        per_request = _measure(app, args.requests)
+        baseline = per_request if baseline is None else baseline
+        print(f"{name:>12} {per_request:>11.2f} {per_request - baseline:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Scrape latency and CPU per scrape with and without the /metrics cache.
+
+A registry with the app's metrics plus a configurable number of extra
+labelled series is served by prometheus_client's make_wsgi_app() and by
+CachedMetricsApp. Several clients scrape concurrently, as happens with
+multiple Prometheus replicas, and each scrape asks for gzip.
+
+Usage:
+    python -m tests.benchmarks.bench_scrape_cache [--series 1000] [--clients 4]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from prometheus_client import CollectorRegistry, Counter, make_wsgi_app
+from werkzeug.test import Client
+
+from app.metrics.exposition import CachedMetricsApp
+
+
+def _build_registry(series):
+    registry = CollectorRegistry()
+    counter = Counter("bench_requests", "Benchmark series", ["route"], registry=registry)
+    for i in range(series):
+        counter.labels(route=f"/route/{i}").inc(i)
+    return registry
+
+
+def _measure(app, clients, scrapes):
+    latencies = []
+    lock = threading.Lock()
+
+    def scrape():
+        client = Client(app)
+        local = []
+        for _ in range(scrapes):
+            start = time.perf_counter()
+            client.get("/", headers={"Accept-Encoding": "gzip"})
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=scrape) for _ in range(clients)]
+    cpu_start = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu = time.process_time() - cpu_start
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "cpu_ms": cpu / len(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, default=1000, help="Extra labelled series in the registry")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent scrapers")
+    parser.add_argument("--scrapes", type=int, default=50, help="Scrapes per client")
+    parser.add_argument("--ttl", type=float, default=1.0, help="Cache TTL in seconds")
+    args = parser.parse_args()
+
+    registry = _build_registry(args.series)
+    apps = {
+        "uncached": make_wsgi_app(registry),
+        "cached": CachedMetricsApp(registry, ttl=args.ttl),
+    }
+
+    print(f"{args.series} series, {args.clients} clients x {args.scrapes} scrapes")
+    print(f"{'mode':>10} {'p50 ms':>8} {'p99 ms':>8} {'cpu ms/scrape':>14}")
+    for name, app in apps.items():
+        result = _measure(app, args.clients, args.scrapes)
+        print(f"{name:>10} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['cpu_ms']:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
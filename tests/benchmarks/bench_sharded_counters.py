@@ -0,0 +1,71 @@
+"""Throughput of ShardedCounters against a single-lock counter dict.
+
+Every thread increments the same counter; the table reports aggregate
+increments per second for each implementation and thread count. Under the
+GIL neither version scales with threads, so the interesting number is the
+cost the lock adds on top of the increment itself.
+
+Usage:
+    python -m tests.benchmarks.bench_sharded_counters [--threads 1,4,16]
+"""
+import argparse
+import threading
+import time
+
+from app.metrics.sharded import ShardedCounters
+
+
+class LockedCounters:
+    """Baseline: one dict guarded by one global lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def inc(self, key, amount=1):
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + amount
+
+    def get(self, key):
+        with self._lock:
+            return self._counts.get(key, 0)
+
+
+def _measure(counters, threads, increments):
+    barrier = threading.Barrier(threads + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(increments):
+            counters.inc("http_requests")
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    assert counters.get("http_requests") == threads * increments
+    return threads * increments / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", default="1,2,4,8,16",
+                        help="Comma separated thread counts to measure")
+    parser.add_argument("--increments", type=int, default=200_000,
+                        help="Increments per thread")
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'sharded ops/s':>15} {'locked ops/s':>15} {'speedup':>8}")
+    for threads in (int(t) for t in args.threads.split(",")):
+        sharded = _measure(ShardedCounters(), threads, args.increments)
+        locked = _measure(LockedCounters(), threads, args.increments)
+        print(f"{threads:>8} {sharded:>15,.0f} {locked:>15,.0f} {sharded / locked:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Server cost per refresh tick: N viewers reloading /view_metrics vs N stream clients.
+
+For each viewer count, one tick is either N renders of /view_metrics (every
+viewer reloading the page) or one MetricsStream tick delivered to N
+connected /api/metrics/stream clients. Reports CPU per tick and how many
+times the metrics summary was built.
+
+Usage:
+    python -m tests.benchmarks.bench_stream [--viewers 1,10,100,500] [--ticks 20]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("METRICS_BACKEND", "prometheus")
+os.environ.setdefault("METRICS_CACHE_TTL", "0")
+
+from opentelemetry import trace  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.metrics import get_metrics_backend  # noqa: E402
+from app.metrics.snapshot import MetricsSnapshots  # noqa: E402
+from app.metrics.stream import MetricsStream  # noqa: E402
+
+
+class CountingSummary:
+    """Wraps get_metrics_summary() to count calls."""
+
+    def __init__(self, backend):
+        self.calls = 0
+        self._summary = backend.get_metrics_summary
+        backend.get_metrics_summary = self
+
+    def __call__(self):
+        self.calls += 1
+        return self._summary()
+
+
+def _reload(client, backend, counter, viewers, ticks):
+    counter.calls = 0
+    start = time.process_time()
+    for _ in range(ticks):
+        backend.inc_4xx("/index", "GET")
+        for _ in range(viewers):
+            client.get("/view_metrics")
+    return (time.process_time() - start) / ticks, counter.calls / ticks
+
+
+def _stream(backend, counter, viewers, ticks):
+    stream = MetricsStream(MetricsSnapshots(backend, ttl=0))
+    stream.close()  # driven by tick() below
+    clients = [stream.events() for _ in range(viewers)]
+    for events in clients:
+        next(events), next(events)
+
+    counter.calls = 0
+    start = time.process_time()
+    for _ in range(ticks):
+        backend.inc_4xx("/index", "GET")
+        stream.tick()
+        for events in clients:
+            next(events)
+    elapsed = time.process_time() - start
+    for events in clients:
+        events.close()
+    return elapsed / ticks, counter.calls / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--viewers", default="1,10,100,500")
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    backend = get_metrics_backend()
+    counter = CountingSummary(backend)
+
+    rows = []
+    for viewers in (int(v) for v in args.viewers.split(",")):
+        rows.append((viewers,) + _reload(client, backend, counter, viewers, args.ticks)
+                    + _stream(backend, counter, viewers, args.ticks))
+    # Console span output from the page renders comes first, not inside the table
+    trace.get_tracer_provider().force_flush()
+
+    print(f"{'viewers':>8} {'reload ms/tick':>15} {'summaries':>10} {'stream ms/tick':>15} {'summaries':>10}")
+    for viewers, reload_cpu, reload_calls, stream_cpu, stream_calls in rows:
+        print(
+            f"{viewers:>8} {reload_cpu * 1000:>15.2f} {reload_calls:>10.0f} "
+            f"{stream_cpu * 1000:>15.2f} {stream_calls:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Hot-path and lookup cost of the sliding-window request counters.
+
+Times SlidingWindow.add() as called once per request (unbatched) or once
+per batch, add() while the second rolls over on every call, and the 1m,
+5m and 15m lookups behind get_metrics_summary(). Lookup cost does not
+depend on the window length.
+
+Usage:
+    python -m tests.benchmarks.bench_window [--iterations 1000000]
+"""
+import argparse
+import time
+
+from app.metrics.window import WINDOWS, SlidingWindow
+
+
+class SteppingClock:
+    """Clock advancing one second per call, to force a roll on every add()."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+def _ns_per_call(func, iterations):
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000000)
+    args = parser.parse_args()
+
+    window = SlidingWindow()
+    rolling = SlidingWindow(clock=SteppingClock())
+    baseline = _ns_per_call(lambda: None, args.iterations)
+    cases = [
+        ("add(requests=1)", lambda: window.add(requests=1), args.iterations),
+        ("add(batch totals)", lambda: window.add(50, 1, 50, 0.5), args.iterations),
+        ("add() + roll", lambda: rolling.add(requests=1), args.iterations),
+    ]
+    cases += [
+        (f"totals({label})", lambda seconds=seconds: window.totals(seconds), args.iterations // 10)
+        for label, seconds in WINDOWS
+    ]
+    cases.append(("summary()", window.summary, args.iterations // 10))
+
+    print(f"{'operation':>20} {'ns/call':>9}")
+    for name, func, iterations in cases:
+        print(f"{name:>20} {_ns_per_call(func, iterations) - baseline:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Local stand-in for an OpenTelemetry collector, for tests and benchmarks.
+
+Accepts OTLP over HTTP (protobuf) and gRPC, and records every export:
+which signal, how many spans or metrics, the decoded request and its
+protobuf payload size and, for HTTP, the request body size and
+Content-Encoding. Each receiver sits behind a TCP proxy that counts the
+bytes clients send and the connections they open, so bytes on the wire
+and connection reuse can be compared across exporter modes. make_spans() builds request-like spans to send,
+and RecordingMetricExporter measures metric exports without a network.
+
+    with StandInCollector() as collector:
+        os.environ["OTEL_EXPORTER_OTLP_ENDPOINT"] = collector.http_endpoint
+        ...
+        collector.exports, collector.http.wire_bytes, collector.http.connections
+"""
+import gzip
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+
+import grpc
+from opentelemetry.exporter.otlp.proto.common.metrics_encoder import encode_metrics
+from opentelemetry.proto.collector.metrics.v1 import metrics_service_pb2, metrics_service_pb2_grpc
+from opentelemetry.sdk.metrics.export import MetricExporter, MetricExportResult, MetricsData
+from opentelemetry.proto.collector.trace.v1 import trace_service_pb2, trace_service_pb2_grpc
+
+
+@dataclass
+class Export:
+    """One export request received by the collector."""
+
+    protocol: str
+    signal: str
+    items: int
+    payload_bytes: int
+    body_bytes: Optional[int] = None
+    encoding: Optional[str] = None
+    # The decoded Export*ServiceRequest
+    request: Any = None
+
+    def sums(self) -> dict:
+        """Return {metric name: total over data points} of a metrics export; histograms by count."""
+        totals = {}
+        for resource in self.request.resource_metrics:
+            for scope in resource.scope_metrics:
+                for metric in scope.metrics:
+                    data = getattr(metric, metric.WhichOneof("data"))
+                    totals[metric.name] = sum(
+                        point.count if hasattr(point, "bucket_counts") else getattr(point, point.WhichOneof("value"))
+                        for point in data.data_points
+                    )
+        return totals
+
+
+def _count_items(signal: str, request) -> int:
+    if signal == "traces":
+        return sum(len(scope.spans) for resource in request.resource_spans for scope in resource.scope_spans)
+    return sum(len(scope.metrics) for resource in request.resource_metrics for scope in resource.scope_metrics)
+
+
+class CountingProxy:
+    """Forwards TCP connections to ``port`` and counts what clients send."""
+
+    def __init__(self, port: int):
+        self._target = ("127.0.0.1", port)
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.port = self._server.getsockname()[1]
+        self.wire_bytes = 0
+        self.connections = 0
+        self._sockets: List[socket.socket] = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self._target)
+            with self._lock:
+                self.connections += 1
+                self._sockets += [client, upstream]
+            threading.Thread(target=self._pipe, args=(client, upstream, True), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(upstream, client, False), daemon=True).start()
+
+    def _pipe(self, source: socket.socket, target: socket.socket, count: bool) -> None:
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if count:
+                    with self._lock:
+                        self.wire_bytes += len(data)
+                target.sendall(data)
+        except OSError:
+            pass
+        try:
+            target.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        self._server.close()
+        with self._lock:
+            for sock in self._sockets:
+                sock.close()
+
+
+class StandInCollector:
+    """OTLP/HTTP and OTLP/gRPC receivers that record exports.
+
+    ``delay`` seconds are added to every export, to stand in for a slow
+    collector.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.exports: List[Export] = []
+        self._lock = threading.Lock()
+
+        self._http_server = ThreadingHTTPServer(("127.0.0.1", 0), self._http_handler())
+        self._http_server.daemon_threads = True
+        threading.Thread(target=self._http_server.serve_forever, daemon=True).start()
+
+        self._grpc_server = grpc.server(ThreadPoolExecutor(max_workers=4))
+        trace_service_pb2_grpc.add_TraceServiceServicer_to_server(_TraceService(self), self._grpc_server)
+        metrics_service_pb2_grpc.add_MetricsServiceServicer_to_server(_MetricsService(self), self._grpc_server)
+        grpc_port = self._grpc_server.add_insecure_port("127.0.0.1:0")
+        self._grpc_server.start()
+
+        self.http = CountingProxy(self._http_server.server_address[1])
+        self.grpc = CountingProxy(grpc_port)
+
+    @property
+    def http_endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.http.port}"
+
+    @property
+    def grpc_endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.grpc.port}"
+
+    def record(self, export: Export) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.exports.append(export)
+
+    def signal(self, name: str) -> List[Export]:
+        """Return the exports of one signal, 'traces' or 'metrics'."""
+        with self._lock:
+            return [export for export in self.exports if export.signal == name]
+
+    def _http_handler(self):
+        collector = self
+        requests = {
+            "/v1/traces": ("traces", trace_service_pb2.ExportTraceServiceRequest,
+                           trace_service_pb2.ExportTraceServiceResponse),
+            "/v1/metrics": ("metrics", metrics_service_pb2.ExportMetricsServiceRequest,
+                            metrics_service_pb2.ExportMetricsServiceResponse),
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.path not in requests:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                signal, request_type, response_type = requests[self.path]
+                encoding = self.headers.get("Content-Encoding")
+                if encoding == "gzip":
+                    payload = gzip.decompress(body)
+                elif encoding == "deflate":
+                    payload = zlib.decompress(body)
+                else:
+                    payload = body
+                request = request_type.FromString(payload)
+                collector.record(
+                    Export("http", signal, _count_items(signal, request), len(payload), len(body), encoding, request)
+                )
+
+                response = response_type().SerializeToString()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-protobuf")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self) -> None:
+        self.http.close()
+        self.grpc.close()
+        self._http_server.shutdown()
+        self._http_server.server_close()
+        self._grpc_server.stop(None)
+
+    def __enter__(self) -> "StandInCollector":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _TraceService(trace_service_pb2_grpc.TraceServiceServicer):
+    def __init__(self, collector: StandInCollector):
+        self._collector = collector
+
+    def Export(self, request, context):
+        self._collector.record(Export("grpc", "traces", _count_items("traces", request), request.ByteSize(), request=request))
+        return trace_service_pb2.ExportTraceServiceResponse()
+
+
+class _MetricsService(metrics_service_pb2_grpc.MetricsServiceServicer):
+    def __init__(self, collector: StandInCollector):
+        self._collector = collector
+
+    def Export(self, request, context):
+        self._collector.record(Export("grpc", "metrics", _count_items("metrics", request), request.ByteSize(), request=request))
+        return metrics_service_pb2.ExportMetricsServiceResponse()
+
+
+def make_spans(count):
+    """Return ``count`` finished spans shaped like Flask request spans."""
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    recorder = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(recorder))
+    tracer = provider.get_tracer(__name__)
+    for i in range(count):
+        with tracer.start_as_current_span("GET /index") as span:
+            span.set_attributes({
+                "http.method": "GET", "http.route": "/index", "http.status_code": 200,
+                "http.target": f"/index?page={i}", "net.host.name": "localhost",
+                "http.user_agent": "python-requests/2.32.4",
+            })
+    return recorder.get_finished_spans()
+
+
+class RecordingMetricExporter(MetricExporter):
+    """Keeps every metric export and the size of its OTLP protobuf payload."""
+
+    def __init__(self, preferred_temporality=None):
+        super().__init__(preferred_temporality=preferred_temporality)
+        self.exports: List[MetricsData] = []
+        self.payload_bytes: List[int] = []
+        self.raises = False
+        # Return FAILURE without raising, as the OTLP exporters do
+        self.fails = False
+
+    def export(self, metrics_data: MetricsData, timeout_millis: float = 10_000, **kwargs) -> MetricExportResult:
+        if self.raises:
+            raise ConnectionError("collector unavailable")
+        if self.fails:
+            return MetricExportResult.FAILURE
+        self.exports.append(metrics_data)
+        self.payload_bytes.append(encode_metrics(metrics_data).ByteSize())
+        return MetricExportResult.SUCCESS
+
+    def points(self, index: int = -1) -> dict:
+        """Return {(metric name, attributes): data point} of one export."""
+        return {
+            (metric.name, tuple(sorted(point.attributes.items()))): point
+            for resource in self.exports[index].resource_metrics
+            for scope in resource.scope_metrics
+            for metric in scope.metrics
+            for point in metric.data.data_points
+        }
+
+    def force_flush(self, timeout_millis: float = 10_000) -> bool:
+        return True
+
+    def shutdown(self, timeout_millis: float = 30_000, **kwargs) -> None:
+        pass
@@ -1,6 +1,30 @@
 import os
 import pytest
 
+# Collectors registered by PrometheusMetrics into the global registry
+PROMETHEUS_METRIC_NAMES = [
+    'http_successful_request', 'http_requests',
+    'http_error_4xx', 'http_error_5xx', 'request_processing_seconds',
+    'task_queue_depth', 'tasks_running', 'task_queue_wait_seconds',
+    'trace_sampling_decisions', 'span_queue_size', 'span_export_seconds',
+    'span_export_batch_size', 'spans_dropped',
+]
+
+
+class FakeClock:
+    """Clock for code that takes a ``clock`` callable; tests move it by changing ``now``."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
 
 @pytest.fixture(autouse=True)
 def reset_metrics_singleton():
@@ -12,10 +36,7 @@ def reset_metrics_singleton():
     from prometheus_client import REGISTRY
     collectors_to_remove = []
     for collector in list(REGISTRY._names_to_collectors.values()):
-        if hasattr(collector, '_name') and collector._name in [
-            'http_successful_request', 'http_requests',
-            'http_error_4xx', 'http_error_5xx', 'request_processing_seconds'
-        ]:
+        if hasattr(collector, '_name') and collector._name in PROMETHEUS_METRIC_NAMES:
             collectors_to_remove.append(collector)
 
     for collector in collectors_to_remove:
@@ -26,8 +47,36 @@ def reset_metrics_singleton():
 
     yield
 
+    # Stop snapshotting before the backend it reads is shut down
+    import app.metrics.persistence
+    if app.metrics.persistence._persister_instance is not None:
+        app.metrics.persistence._persister_instance.stop()
+        app.metrics.persistence._persister_instance = None
+
+    # Stop the OTel backend's metric reader while the captured output is still open
+    provider = getattr(app.metrics._metrics_instance, '_provider', None)
+    if provider is not None:
+        provider.shutdown()
     app.metrics._metrics_instance = None
 
+    import app.metrics.snapshot
+    app.metrics.snapshot._snapshots_instance = None
+
+    import app.metrics.stream
+    if app.metrics.stream._stream_instance is not None:
+        app.metrics.stream._stream_instance.close()
+        app.metrics.stream._stream_instance = None
+
+    import app.tasks
+    if app.tasks._executor_instance is not None:
+        app.tasks._executor_instance.shutdown()
+        app.tasks._executor_instance = None
+
+    import app.tracing
+    if app.tracing._http_session is not None:
+        app.tracing._http_session.close()
+        app.tracing._http_session = None
+
     # Shutdown OpenTelemetry MeterProvider to stop background export threads
     from opentelemetry import metrics
     provider = metrics.get_meter_provider()
@@ -55,3 +104,33 @@ def otlp_env(monkeypatch):
     monkeypatch.setenv("OTEL_EXPORTER", "otlp")
     monkeypatch.setenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4317")
     monkeypatch.setenv("OTEL_EXPORTER_OTLP_INSECURE", "true")
+
+
+@pytest.fixture
+def otlp_http_env(monkeypatch):
+    """Set environment for OTLP/HTTP export to a local stand-in collector; yields the collector."""
+    from tests.collector import StandInCollector
+
+    with StandInCollector() as collector:
+        monkeypatch.setenv("OTEL_EXPORTER", "otlp_http")
+        monkeypatch.setenv("OTEL_EXPORTER_OTLP_ENDPOINT", collector.http_endpoint)
+        monkeypatch.delenv("OTEL_EXPORTER_OTLP_COMPRESSION", raising=False)
+        yield collector
+
+
+@pytest.fixture
+def flask_app():
+    """Create the Flask application in testing mode."""
+    from app import create_app
+    from config import Config
+
+    class TestConfig(Config):
+        TESTING = True
+
+    app = create_app(TestConfig)
+    yield app
+
+    # Flush and stop the span exporter while the captured output is still open
+    provider = app.extensions.get('tracer_provider')
+    if provider is not None:
+        provider.shutdown()
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from app.metrics import snapshot
+from app.metrics.snapshot import MetricsSnapshots, dumps, flatten_summary
+
+
+@pytest.fixture
+def backend(prometheus_env):
+    from app.metrics import get_metrics_backend
+    return get_metrics_backend()
+
+
+class TestFlattenSummary:
+    """Test flattening get_metrics_summary() into named series."""
+
+    def test_series_names(self, backend):
+        backend.record_request("/index", "GET", 200, 0.1)
+        series = flatten_summary(backend.get_metrics_summary())
+        assert series["http_requests"] == 1
+        assert series['http_requests{method="GET",route="/index",status="2xx"}'] == 1
+        assert series['request_processing_seconds_bucket{le="+Inf"}'] == 1
+        assert series["request_processing_seconds_count"] == 1
+        assert 'request_processing_seconds{quantile="0.99"}' in series
+        assert series['request_window_requests{window="1m"}'] == 1
+        assert "task_queue_wait_seconds_count" in series
+
+    def test_window_rates_excluded(self, backend):
+        series = flatten_summary(backend.get_metrics_summary())
+        assert not any(name.startswith("request_window_rate") for name in series)
+
+    def test_window_rate_derivable(self, backend):
+        backend.record_request("/index", "GET", 200, 0.1)
+        summary = backend.get_metrics_summary()
+        series = flatten_summary(summary)
+        one_minute = summary["request_windows"][0]
+        rate = series['request_window_requests{window="1m"}'] / series['request_window_seconds{window="1m"}']
+        assert rate == one_minute["rate"]
+
+
+class TestMetricsSnapshots:
+    """Test change versions."""
+
+    def test_first_snapshot_has_everything(self, backend, clock):
+        version, series = MetricsSnapshots(backend, ttl=0, clock=clock).changed_since()
+        assert version > 0
+        assert "http_requests" in series
+
+    def test_unchanged_keeps_version(self, backend, clock):
+        snapshots = MetricsSnapshots(backend, ttl=0, clock=clock)
+        version, _ = snapshots.changed_since()
+        assert snapshots.changed_since(version) == (version, {})
+
+    def test_only_changed_series_returned(self, backend, clock):
+        snapshots = MetricsSnapshots(backend, ttl=0, clock=clock)
+        version, _ = snapshots.changed_since()
+        backend.inc_4xx("/index", "GET")
+
+        new_version, series = snapshots.changed_since(version)
+        assert new_version > version
+        assert series == {"http_error_4xx": 1}
+
+    def test_versions_increase(self, backend, clock):
+        snapshots = MetricsSnapshots(backend, ttl=0, clock=clock)
+        versions = []
+        for _ in range(5):
+            backend.inc_4xx("/index", "GET")
+            versions.append(snapshots.changed_since()[0])
+        assert versions == sorted(set(versions))
+
+    def test_snapshot_reused_within_ttl(self, backend, clock):
+        snapshots = MetricsSnapshots(backend, ttl=5, clock=clock)
+        version, _ = snapshots.changed_since()
+        backend.inc_4xx("/index", "GET")
+        assert snapshots.changed_since(version)[0] == version
+        clock.now += 5
+        assert snapshots.changed_since(version)[0] > version
+
+
+class TestDumps:
+    """Test the JSON serializer."""
+
+    def test_orjson_and_fallback_agree(self, monkeypatch):
+        payload = {"version": 1, "series": {'a{b="c"}': 1.5, "d": None}}
+        fast = dumps(payload)
+        monkeypatch.setattr(snapshot, "orjson", None)
+        assert json.loads(dumps(payload)) == json.loads(fast) == payload
+
+
+class TestApiMetricsEndpoint:
+    """Test /api/metrics."""
+
+    @pytest.fixture
+    def client(self, prometheus_env, monkeypatch, flask_app):
+        monkeypatch.setenv("METRICS_CACHE_TTL", "0")
+        return flask_app.test_client()
+
+    def test_full_response(self, client):
+        response = client.get("/api/metrics")
+        assert response.status_code == 200
+        assert response.mimetype == "application/json"
+        data = response.get_json()
+        assert data["since"] is None
+        assert "http_requests" in data["series"]
+        assert response.headers["ETag"] == f'W/"{data["version"]}"'
+
+    def test_not_modified_when_unchanged(self, client):
+        version = client.get("/api/metrics").get_json()["version"]
+        response = client.get(f"/api/metrics?since={version}")
+        assert response.status_code == 304
+        assert response.data == b""
+
+    def test_delta_after_traffic(self, client):
+        version = client.get("/api/metrics").get_json()["version"]
+        client.get("/index", buffered=True)
+
+        data = client.get(f"/api/metrics?since={version}").get_json()
+        assert data["version"] > version
+        assert data["since"] == version
+        assert data["series"]["http_requests"] == 1
+        assert "http_error_5xx" not in data["series"]
+
+    def test_polling_is_not_counted(self, client):
+        client.get("/api/metrics")
+        data = client.get("/api/metrics").get_json()
+        assert data["series"]["http_requests"] == 0
+
+    def test_invalid_since(self, client):
+        response = client.get("/api/metrics?since=yesterday")
+        assert response.status_code == 400
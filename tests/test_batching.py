@@ -0,0 +1,178 @@
+import threading
+import time
+
+import pytest
+
+from app.metrics.batching import RequestBatcher, get_batch_interval
+
+
+class Recorder:
+    """Collects apply() calls of a RequestBatcher."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, route, method, statuses, durations):
+        self.calls.append((route, method, dict(statuses), list(durations)))
+
+    def totals(self):
+        totals = {}
+        for route, method, statuses, durations in self.calls:
+            entry = totals.setdefault((route, method), [{}, 0])
+            for status_code, count in statuses.items():
+                entry[0][status_code] = entry[0].get(status_code, 0) + count
+            entry[1] += len(durations)
+        return totals
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+@pytest.fixture
+def batcher(recorder):
+    batcher = RequestBatcher(recorder, interval=60)
+    yield batcher
+    batcher.close()
+
+
+class TestBatchIntervalConfiguration:
+    """Test METRICS_BATCH_INTERVAL parsing."""
+
+    def test_default_interval(self, monkeypatch):
+        monkeypatch.delenv("METRICS_BATCH_INTERVAL", raising=False)
+        assert get_batch_interval() == 1.0
+
+    def test_configured_interval(self, monkeypatch):
+        monkeypatch.setenv("METRICS_BATCH_INTERVAL", "0.25")
+        assert get_batch_interval() == 0.25
+
+    def test_negative_interval_clamped(self, monkeypatch):
+        monkeypatch.setenv("METRICS_BATCH_INTERVAL", "-1")
+        assert get_batch_interval() == 0.0
+
+
+class TestRequestBatcher:
+    """Test buffering and flushing of request metrics."""
+
+    def test_nothing_applied_before_flush(self, batcher, recorder):
+        batcher.record("/index", "GET", 200, 0.1)
+        assert recorder.calls == []
+
+    def test_flush_merges_requests_of_a_series(self, batcher, recorder):
+        batcher.record("/index", "GET", 200, 0.1)
+        batcher.record("/index", "GET", 200, 0.2)
+        batcher.record("/index", "GET", 404, 0.3)
+        batcher.flush()
+        assert recorder.calls == [("/index", "GET", {200: 2, 404: 1}, [0.1, 0.2, 0.3])]
+
+    def test_flush_empties_buffer(self, batcher, recorder):
+        batcher.record("/index", "GET", 200, 0.1)
+        batcher.flush()
+        batcher.flush()
+        assert len(recorder.calls) == 1
+
+    def test_threads_merged_into_one_call_per_series(self, batcher, recorder):
+        def work():
+            for _ in range(1000):
+                batcher.record("/index", "GET", 200, 0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.flush()
+
+        assert len(recorder.calls) == 1
+        assert recorder.totals()[("/index", "GET")] == [{200: 8000}, 8000]
+
+    def test_concurrent_flushes_lose_nothing(self, batcher, recorder):
+        stop = threading.Event()
+
+        def flush_loop():
+            while not stop.is_set():
+                batcher.flush()
+
+        flusher = threading.Thread(target=flush_loop)
+        flusher.start()
+        workers = [
+            threading.Thread(target=lambda: [batcher.record("/a", "GET", 200, 0.0) for _ in range(5000)])
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        stop.set()
+        flusher.join()
+        batcher.flush()
+
+        assert recorder.totals()[("/a", "GET")] == [{200: 20000}, 20000]
+
+    def test_finished_thread_shard_applied(self, batcher, recorder):
+        thread = threading.Thread(target=batcher.record, args=("/index", "GET", 500, 0.1))
+        thread.start()
+        thread.join()
+        del thread
+        batcher.flush()
+        assert recorder.totals()[("/index", "GET")] == [{500: 1}, 1]
+
+    def test_background_flush(self, recorder):
+        batcher = RequestBatcher(recorder, interval=0.01)
+        try:
+            batcher.record("/index", "GET", 200, 0.1)
+            for _ in range(500):
+                if recorder.calls:
+                    break
+                time.sleep(0.01)
+            assert recorder.calls == [("/index", "GET", {200: 1}, [0.1])]
+        finally:
+            batcher.close()
+
+
+@pytest.mark.parametrize("backend_type", ["prometheus", "otel"])
+class TestBackendBatching:
+    """Test request batching through both backends."""
+
+    def _backend(self, monkeypatch, backend_type, interval):
+        monkeypatch.setenv("METRICS_BACKEND", backend_type)
+        monkeypatch.setenv("OTEL_EXPORTER", "console")
+        monkeypatch.setenv("METRICS_BATCH_INTERVAL", interval)
+        from app.metrics import get_metrics_backend
+        return get_metrics_backend()
+
+    def test_summary_sees_buffered_requests(self, backend_type, monkeypatch):
+        backend = self._backend(monkeypatch, backend_type, "60")
+        for status_code in (200, 200, 404, 503):
+            backend.record_request("/index", "GET", status_code, 0.1)
+
+        summary = backend.get_metrics_summary()
+        assert summary["http_requests"]["value"] == 4
+        assert summary["http_successful_request"]["value"] == 2
+        assert summary["http_4xx_errors"]["value"] == 1
+        assert summary["http_5xx_errors"]["value"] == 1
+        count = next(b for b in summary["histogram_buckets"] if b["name"] == "request_processing_seconds_count")
+        assert count["value"] == 4
+
+    def test_batch_matches_individual_observations(self, backend_type, monkeypatch):
+        backend = self._backend(monkeypatch, backend_type, "60")
+        durations = [0.001, 0.01, 0.2, 0.2, 3.0, 100.0]
+        backend.record_batch("/index", "GET", {200: len(durations)}, durations)
+
+        buckets = {
+            b["le"]: b["value"] for b in backend.get_metrics_summary()["histogram_buckets"]
+            if b["name"] == "request_processing_seconds_bucket"
+        }
+        assert buckets["0.005"] == 1
+        assert buckets["0.01"] == 2
+        assert buckets["0.25"] == 4
+        assert buckets["5.0"] == 5
+        assert buckets["+Inf"] == 6
+
+    def test_zero_interval_applies_immediately(self, backend_type, monkeypatch):
+        backend = self._backend(monkeypatch, backend_type, "0")
+        assert backend._batcher is None
+        backend.record_request("/index", "GET", 200, 0.1)
+        assert backend.get_metrics_summary()["http_requests"]["value"] == 1
@@ -0,0 +1,206 @@
+import pytest
+
+from app.metrics.exemplars import ExemplarSampler, current_trace_context
+
+TRACE = (0x4BF92F3577B34DA6A3CE929D0E0E4736, 0x00F067AA0BA902B7)
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SPAN_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def sampled_span():
+    """Make a sampled span current for the duration of the test."""
+    from opentelemetry.sdk.trace import TracerProvider
+
+    with TracerProvider().get_tracer(__name__).start_as_current_span("GET /index") as span:
+        yield span
+
+
+class TestExemplarSampler:
+    """Test which durations are selected as exemplars."""
+
+    def test_one_exemplar_per_bucket_and_interval(self, clock):
+        sampler = ExemplarSampler(buckets=(0.1, 1.0), interval=10, clock=clock)
+        assert sampler.due(0.05)
+        sampler.add(0.05, TRACE)
+        assert not sampler.due(0.07)
+        assert sampler.due(0.5)  # other buckets stay open
+        clock.now += 10
+        assert sampler.due(0.07)
+
+    def test_keeps_latest_exemplar_per_bucket(self, clock):
+        sampler = ExemplarSampler(buckets=(0.1, 1.0), interval=0, clock=clock, wall_clock=lambda: 1700000000.0)
+        sampler.add(0.05, (1, 2))
+        sampler.add(0.06, TRACE)
+        sampler.add(5.0, (3, 4))
+        assert sampler.summary("request_processing_seconds_bucket") == [
+            {"name": "request_processing_seconds_bucket", "le": "0.1", "trace_id": TRACE_ID,
+             "span_id": SPAN_ID, "value": 0.06, "timestamp": 1700000000.0},
+            {"name": "request_processing_seconds_bucket", "le": "+Inf", "trace_id": f"{3:032x}",
+             "span_id": f"{4:016x}", "value": 5.0, "timestamp": 1700000000.0},
+        ]
+
+    def test_bucket_boundary_is_inclusive(self, clock):
+        sampler = ExemplarSampler(buckets=(0.1, 1.0), clock=clock)
+        sampler.add(0.1, TRACE)
+        assert sampler.summary("d")[0]["le"] == "0.1"
+
+
+class TestCurrentTraceContext:
+    """Test reading the trace context of the current span."""
+
+    def test_sampled_span(self, sampled_span):
+        span_context = sampled_span.get_span_context()
+        assert current_trace_context() == (span_context.trace_id, span_context.span_id)
+
+    def test_no_span(self):
+        assert current_trace_context() is None
+
+    def test_unsampled_span(self):
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.sampling import ALWAYS_OFF
+
+        with TracerProvider(sampler=ALWAYS_OFF).get_tracer(__name__).start_as_current_span("GET /index"):
+            assert current_trace_context() is None
+
+
+class TestPrometheusExemplars:
+    """Test exemplars on the Prometheus request duration histogram."""
+
+    def test_openmetrics_scrape_carries_exemplar(self, prometheus_env, flask_app):
+        from app.metrics import get_metrics_backend
+
+        get_metrics_backend().record_request("/index", "GET", 200, 0.02, trace_context=TRACE)
+        response = flask_app.test_client().get("/metrics", headers={"Accept": "application/openmetrics-text"})
+        assert response.headers["Content-Type"].startswith("application/openmetrics-text")
+        line = next(line for line in response.data.decode().splitlines()
+                    if line.startswith('request_processing_seconds_bucket{le="0.025"'))
+        assert f'# {{span_id="{SPAN_ID}",trace_id="{TRACE_ID}"}} 0.02' in line
+
+    def test_text_format_has_no_exemplars(self, prometheus_env, flask_app):
+        from app.metrics import get_metrics_backend
+
+        get_metrics_backend().record_request("/index", "GET", 200, 0.02, trace_context=TRACE)
+        body = flask_app.test_client().get("/metrics").data
+        assert b"request_processing_seconds_bucket" in body
+        assert TRACE_ID.encode() not in body
+
+    def test_time_request_uses_current_span(self, prometheus_env, sampled_span):
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        with backend.time_request("/index", "GET"):
+            pass
+        exemplars = backend.get_metrics_summary()["request_exemplars"]
+        assert [e["trace_id"] for e in exemplars] == [f"{sampled_span.get_span_context().trace_id:032x}"]
+
+    def test_batched_requests_still_sampled(self, prometheus_env, monkeypatch):
+        monkeypatch.setenv("METRICS_BATCH_INTERVAL", "60")
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        backend.record_request("/index", "GET", 200, 0.02, trace_context=TRACE)
+        backend.record_request("/index", "GET", 200, 0.02, trace_context=(5, 6))
+        summary = backend.get_metrics_summary()
+        assert [e["trace_id"] for e in summary["request_exemplars"]] == [TRACE_ID]
+        assert summary["http_requests"]["value"] == 2
+
+
+class TestOTelExemplars:
+    """Test exemplars on OTel histograms recorded the way OTelMetrics records them."""
+
+    @pytest.fixture
+    def histogram(self):
+        """Return (histogram, reader) of a provider using the backend's exemplar filter."""
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+        from app.metrics.otel import _SelectedExemplarFilter
+
+        reader = InMemoryMetricReader()
+        provider = MeterProvider(metric_readers=[reader], exemplar_filter=_SelectedExemplarFilter())
+        yield provider.get_meter(__name__).create_histogram("request_processing_seconds"), reader
+        provider.shutdown()
+
+    def _exemplars(self, reader):
+        metrics = reader.get_metrics_data().resource_metrics[0].scope_metrics[0].metrics
+        return [exemplar for point in metrics[0].data.data_points for exemplar in point.exemplars]
+
+    def test_selected_duration_carries_exemplar(self, histogram):
+        from app.metrics.otel import _exemplar_context
+
+        histogram, reader = histogram
+        histogram.record(0.02, {"route": "/index"}, _exemplar_context(TRACE))
+        histogram.record(0.021, {"route": "/index"})
+        exemplars = self._exemplars(reader)
+        assert [(e.trace_id, e.span_id, e.value) for e in exemplars] == [(*TRACE, 0.02)]
+
+    def test_sampled_span_alone_adds_no_exemplar(self, histogram, sampled_span):
+        """The SDK's trace-based filter is replaced, so only selected durations carry one."""
+        histogram, reader = histogram
+        histogram.record(0.02, {"route": "/index"})
+        assert self._exemplars(reader) == []
+
+    def test_backend_selects_exemplars(self, otel_env, mocker):
+        from app.metrics import get_metrics_backend
+        from app.metrics.otel import _EXEMPLAR_KEY
+
+        backend = get_metrics_backend()
+        record = mocker.spy(backend._http_request_time_histogram, "record")
+        backend.record_request("/index", "GET", 200, 0.02, trace_context=TRACE)
+        backend.record_request("/index", "GET", 200, 0.021, trace_context=(5, 6))
+        backend.flush()
+        selected, batched = record.call_args_list
+        assert selected.args[2].get(_EXEMPLAR_KEY) is True
+        assert len(batched.args) == 2
+
+
+class TestRequestExemplars:
+    """Test exemplars for requests served by the app."""
+
+    @pytest.mark.parametrize("backend_type", ["prometheus", "otel"])
+    def test_request_span_becomes_exemplar(self, monkeypatch, backend_type):
+        monkeypatch.setenv("METRICS_BACKEND", backend_type)
+        monkeypatch.setenv("OTEL_EXPORTER", "console")
+        from app import create_app
+        from app.metrics import get_metrics_backend
+        from config import Config
+
+        class TestConfig(Config):
+            TESTING = True
+
+        app = create_app(TestConfig)
+        try:
+            app.test_client().get("/index", buffered=True)
+            exemplars = get_metrics_backend().get_metrics_summary()["request_exemplars"]
+            assert len(exemplars) == 1
+            assert len(exemplars[0]["trace_id"]) == 32 and exemplars[0]["trace_id"] != "0" * 32
+        finally:
+            app.extensions["tracer_provider"].shutdown()
+
+    def test_disabled(self, monkeypatch, prometheus_env):
+        monkeypatch.setenv("METRICS_EXEMPLARS", "false")
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        assert not backend.exemplars_enabled
+        backend.record_request("/index", "GET", 200, 0.02, trace_context=TRACE)
+        assert backend.get_metrics_summary()["request_exemplars"] == []
+
+
+class TestConfiguration:
+    """Test the METRICS_EXEMPLAR* settings."""
+
+    def test_defaults(self, monkeypatch):
+        monkeypatch.delenv("METRICS_EXEMPLARS", raising=False)
+        monkeypatch.delenv("METRICS_EXEMPLAR_INTERVAL", raising=False)
+        from app.metrics.exemplars import get_exemplar_interval, get_exemplars_enabled
+
+        assert get_exemplars_enabled() is True
+        assert get_exemplar_interval() == 10.0
+
+    def test_negative_interval_clamped(self, monkeypatch):
+        monkeypatch.setenv("METRICS_EXEMPLAR_INTERVAL", "-1")
+        from app.metrics.exemplars import get_exemplar_interval
+
+        assert get_exemplar_interval() == 0.0
@@ -0,0 +1,74 @@
+import tracemalloc
+
+import pytest
+
+from app.metrics.histogram import DEFAULT_BUCKETS, BucketHistogram
+
+
+class TestBucketHistogramRecording:
+    """Test recording values into buckets."""
+
+    def test_empty_histogram(self):
+        histogram = BucketHistogram()
+        assert histogram.count == 0
+        assert histogram.sum == 0.0
+        assert histogram.cumulative_counts() == [0] * (len(DEFAULT_BUCKETS) + 1)
+
+    def test_count_and_sum(self):
+        histogram = BucketHistogram()
+        histogram.record(0.2)
+        histogram.record(0.3)
+        assert histogram.count == 2
+        assert histogram.sum == pytest.approx(0.5)
+
+    def test_upper_bound_is_inclusive(self):
+        histogram = BucketHistogram(buckets=(1.0, 2.0))
+        histogram.record(1.0)
+        assert histogram.cumulative_counts() == [1, 1, 1]
+
+    def test_values_above_last_bound_go_to_inf(self):
+        histogram = BucketHistogram(buckets=(1.0, 2.0))
+        histogram.record(5.0)
+        assert histogram.cumulative_counts() == [0, 0, 1]
+
+    def test_cumulative_counts(self):
+        histogram = BucketHistogram(buckets=(0.1, 1.0, 10.0))
+        for value in (0.05, 0.5, 0.5, 5.0, 50.0):
+            histogram.record(value)
+        assert histogram.cumulative_counts() == [1, 3, 4, 5]
+
+    def test_unsorted_buckets_rejected(self):
+        with pytest.raises(ValueError):
+            BucketHistogram(buckets=(1.0, 0.5))
+
+
+class TestBucketHistogramMemory:
+    """Test that memory does not grow with the number of samples."""
+
+    def test_no_allocations_retained_per_sample(self):
+        histogram = BucketHistogram()
+        histogram.record(0.1)
+
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            for i in range(100_000):
+                histogram.record(i % 1000 / 100.0)
+            after, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # Only allocator noise is allowed, nothing proportional to the samples
+        assert after - before < 1024
+
+    def test_otel_backend_keeps_no_samples(self, otel_env):
+        from app.metrics.otel import OTelMetrics
+
+        metrics = OTelMetrics()
+        for _ in range(1000):
+            with metrics.time_request():
+                pass
+
+        assert not hasattr(metrics, "_histogram_values")
+        assert metrics._histogram.count == 1000
+        metrics._provider.shutdown()
@@ -0,0 +1,95 @@
+import pytest
+
+from app.metrics.labels import (
+    OTHER,
+    UNKNOWN,
+    LabelCache,
+    get_max_series,
+    normalize_method,
+    normalize_status,
+    status_class,
+    tally_statuses,
+)
+
+
+class TestLabelHelpers:
+    """Test label normalization helpers."""
+
+    @pytest.mark.parametrize("code,expected", [(200, "2xx"), (302, "3xx"), (404, "4xx"), (503, "5xx"), (999, OTHER)])
+    def test_status_class(self, code, expected):
+        assert status_class(code) == expected
+
+    def test_known_method_kept(self):
+        assert normalize_method("GET") == "GET"
+        assert normalize_method(UNKNOWN) == UNKNOWN
+
+    def test_unknown_method_folded(self):
+        assert normalize_method("PROPFIND") == OTHER
+
+    def test_normalize_status(self):
+        assert normalize_status("4xx") == "4xx"
+        assert normalize_status("418") == OTHER
+
+    def test_tally_statuses(self):
+        by_class, successful, errors_4xx, errors_5xx = tally_statuses({200: 3, 204: 1, 302: 1, 404: 2, 503: 1})
+        assert by_class == {"2xx": 4, "3xx": 1, "4xx": 2, "5xx": 1}
+        assert (successful, errors_4xx, errors_5xx) == (5, 2, 1)
+
+    def test_default_max_series(self, monkeypatch):
+        monkeypatch.delenv("METRICS_MAX_SERIES", raising=False)
+        assert get_max_series() == 100
+
+    def test_configured_max_series(self, monkeypatch):
+        monkeypatch.setenv("METRICS_MAX_SERIES", "5")
+        assert get_max_series() == 5
+
+
+class TestLabelCache:
+    """Test the cardinality-limited series cache."""
+
+    def test_series_built_once(self):
+        built = []
+        cache = LabelCache(lambda route, method: built.append((route, method)) or object(), limit=10)
+        first = cache.get("/index", "GET")
+        assert cache.get("/index", "GET") is first
+        assert built == [("/index", "GET")]
+
+    def test_overflow_folded_into_other(self):
+        cache = LabelCache(lambda route, method: (route, method), limit=2)
+        cache.get("/a", "GET")
+        cache.get("/b", "GET")
+        assert cache.get("/c", "GET") == (OTHER, "GET")
+        assert cache.get("/d", "POST") == (OTHER, "POST")
+
+    def test_existing_series_still_resolve_after_limit(self):
+        cache = LabelCache(lambda route, method: (route, method), limit=1)
+        cache.get("/a", "GET")
+        cache.get("/b", "GET")
+        assert cache.get("/a", "GET") == ("/a", "GET")
+
+    def test_series_count_bounded(self):
+        cache = LabelCache(lambda route, method: (route, method), limit=3)
+        for i in range(1000):
+            cache.get(f"/user/{i}", "GET")
+            cache.get(f"/user/{i}", f"VERB{i}")
+        assert len(cache) <= 3 + 2
+
+    def test_unknown_method_normalized(self):
+        cache = LabelCache(lambda route, method: (route, method), limit=10)
+        assert cache.get("/a", "PROPFIND") == ("/a", OTHER)
+
+
+class TestRequestLabels:
+    """Test labels taken from Flask requests."""
+
+    def test_route_template_used(self, prometheus_env, flask_app):
+        from app.metrics import get_metrics_backend
+
+        client = flask_app.test_client()
+        client.get("/index", buffered=True)
+        client.get("/no-such-page", buffered=True)
+
+        by_route = get_metrics_backend().get_metrics_summary()["requests_by_route"]
+        values = {(r["route"], r["method"], r["status"]): r["value"] for r in by_route}
+        assert values[("/index", "GET", "2xx")] == 1
+        assert values[("unmatched", "GET", "4xx")] == 1
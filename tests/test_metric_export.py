@@ -0,0 +1,230 @@
+import time
+
+import pytest
+from opentelemetry.sdk.metrics import Counter, Histogram, MeterProvider
+from opentelemetry.sdk.metrics.export import AggregationTemporality
+
+from app.metrics.export import AdaptiveMetricReader, preferred_temporality
+from tests.collector import RecordingMetricExporter
+
+INDEX = (("route", "/index"),)
+TASK = (("route", "/do_task"),)
+
+
+@pytest.fixture
+def pipeline():
+    """Return a factory of (meter, reader, exporter) with the worker effectively idle."""
+    providers = []
+
+    def make(temporality="cumulative", **kwargs):
+        kwargs.setdefault("interval", 3600)
+        kwargs.setdefault("max_interval", 3600)
+        exporter = RecordingMetricExporter(preferred_temporality(temporality))
+        reader = AdaptiveMetricReader(exporter, **kwargs)
+        provider = MeterProvider(metric_readers=[reader])
+        providers.append(provider)
+        return provider.get_meter(__name__), reader, exporter
+
+    yield make
+    for provider in providers:
+        provider.shutdown()
+
+
+class TestChangedOnlyExport:
+    """Test that series which did not change are left out of exports."""
+
+    def test_unchanged_series_left_out(self, pipeline):
+        meter, reader, exporter = pipeline()
+        counter = meter.create_counter("http_requests")
+        counter.add(1, dict(INDEX))
+        counter.add(1, dict(TASK))
+        reader.collect()
+        assert exporter.points().keys() == {("http_requests", INDEX), ("http_requests", TASK)}
+
+        counter.add(1, dict(INDEX))
+        reader.collect()
+        assert exporter.points().keys() == {("http_requests", INDEX)}
+        assert exporter.points()[("http_requests", INDEX)].value == 2  # still cumulative
+        assert reader.unchanged_points == 1
+
+    def test_export_skipped_when_nothing_changed(self, pipeline):
+        meter, reader, exporter = pipeline()
+        meter.create_counter("http_requests").add(1)
+        reader.collect()
+        reader.collect()
+        assert (reader.exports, reader.skipped_exports) == (1, 1)
+        assert len(exporter.exports) == 1
+
+    def test_histogram_and_gauge_changes(self, pipeline):
+        meter, reader, exporter = pipeline()
+        histogram = meter.create_histogram("request_processing_seconds")
+        gauge = meter.create_gauge("task_queue_depth")
+        histogram.record(0.1)
+        gauge.set(3)
+        reader.collect()
+        gauge.set(3)
+        histogram.record(0.2)
+        reader.collect()
+        assert exporter.points().keys() == {("request_processing_seconds", ())}
+        gauge.set(4)
+        reader.collect()
+        assert exporter.points()[("task_queue_depth", ())].value == 4
+
+    def test_disabled_resends_every_series(self, pipeline):
+        meter, reader, exporter = pipeline(changed_only=False)
+        counter = meter.create_counter("http_requests")
+        counter.add(1, dict(INDEX))
+        counter.add(1, dict(TASK))
+        reader.collect()
+        reader.collect()
+        assert len(exporter.exports) == 2
+        assert len(exporter.points()) == 2
+
+
+class TestDeltaTemporality:
+    """Test delta temporality for counters and histograms."""
+
+    def test_preferred_temporality(self):
+        assert preferred_temporality("cumulative") is None
+        delta = preferred_temporality("delta")
+        assert delta[Counter] is delta[Histogram] is AggregationTemporality.DELTA
+
+    def test_reports_increments_since_last_export(self, pipeline):
+        meter, reader, exporter = pipeline("delta")
+        counter = meter.create_counter("http_requests")
+        counter.add(3, dict(INDEX))
+        counter.add(1, dict(TASK))
+        reader.collect()
+        counter.add(3, dict(INDEX))
+        reader.collect()
+        # An equal delta is new traffic, not an unchanged series
+        assert exporter.points() == {("http_requests", INDEX): exporter.points()[("http_requests", INDEX)]}
+        assert exporter.points()[("http_requests", INDEX)].value == 3
+
+    def test_idle_collection_stretches_interval(self, pipeline):
+        meter, reader, exporter = pipeline("delta", interval=10, max_interval=60)
+        meter.create_counter("http_requests").add(1)
+        reader._collect_safely()
+        reader._collect_safely()
+        assert len(exporter.exports) == 1
+        assert (reader.skipped_exports, reader.interval) == (1, 20)
+
+    def test_app_reader_uses_configured_temporality(self, monkeypatch):
+        monkeypatch.setenv("OTEL_EXPORTER", "console")
+        monkeypatch.setenv("OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE", "delta")
+        from app.metrics.otel import _create_metric_reader
+
+        reader = _create_metric_reader()
+        assert isinstance(reader, AdaptiveMetricReader)
+        assert reader._instrument_class_temporality[next(
+            cls for cls in reader._instrument_class_temporality if cls.__name__ == "_Counter"
+        )] is AggregationTemporality.DELTA
+        reader.shutdown()
+
+
+class TestAdaptiveInterval:
+    """Test the export interval following traffic."""
+
+    def test_stretches_while_idle_and_resets_on_change(self, pipeline):
+        meter, reader, _ = pipeline(interval=10, max_interval=60)
+        counter = meter.create_counter("http_requests")
+        counter.add(1)
+        reader.collect()
+        assert reader.interval == 10
+        intervals = []
+        for _ in range(4):
+            reader.collect()
+            intervals.append(reader.interval)
+        assert intervals == [20, 40, 60, 60]
+        counter.add(1)
+        reader.collect()
+        assert reader.interval == 10
+
+    def test_fixed_when_max_equals_interval(self, pipeline):
+        _, reader, _ = pipeline(interval=10, max_interval=10)
+        reader.collect()
+        reader.collect()
+        assert reader.interval == 10
+
+    def test_worker_exports_on_interval(self, pipeline):
+        meter, reader, exporter = pipeline(interval=0.02, max_interval=0.02)
+        meter.create_counter("http_requests").add(1)
+        deadline = time.monotonic() + 5
+        while not exporter.exports and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert exporter.exports
+
+    def test_shutdown_exports_pending_changes(self):
+        exporter = RecordingMetricExporter()
+        provider = MeterProvider(metric_readers=[AdaptiveMetricReader(exporter, interval=3600)])
+        provider.get_meter(__name__).create_counter("http_requests").add(1)
+        provider.shutdown()
+        assert len(exporter.exports) == 1
+
+    def test_exporter_exception_does_not_stop_reader(self, pipeline):
+        meter, reader, exporter = pipeline()
+        counter = meter.create_counter("http_requests")
+        exporter.raises = True
+        counter.add(1)
+        reader.collect()
+        exporter.raises = False
+        counter.add(1)
+        reader.collect()
+        assert exporter.points()[("http_requests", ())].value == 2
+
+    def test_unchanged_series_resent_after_failed_export(self, pipeline):
+        meter, reader, exporter = pipeline()
+        gauge = meter.create_gauge("task_queue_depth")
+        gauge.set(0)
+        exporter.fails = True
+        reader.collect()
+        exporter.fails = False
+        reader.collect()
+        assert exporter.points()[("task_queue_depth", ())].value == 0
+        assert (reader.exports, reader.failed_exports) == (1, 1)
+        reader.collect()
+        assert (reader.exports, reader.skipped_exports) == (1, 1)
+
+
+class TestPayloadSize:
+    """Test the payload saved against a local recording exporter."""
+
+    def test_changed_only_payload_is_smaller(self, pipeline):
+        payloads = {}
+        for changed_only in (False, True):
+            meter, reader, exporter = pipeline(changed_only=changed_only)
+            counter = meter.create_counter("http_requests")
+            histogram = meter.create_histogram("request_processing_seconds")
+            for route in range(50):
+                counter.add(1, {"route": f"/route/{route}"})
+                histogram.record(0.01, {"route": f"/route/{route}"})
+            reader.collect()
+            for _ in range(10):
+                counter.add(1, {"route": "/route/0"})
+                histogram.record(0.01, {"route": "/route/0"})
+                reader.collect()
+            payloads[changed_only] = sum(exporter.payload_bytes[1:])
+        assert payloads[True] * 20 < payloads[False]
+
+
+class TestConfiguration:
+    """Test the OTEL_METRIC_EXPORT_* settings."""
+
+    def test_defaults(self, monkeypatch):
+        for name in ("OTEL_METRIC_EXPORT_INTERVAL", "OTEL_METRIC_EXPORT_MAX_INTERVAL",
+                     "OTEL_EXPORTER_OTLP_METRICS_TEMPORALITY_PREFERENCE", "OTEL_METRIC_EXPORT_CHANGED_ONLY"):
+            monkeypatch.delenv(name, raising=False)
+        from app.metrics import export
+
+        assert export.get_metric_export_interval() == 10.0
+        assert export.get_metric_export_max_interval() == 60.0
+        assert export.get_metric_temporality() == "cumulative"
+        assert export.get_changed_only_export() is True
+
+    def test_intervals_in_milliseconds(self, monkeypatch):
+        monkeypatch.setenv("OTEL_METRIC_EXPORT_INTERVAL", "5000")
+        monkeypatch.setenv("OTEL_METRIC_EXPORT_MAX_INTERVAL", "300000")
+        from app.metrics import export
+
+        assert export.get_metric_export_interval() == 5.0
+        assert export.get_metric_export_max_interval() == 300.0
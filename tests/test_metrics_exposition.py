@@ -0,0 +1,182 @@
+import gzip
+import threading
+import time
+
+import pytest
+from prometheus_client import CollectorRegistry, Counter
+from prometheus_client.core import CounterMetricFamily
+from werkzeug.test import Client
+
+from app.metrics.exposition import CachedMetricsApp, get_cache_ttl
+
+
+class CountingCollector:
+    """Collector that counts renders and can be slowed down."""
+
+    def __init__(self, delay=0.0):
+        self.collects = 0
+        self.delay = delay
+
+    def collect(self):
+        self.collects += 1
+        time.sleep(self.delay)
+        yield CounterMetricFamily("renders", "Number of renders", value=self.collects)
+
+
+@pytest.fixture
+def registry():
+    registry = CollectorRegistry()
+    counter = Counter("scrapes_seen", "Test counter", registry=registry)
+    counter.inc()
+    registry.test_counter = counter
+    return registry
+
+
+class TestCacheTTLConfiguration:
+    """Test METRICS_CACHE_TTL parsing."""
+
+    def test_default_ttl(self, monkeypatch):
+        monkeypatch.delenv("METRICS_CACHE_TTL", raising=False)
+        assert get_cache_ttl() == 1.0
+
+    def test_configured_ttl(self, monkeypatch):
+        monkeypatch.setenv("METRICS_CACHE_TTL", "2.5")
+        assert get_cache_ttl() == 2.5
+
+    def test_negative_ttl_clamped(self, monkeypatch):
+        monkeypatch.setenv("METRICS_CACHE_TTL", "-1")
+        assert get_cache_ttl() == 0.0
+
+
+class TestCachedMetricsApp:
+    """Test caching of rendered scrapes."""
+
+    def test_serves_exposition(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        response = client.get("/")
+        assert response.status_code == 200
+        assert b"scrapes_seen_total 1.0" in response.data
+        assert response.headers["Content-Type"].startswith("text/plain")
+
+    def test_reuses_response_within_ttl(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        client.get("/")
+        registry.test_counter.inc()
+        clock.now += 4
+        assert b"scrapes_seen_total 1.0" in client.get("/").data
+
+    def test_rerenders_after_ttl(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        client.get("/")
+        registry.test_counter.inc()
+        clock.now += 5
+        assert b"scrapes_seen_total 2.0" in client.get("/").data
+
+    def test_zero_ttl_renders_every_scrape(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=0, clock=clock))
+        client.get("/")
+        registry.test_counter.inc()
+        assert b"scrapes_seen_total 2.0" in client.get("/").data
+
+    def test_content_types_cached_separately(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        plain = client.get("/")
+        openmetrics = client.get("/", headers={"Accept": "application/openmetrics-text"})
+        assert openmetrics.headers["Content-Type"].startswith("application/openmetrics-text")
+        assert openmetrics.data.endswith(b"# EOF\n")
+        assert plain.headers["ETag"] != openmetrics.headers["ETag"]
+
+    def test_name_filter_bypasses_cache(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        client.get("/")
+        registry.test_counter.inc()
+        response = client.get("/?name[]=scrapes_seen_total")
+        assert b"scrapes_seen_total 2.0" in response.data
+
+    def test_before_render_called_per_render(self, registry, clock):
+        renders = []
+        app = CachedMetricsApp(registry, ttl=5, clock=clock, before_render=lambda: renders.append(1))
+        client = Client(app)
+        client.get("/")
+        client.get("/")
+        assert len(renders) == 1
+        clock.now += 5
+        client.get("/")
+        assert len(renders) == 2
+
+    def test_single_flight_render(self):
+        collector = CountingCollector(delay=0.05)
+        registry = CollectorRegistry()
+        registry.register(collector)
+        app = CachedMetricsApp(registry, ttl=60)
+
+        bodies = []
+
+        def scrape():
+            bodies.append(Client(app).get("/").data)
+
+        threads = [threading.Thread(target=scrape) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert collector.collects == 1
+        assert len(set(bodies)) == 1
+
+
+class TestCompressionAndConditionalScrapes:
+    """Test gzip negotiation and ETag handling."""
+
+    def test_gzip_when_accepted(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        plain = client.get("/")
+        compressed = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(compressed.data) == plain.data
+        assert int(compressed.headers["Content-Length"]) == len(compressed.data)
+
+    def test_no_gzip_when_disabled(self, registry, clock):
+        app = CachedMetricsApp(registry, ttl=5, disable_compression=True, clock=clock)
+        response = Client(app).get("/", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+
+    def test_not_modified_for_matching_etag(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        etag = client.get("/").headers["ETag"]
+        response = client.get("/", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+    def test_strong_form_of_etag_matches(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        etag = client.get("/").headers["ETag"]
+        response = client.get("/", headers={"If-None-Match": f'"other", {etag[2:]}'})
+        assert response.status_code == 304
+
+    def test_changed_metrics_return_full_response(self, registry, clock):
+        client = Client(CachedMetricsApp(registry, ttl=5, clock=clock))
+        etag = client.get("/").headers["ETag"]
+        registry.test_counter.inc()
+        clock.now += 5
+        response = client.get("/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_head_has_no_body(self, registry, clock):
+        response = Client(CachedMetricsApp(registry, ttl=5, clock=clock)).head("/")
+        assert response.status_code == 200
+        assert response.data == b""
+
+    def test_post_not_allowed(self, registry, clock):
+        response = Client(CachedMetricsApp(registry, ttl=5, clock=clock)).post("/")
+        assert response.status_code == 405
+
+
+class TestMetricsEndpoint:
+    """Test that create_app serves /metrics through the cache."""
+
+    def test_metrics_endpoint_has_etag(self, prometheus_env, flask_app):
+        response = flask_app.test_client().get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["ETag"].startswith('W/"')
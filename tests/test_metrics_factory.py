@@ -92,6 +92,17 @@ class TestMetricsBackendInterface:
         assert hasattr(backend, 'inc_5xx')
         assert hasattr(backend, 'time_request')
         assert hasattr(backend, 'time_request_decorator')
+        assert hasattr(backend, 'observe_request')
+        assert hasattr(backend, 'record_request')
+        assert hasattr(backend, 'record_batch')
+        assert hasattr(backend, 'flush')
+        assert hasattr(backend, 'observe_trace_sampling')
+        assert hasattr(backend, 'set_span_queue_size')
+        assert hasattr(backend, 'observe_span_export')
+        assert hasattr(backend, 'inc_spans_dropped')
+        assert hasattr(backend, 'set_task_queue_depth')
+        assert hasattr(backend, 'set_tasks_running')
+        assert hasattr(backend, 'observe_task_queue_wait')
         assert hasattr(backend, 'get_metrics_summary')
 
     def test_otel_has_required_methods(self, otel_env):
@@ -104,6 +115,14 @@ class TestMetricsBackendInterface:
         assert hasattr(backend, 'inc_5xx')
         assert hasattr(backend, 'time_request')
         assert hasattr(backend, 'time_request_decorator')
+        assert hasattr(backend, 'observe_request')
+        assert hasattr(backend, 'record_request')
+        assert hasattr(backend, 'record_batch')
+        assert hasattr(backend, 'flush')
+        assert hasattr(backend, 'observe_trace_sampling')
+        assert hasattr(backend, 'set_task_queue_depth')
+        assert hasattr(backend, 'set_tasks_running')
+        assert hasattr(backend, 'observe_task_queue_wait')
         assert hasattr(backend, 'get_metrics_summary')
 
     def test_methods_are_callable(self, prometheus_env):
@@ -0,0 +1,213 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Simulates one gunicorn worker: the multiprocess value class is chosen when
+# prometheus_client is imported, so every worker needs its own interpreter.
+WORKER_SCRIPT = """
+import sys
+from app.metrics.prometheus import PrometheusMetrics
+
+metrics = PrometheusMetrics()
+for _ in range(int(sys.argv[1])):
+    metrics.inc_requests("/index", "GET", "2xx")
+    metrics.inc_successful("/index", "GET")
+    with metrics.time_request("/index", "GET"):
+        pass
+metrics.inc_4xx("unmatched", "GET")
+metrics.flush()  # as gunicorn's worker_exit hook does
+print(__import__("os").getpid())
+"""
+
+
+def run_worker(multiproc_dir, requests):
+    """Run a worker process that records traffic and return its pid."""
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir))
+    result = subprocess.run(
+        [sys.executable, "-c", WORKER_SCRIPT, str(requests)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return int(result.stdout.strip())
+
+
+def collect_values(registry):
+    """Flatten a registry into {sample_name + labels: value}, summed over route/method/status."""
+    values = {}
+    for metric in registry.collect():
+        for sample in metric.samples:
+            labels = sorted(
+                (name, value) for name, value in sample.labels.items()
+                if name not in ("route", "method", "status")
+            )
+            key = sample.name + str(labels)
+            values[key] = values.get(key, 0.0) + sample.value
+    return values
+
+
+@pytest.fixture
+def multiproc_dir(tmp_path, monkeypatch):
+    """Enable multiprocess mode with an empty directory."""
+    path = tmp_path / "prometheus"
+    path.mkdir()
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(path))
+    return path
+
+
+class TestMultiprocessConfiguration:
+    """Test multiprocess mode detection and registry selection."""
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+
+        from app.metrics.multiprocess import is_multiprocess_enabled
+
+        assert not is_multiprocess_enabled()
+
+    def test_global_registry_when_disabled(self, monkeypatch):
+        monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+
+        from prometheus_client import REGISTRY
+        from app.metrics.multiprocess import get_registry
+
+        assert get_registry() is REGISTRY
+
+    def test_dedicated_registry_when_enabled(self, multiproc_dir):
+        from prometheus_client import REGISTRY
+        from app.metrics.multiprocess import get_registry, is_multiprocess_enabled
+
+        assert is_multiprocess_enabled()
+        assert get_registry() is not REGISTRY
+
+    def test_prepare_removes_stale_files(self, multiproc_dir):
+        from app.metrics.multiprocess import prepare_multiproc_dir
+
+        (multiproc_dir / "counter_123.db").write_bytes(b"stale")
+        (multiproc_dir / "request_sketch_123.bin").write_bytes(b"stale")
+        (multiproc_dir / "notes.txt").write_text("keep")
+
+        prepare_multiproc_dir()
+
+        assert sorted(os.listdir(multiproc_dir)) == ["notes.txt"]
+
+    def test_prepare_creates_directory(self, tmp_path, monkeypatch):
+        path = tmp_path / "missing"
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(path))
+
+        from app.metrics.multiprocess import prepare_multiproc_dir
+
+        prepare_multiproc_dir()
+        assert path.is_dir()
+
+
+class TestMultiprocessAggregation:
+    """Test that metrics are merged across worker processes."""
+
+    def test_counters_merged_across_workers(self, multiproc_dir):
+        from app.metrics.multiprocess import get_registry
+
+        run_worker(multiproc_dir, 3)
+        run_worker(multiproc_dir, 4)
+
+        values = collect_values(get_registry())
+        assert values["http_requests_total[]"] == 7
+        assert values["http_error_4xx_total[]"] == 2
+
+    def test_histograms_merged_across_workers(self, multiproc_dir):
+        from app.metrics.multiprocess import get_registry
+
+        run_worker(multiproc_dir, 3)
+        run_worker(multiproc_dir, 4)
+
+        values = collect_values(get_registry())
+        assert values["request_processing_seconds_count[]"] == 7
+        assert values["request_processing_seconds_bucket[('le', '+Inf')]"] == 7
+
+    def test_summary_uses_merged_view(self, multiproc_dir, prometheus_env):
+        from app.metrics.prometheus import PrometheusMetrics
+
+        run_worker(multiproc_dir, 2)
+        run_worker(multiproc_dir, 5)
+
+        summary = PrometheusMetrics().get_metrics_summary()
+        assert summary["http_requests"]["value"] == 7
+        assert summary["http_successful_request"]["value"] == 7
+        assert summary["http_4xx_errors"]["value"] == 2
+        assert summary["http_5xx_errors"]["value"] == 0
+
+        names = [b["name"] for b in summary["histogram_buckets"]]
+        assert names[-2:] == ["request_processing_seconds_count", "request_processing_seconds_sum"]
+        inf_bucket = next(b for b in summary["histogram_buckets"] if b["le"] == "+Inf")
+        assert inf_bucket["value"] == 7
+
+    def test_quantile_sketches_merged_across_workers(self, multiproc_dir):
+        from app.metrics.multiprocess import read_merged_sketch
+
+        run_worker(multiproc_dir, 2)
+        run_worker(multiproc_dir, 5)
+
+        assert read_merged_sketch().count == 7
+
+
+class TestDeadWorkerCleanup:
+    """Test folding dead worker files into archives."""
+
+    def test_dead_worker_files_are_archived(self, multiproc_dir):
+        from app.metrics.multiprocess import mark_worker_dead
+
+        pid = run_worker(multiproc_dir, 3)
+        mark_worker_dead(pid)
+
+        files = sorted(os.listdir(multiproc_dir))
+        assert files == ["counter_archive.db", "histogram_archive.db", "request_sketch_archive.bin"]
+
+    def test_totals_preserved_after_cleanup(self, multiproc_dir):
+        from app.metrics.multiprocess import get_registry, mark_worker_dead
+
+        first = run_worker(multiproc_dir, 3)
+        second = run_worker(multiproc_dir, 4)
+        before = collect_values(get_registry())
+
+        mark_worker_dead(first)
+        mark_worker_dead(second)
+        after = collect_values(get_registry())
+
+        # Live gauges of dead workers are dropped; everything else is kept
+        live_gauges = ("task_queue_depth[]", "tasks_running[]", "span_queue_size[]")
+        assert after == {k: v for k, v in before.items() if k not in live_gauges}
+
+    def test_sketches_preserved_after_cleanup(self, multiproc_dir):
+        from app.metrics.multiprocess import mark_worker_dead, read_merged_sketch
+
+        first = run_worker(multiproc_dir, 3)
+        second = run_worker(multiproc_dir, 4)
+        mark_worker_dead(first)
+        mark_worker_dead(second)
+
+        assert read_merged_sketch().count == 7
+
+    def test_live_worker_untouched(self, multiproc_dir):
+        from app.metrics.multiprocess import mark_worker_dead
+
+        live = run_worker(multiproc_dir, 1)
+        dead = run_worker(multiproc_dir, 1)
+        mark_worker_dead(dead)
+
+        assert (multiproc_dir / f"counter_{live}.db").exists()
+        assert not (multiproc_dir / f"counter_{dead}.db").exists()
+
+
+class TestMetricsEndpoint:
+    """Test that /metrics serves the merged view."""
+
+    def test_metrics_endpoint_serves_all_workers(self, multiproc_dir, prometheus_env, flask_app):
+        run_worker(multiproc_dir, 3)
+        run_worker(multiproc_dir, 4)
+
+        response = flask_app.test_client().get("/metrics")
+
+        assert response.status_code == 200
+        assert b'http_requests_total{method="GET",route="/index",status="2xx"} 7.0' in response.data
@@ -6,7 +6,9 @@ import pytest
 def otel_metrics(otel_env):
     """Create a fresh OTelMetrics instance."""
     from app.metrics.otel import OTelMetrics
-    return OTelMetrics()
+    metrics = OTelMetrics()
+    yield metrics
+    metrics._provider.shutdown()
 
 
 class TestOTelMetricsCounters:
@@ -105,6 +107,57 @@ class TestOTelMetricsHistogram:
         assert new_sum > initial_sum
 
 
+class TestOTelMetricsLabels:
+    """Test route/method/status labels."""
+
+    def test_requests_by_route(self, otel_metrics):
+        otel_metrics.inc_requests("/index", "GET", "2xx")
+        otel_metrics.inc_requests("/index", "GET", "2xx")
+        otel_metrics.inc_requests("/do_task", "POST", "5xx")
+        by_route = otel_metrics.get_metrics_summary()["requests_by_route"]
+        values = {(r["route"], r["method"], r["status"]): r["value"] for r in by_route}
+        assert values[("/index", "GET", "2xx")] == 2
+        assert values[("/do_task", "POST", "5xx")] == 1
+
+    def test_totals_sum_over_labels(self, otel_metrics):
+        initial = otel_metrics.get_metrics_summary()["http_successful_request"]["value"]
+        otel_metrics.inc_successful("/index", "GET")
+        otel_metrics.inc_successful("/do_task", "GET")
+        new_value = otel_metrics.get_metrics_summary()["http_successful_request"]["value"]
+        assert new_value == initial + 2
+
+    def test_routes_beyond_limit_fold_into_other(self, monkeypatch, request):
+        monkeypatch.setenv("METRICS_MAX_SERIES", "1")
+        otel_metrics = request.getfixturevalue("otel_metrics")
+        otel_metrics.inc_requests("/index", "GET", "2xx")
+        otel_metrics.inc_requests("/user/1", "GET", "2xx")
+        otel_metrics.inc_requests("/user/2", "GET", "2xx")
+        routes = {r["route"] for r in otel_metrics.get_metrics_summary()["requests_by_route"]}
+        assert "/user/1" not in routes
+        assert "other" in routes
+
+
+class TestOTelMetricsTasks:
+    """Test task executor metrics."""
+
+    def test_set_task_queue_depth(self, otel_metrics):
+        otel_metrics.set_task_queue_depth(3)
+        assert otel_metrics.get_metrics_summary()["task_queue_depth"]["value"] == 3
+
+    def test_set_tasks_running(self, otel_metrics):
+        otel_metrics.set_tasks_running(2)
+        otel_metrics.set_tasks_running(1)
+        assert otel_metrics.get_metrics_summary()["tasks_running"]["value"] == 1
+
+    def test_observe_task_queue_wait(self, otel_metrics):
+        otel_metrics.observe_task_queue_wait(0.25)
+        otel_metrics.observe_task_queue_wait(0.5)
+        wait = otel_metrics.get_metrics_summary()["task_queue_wait"]
+        assert wait["name"] == "task_queue_wait_seconds"
+        assert wait["count"] == 2
+        assert wait["sum"] == pytest.approx(0.75)
+
+
 class TestOTelMetricsSummary:
     """Test get_metrics_summary method."""
 
@@ -162,8 +215,10 @@ class TestOTelMetricsServiceName:
         # We can't easily verify it without accessing internals,
         # but we can verify the instance is created successfully
         assert metrics is not None
+        metrics._provider.shutdown()
 
     def test_custom_service_name(self, otel_env):
         from app.metrics.otel import OTelMetrics
         metrics = OTelMetrics(service_name="custom-service")
         assert metrics is not None
+        metrics._provider.shutdown()
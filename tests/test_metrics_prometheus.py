@@ -127,6 +127,57 @@ class TestPrometheusMetricsHistogram:
         assert new_sum > initial_sum
 
 
+class TestPrometheusMetricsLabels:
+    """Test route/method/status labels."""
+
+    def test_requests_by_route(self, prometheus_metrics):
+        prometheus_metrics.inc_requests("/index", "GET", "2xx")
+        prometheus_metrics.inc_requests("/index", "GET", "2xx")
+        prometheus_metrics.inc_requests("/do_task", "POST", "5xx")
+        by_route = prometheus_metrics.get_metrics_summary()["requests_by_route"]
+        values = {(r["route"], r["method"], r["status"]): r["value"] for r in by_route}
+        assert values[("/index", "GET", "2xx")] == 2
+        assert values[("/do_task", "POST", "5xx")] == 1
+
+    def test_totals_sum_over_labels(self, prometheus_metrics):
+        initial = prometheus_metrics.get_metrics_summary()["http_successful_request"]["value"]
+        prometheus_metrics.inc_successful("/index", "GET")
+        prometheus_metrics.inc_successful("/do_task", "GET")
+        new_value = prometheus_metrics.get_metrics_summary()["http_successful_request"]["value"]
+        assert new_value == initial + 2
+
+    def test_routes_beyond_limit_fold_into_other(self, monkeypatch, request):
+        monkeypatch.setenv("METRICS_MAX_SERIES", "1")
+        prometheus_metrics = request.getfixturevalue("prometheus_metrics")
+        prometheus_metrics.inc_requests("/index", "GET", "2xx")
+        prometheus_metrics.inc_requests("/user/1", "GET", "2xx")
+        prometheus_metrics.inc_requests("/user/2", "GET", "2xx")
+        routes = {r["route"] for r in prometheus_metrics.get_metrics_summary()["requests_by_route"]}
+        assert "/user/1" not in routes
+        assert "other" in routes
+
+
+class TestPrometheusMetricsTasks:
+    """Test task executor metrics."""
+
+    def test_set_task_queue_depth(self, prometheus_metrics):
+        prometheus_metrics.set_task_queue_depth(3)
+        assert prometheus_metrics.get_metrics_summary()["task_queue_depth"]["value"] == 3
+
+    def test_set_tasks_running(self, prometheus_metrics):
+        prometheus_metrics.set_tasks_running(2)
+        prometheus_metrics.set_tasks_running(1)
+        assert prometheus_metrics.get_metrics_summary()["tasks_running"]["value"] == 1
+
+    def test_observe_task_queue_wait(self, prometheus_metrics):
+        prometheus_metrics.observe_task_queue_wait(0.25)
+        prometheus_metrics.observe_task_queue_wait(0.5)
+        wait = prometheus_metrics.get_metrics_summary()["task_queue_wait"]
+        assert wait["name"] == "task_queue_wait_seconds"
+        assert wait["count"] == 2
+        assert wait["sum"] == pytest.approx(0.75)
+
+
 class TestPrometheusMetricsSummary:
     """Test get_metrics_summary method."""
 
@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+
+@pytest.fixture
+def pull_env(monkeypatch):
+    """Set environment for the OTel backend served at /metrics."""
+    monkeypatch.setenv("METRICS_BACKEND", "otel")
+    monkeypatch.setenv("OTEL_METRICS_EXPORTER", "prometheus")
+    monkeypatch.setenv("OTEL_EXPORTER", "none")
+    monkeypatch.setenv("METRICS_CACHE_TTL", "0")
+
+
+def make_app():
+    from app import create_app
+    from config import Config
+
+    class TestConfig(Config):
+        TESTING = True
+
+    return create_app(TestConfig)
+
+
+def record_workload(backend):
+    """Drive every instrument of a backend with fixed values."""
+    for status, seconds in ((200, 0.003), (200, 0.2), (302, 0.04), (404, 0.001), (503, 3.0)):
+        backend.record_request("/index", "GET", status, seconds)
+    backend.record_request("/do_task", "POST", 202, 0.02)
+    backend.set_task_queue_depth(3)
+    backend.set_tasks_running(2)
+    backend.observe_task_queue_wait(0.7)
+    backend.observe_trace_sampling(True)
+    backend.observe_trace_sampling(False)
+    backend.set_span_queue_size(5)
+    backend.observe_span_export(64, 0.015)
+    backend.inc_spans_dropped(4, "queue_full")
+    backend.inc_spans_dropped(1, "export_failed")
+
+
+def samples(body: bytes) -> dict:
+    """Return {(name, labels): value} of an exposition, without _created and runtime series."""
+    parsed = {}
+    for family in text_string_to_metric_families(body.decode()):
+        if family.name.startswith(("process_", "python_")):
+            continue
+        for sample in family.samples:
+            if not sample.name.endswith("_created"):
+                parsed[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    return parsed
+
+
+class TestPrometheusReader:
+    """Test OTEL_METRICS_EXPORTER=prometheus with the OTel backend."""
+
+    def test_creates_pull_reader(self, pull_env):
+        from opentelemetry.exporter.prometheus import PrometheusMetricReader
+        from prometheus_client import CollectorRegistry
+
+        from app.metrics.otel import _create_metric_reader
+
+        assert isinstance(_create_metric_reader(CollectorRegistry()), PrometheusMetricReader)
+
+    def test_no_export_thread(self, pull_env):
+        from app.metrics import get_metrics_backend
+
+        before = set(threading.enumerate())
+        get_metrics_backend()
+        assert set(threading.enumerate()) - before == set()
+
+    def test_metrics_served(self, pull_env):
+        client = make_app().test_client()
+        client.get("/index", buffered=True)
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert samples(response.data)[("http_requests_total", (("method", "GET"), ("route", "/index"),
+                                                               ("status", "2xx")))] == 1
+
+    def test_collected_on_each_scrape(self, pull_env):
+        from app.metrics import get_metrics_backend
+
+        client = make_app().test_client()
+        key = ("tasks_running", ())
+        get_metrics_backend().set_tasks_running(1)
+        assert samples(client.get("/metrics").data)[key] == 1
+        get_metrics_backend().set_tasks_running(4)
+        assert samples(client.get("/metrics").data)[key] == 4
+
+    def test_openmetrics_negotiated(self, pull_env):
+        response = make_app().test_client().get("/metrics", headers={"Accept": "application/openmetrics-text"})
+        assert response.headers["Content-Type"].startswith("application/openmetrics-text")
+        assert response.data.endswith(b"# EOF\n")
+
+    def test_traces_still_exported(self, pull_env, monkeypatch):
+        monkeypatch.setenv("OTEL_EXPORTER", "console")
+        assert "tracer_provider" in make_app().extensions
+        assert make_app().test_client().get("/metrics").status_code == 200
+
+    def test_otel_exporter_selects_metrics_exporter_by_default(self, monkeypatch):
+        from app.tracing import get_metrics_exporter_type
+
+        monkeypatch.delenv("OTEL_METRICS_EXPORTER", raising=False)
+        monkeypatch.setenv("OTEL_EXPORTER", "otlp_http")
+        assert get_metrics_exporter_type() == "otlp_http"
+
+    def test_push_exporters_do_not_serve_metrics(self, otel_env):
+        assert make_app().test_client().get("/metrics").status_code == 404
+
+
+class TestExpositionParity:
+    """Test that both backends expose the same series and values at /metrics."""
+
+    def scrape(self, monkeypatch, backend_type):
+        import app.metrics
+
+        monkeypatch.setenv("METRICS_BACKEND", backend_type)
+        client = make_app().test_client()
+        record_workload(app.metrics.get_metrics_backend())
+        body = client.get("/metrics").data
+        provider = getattr(app.metrics._metrics_instance, "_provider", None)
+        if provider is not None:
+            provider.shutdown()
+        app.metrics._metrics_instance = None
+        return body
+
+    @pytest.fixture
+    def expositions(self, monkeypatch):
+        """Return the /metrics bodies of the Prometheus backend and the pulled OTel backend."""
+        monkeypatch.setenv("OTEL_METRICS_EXPORTER", "prometheus")
+        monkeypatch.setenv("OTEL_EXPORTER", "none")
+        monkeypatch.setenv("METRICS_CACHE_TTL", "0")
+        monkeypatch.setenv("METRICS_EXEMPLARS", "false")
+        return self.scrape(monkeypatch, "prometheus"), self.scrape(monkeypatch, "otel")
+
+    def test_same_series_and_values(self, expositions):
+        prometheus, otel = map(samples, expositions)
+        assert otel.keys() == prometheus.keys()
+        for key, value in prometheus.items():
+            assert otel[key] == pytest.approx(value), key
+
+    def test_same_histogram_buckets(self, expositions):
+        prometheus, otel = map(samples, expositions)
+        buckets = {labels for name, labels in prometheus if name == "request_processing_seconds_bucket"}
+        assert len(buckets) == 2 * 15
+        assert buckets == {labels for name, labels in otel if name == "request_processing_seconds_bucket"}
+
+    def test_same_metric_types(self, expositions):
+        prometheus, otel = (
+            {family.name: family.type for family in text_string_to_metric_families(body.decode())
+             if not family.name.endswith("_created")}
+            for body in expositions
+        )
+        assert otel == prometheus
+
+    def test_runtime_series(self, expositions):
+        _, otel = expositions
+        assert b"process_cpu_seconds_total" in otel
+        assert b"python_gc_collections_total" in otel
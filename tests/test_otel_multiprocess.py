@@ -0,0 +1,294 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Simulates one gunicorn worker running the OTel backend. The worker's final
+# values are published when its meter provider shuts down at exit.
+WORKER_SCRIPT = """
+import os
+import sys
+from app.metrics import get_metrics_backend
+
+backend = get_metrics_backend()
+for i in range(int(sys.argv[1])):
+    backend.record_request("/index", "GET", 200, 0.01 * (i + 1))
+backend.record_request("/index", "GET", 404, 0.001)
+backend.set_tasks_running(1)
+backend.flush()  # as gunicorn's worker_exit hook does
+print(os.getpid(), flush=True)
+if len(sys.argv) > 2:
+    sys.stdin.read()  # stay alive until the test closes stdin
+"""
+
+# A worker that forks a child, as a fork-based process pool does, after
+# recording traffic. The child publishes what it has before exiting.
+FORKING_WORKER_SCRIPT = """
+import os
+from app.metrics import get_metrics_backend
+
+backend = get_metrics_backend()
+for i in range(int(os.environ["REQUESTS"])):
+    backend.record_request("/index", "GET", 200, 0.01)
+backend.flush()
+backend._provider.force_flush()
+child = os.fork()
+if child == 0:
+    backend._provider.force_flush()
+    os._exit(0)
+os.waitpid(child, 0)
+print(child, flush=True)
+"""
+
+
+def start_worker(shared_dir, requests, env=None, wait=False):
+    """Start a worker process; with ``wait`` it keeps running until its stdin is closed."""
+    env = dict(os.environ, METRICS_BACKEND="otel", OTEL_MULTIPROC_DIR=str(shared_dir), **(env or {}))
+    args = [sys.executable, "-c", WORKER_SCRIPT, str(requests)] + (["wait"] if wait else [])
+    return subprocess.Popen(args, cwd=ROOT_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+
+def run_worker(shared_dir, requests):
+    """Run a worker that never becomes the exporter to completion and return its pid."""
+    worker = start_worker(shared_dir, requests, {"OTEL_EXPORTER": "console", "OTEL_MULTIPROC_PUBLISH_INTERVAL": "60000"})
+    stdout, _ = worker.communicate()
+    assert worker.returncode == 0
+    return int(stdout.strip())
+
+
+def shared_points(shared_dir):
+    """Return {metric name: [data points]} of the merged shared directory."""
+    from opentelemetry.sdk.resources import Resource
+
+    from app.metrics.export import read_shared_metrics
+
+    data = read_shared_metrics(Resource.create({}), str(shared_dir))
+    return {
+        metric.name: metric.data.data_points
+        for resource in data.resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    }
+
+
+def total(points, name):
+    return sum(point.value for point in points[name])
+
+
+@pytest.fixture
+def shared_dir(tmp_path, monkeypatch):
+    """Enable cross-worker OTel aggregation with an empty directory."""
+    path = tmp_path / "otel"
+    path.mkdir()
+    monkeypatch.setenv("OTEL_MULTIPROC_DIR", str(path))
+    return path
+
+
+class TestConfiguration:
+    """Test enabling the shared directory and preparing it."""
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv("OTEL_MULTIPROC_DIR", raising=False)
+        from app.metrics.otel_multiprocess import get_publish_interval, is_otel_multiprocess_enabled
+
+        assert not is_otel_multiprocess_enabled()
+        assert get_publish_interval() == 1.0
+
+    def test_backend_publishes_instead_of_exporting(self, shared_dir, otel_env):
+        from app.metrics import get_metrics_backend
+        from app.metrics.export import SharedMetricReader
+
+        readers = get_metrics_backend()._provider._metric_readers
+        assert [type(reader) for reader in readers] == [SharedMetricReader]
+
+    def test_pull_mode_unaffected(self, shared_dir, monkeypatch):
+        monkeypatch.setenv("METRICS_BACKEND", "otel")
+        monkeypatch.setenv("OTEL_METRICS_EXPORTER", "prometheus")
+        from opentelemetry.exporter.prometheus import PrometheusMetricReader
+
+        from app.metrics import get_metrics_backend
+
+        readers = get_metrics_backend()._provider._metric_readers
+        assert [type(reader) for reader in readers] == [PrometheusMetricReader]
+
+    def test_prepare_removes_stale_files(self, shared_dir):
+        from app.metrics.otel_multiprocess import prepare_otel_multiproc_dir
+
+        (shared_dir / "otel_123.db").write_bytes(b"stale")
+        (shared_dir / "otel_archive.db").write_bytes(b"stale")
+        (shared_dir / "notes.txt").write_text("keep")
+
+        prepare_otel_multiproc_dir()
+
+        assert sorted(os.listdir(shared_dir)) == ["notes.txt"]
+
+
+class TestSharedAggregation:
+    """Test that values published by worker processes are merged per series."""
+
+    def test_counters_summed(self, shared_dir):
+        run_worker(shared_dir, 3)
+        run_worker(shared_dir, 4)
+
+        points = shared_points(shared_dir)
+        assert total(points, "http_requests") == 9
+        assert {point.attributes["status"]: point.value for point in points["http_requests"]} == {"2xx": 7, "4xx": 2}
+        assert total(points, "http_error_4xx") == 2
+
+    def test_histograms_merged(self, shared_dir):
+        run_worker(shared_dir, 3)
+        run_worker(shared_dir, 4)
+
+        (point,) = shared_points(shared_dir)["request_processing_seconds"]
+        assert point.count == 9
+        assert sum(point.bucket_counts) == 9
+        assert point.sum == pytest.approx(0.06 + 0.10 + 0.002)
+        assert (point.min, point.max) == (0.001, 0.04)
+        assert len(point.explicit_bounds) == len(point.bucket_counts) - 1 == 14
+
+    def test_forked_child_does_not_republish(self, shared_dir):
+        env = dict(os.environ, METRICS_BACKEND="otel", OTEL_EXPORTER="console", REQUESTS="10",
+                   OTEL_MULTIPROC_DIR=str(shared_dir), OTEL_MULTIPROC_PUBLISH_INTERVAL="60000")
+        result = subprocess.run([sys.executable, "-c", FORKING_WORKER_SCRIPT], cwd=ROOT_DIR, env=env,
+                                capture_output=True, text=True, check=True)
+        child = int(result.stdout.strip())
+
+        assert total(shared_points(shared_dir), "http_requests") == 10
+        assert not (shared_dir / f"otel_{child}.db").exists()
+
+    def test_gauges_summed_over_live_workers(self, shared_dir):
+        run_worker(shared_dir, 1)
+        run_worker(shared_dir, 1)
+
+        assert total(shared_points(shared_dir), "tasks_running") == 2
+
+    def test_start_time_is_earliest_worker(self, shared_dir):
+        run_worker(shared_dir, 1)
+        first = shared_points(shared_dir)["http_requests"][0].start_time_unix_nano
+        run_worker(shared_dir, 1)
+
+        assert shared_points(shared_dir)["http_requests"][0].start_time_unix_nano == first
+
+
+class TestDeadWorkerCleanup:
+    """Test folding dead workers' values into the archive."""
+
+    def test_totals_preserved_and_gauges_dropped(self, shared_dir):
+        from app.metrics.otel_multiprocess import mark_worker_dead
+
+        first = run_worker(shared_dir, 3)
+        second = run_worker(shared_dir, 4)
+        mark_worker_dead(first)
+        mark_worker_dead(second)
+
+        points = shared_points(shared_dir)
+        assert total(points, "http_requests") == 9
+        assert points["request_processing_seconds"][0].max == 0.04
+        assert "tasks_running" not in points
+        assert sorted(name for name in os.listdir(shared_dir) if name.endswith(".db")) == ["otel_archive.db"]
+
+    def test_live_worker_untouched(self, shared_dir):
+        from app.metrics.otel_multiprocess import mark_worker_dead
+
+        live = run_worker(shared_dir, 1)
+        dead = run_worker(shared_dir, 1)
+        mark_worker_dead(dead)
+
+        assert (shared_dir / f"otel_{live}.db").exists()
+        assert total(shared_points(shared_dir), "tasks_running") == 1
+
+
+class TestLeaderElection:
+    """Test that one worker at a time exports the merged values."""
+
+    @pytest.fixture
+    def reader(self, shared_dir):
+        """Return (meter, reader, exporter) of a worker publishing every 20 ms."""
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.resources import Resource
+
+        from app.metrics.export import AdaptiveMetricReader, SharedMetricReader
+        from tests.collector import RecordingMetricExporter
+
+        exporter = RecordingMetricExporter()
+        reader = SharedMetricReader(
+            Resource.create({}), lambda: AdaptiveMetricReader(exporter, interval=3600), interval=0.02
+        )
+        provider = MeterProvider(metric_readers=[reader])
+        yield provider.get_meter(__name__), reader, exporter
+        provider.shutdown()
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_takes_over_when_leader_exits(self, shared_dir):
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.resources import Resource
+
+        from app.metrics.export import AdaptiveMetricReader, SharedMetricReader
+        from app.metrics.otel_multiprocess import acquire_leader_lock
+        from tests.collector import RecordingMetricExporter
+
+        fd = acquire_leader_lock(str(shared_dir))
+        assert fd is not None
+        exporter = RecordingMetricExporter()
+        reader = SharedMetricReader(
+            Resource.create({}), lambda: AdaptiveMetricReader(exporter, interval=3600), interval=0.02
+        )
+        provider = MeterProvider(metric_readers=[reader])
+        try:
+            time.sleep(0.1)
+            assert not reader.leading
+            os.close(fd)  # the leader exits
+            assert self.wait_until(lambda: reader.leading)
+        finally:
+            provider.shutdown()
+
+    def test_leader_exports_every_worker(self, shared_dir, reader):
+        meter, reader, exporter = reader
+        run_worker(shared_dir, 4)
+        meter.create_counter("tasks_done").add(1)
+        assert self.wait_until(lambda: reader.leading)
+
+        reader.force_flush()
+        points = exporter.points()
+        assert sum(point.value for (name, _), point in points.items() if name == "http_requests") == 5
+        assert points[("tasks_done", ())].value == 1
+
+    def test_shutdown_exports_and_releases_lock(self, shared_dir, reader):
+        from app.metrics.otel_multiprocess import acquire_leader_lock
+
+        meter, reader, exporter = reader
+        assert self.wait_until(lambda: reader.leading)
+        meter.create_counter("http_requests").add(2)
+        reader.shutdown()
+
+        assert exporter.points()[("http_requests", ())].value == 2
+        fd = acquire_leader_lock(str(shared_dir))
+        assert fd is not None
+        os.close(fd)
+
+    def test_one_exporter_for_concurrent_workers(self, shared_dir, otlp_http_env):
+        collector = otlp_http_env
+        env = {"OTEL_MULTIPROC_PUBLISH_INTERVAL": "20", "OTEL_METRIC_EXPORT_INTERVAL": "50"}
+        workers = [start_worker(shared_dir, requests, env, wait=True) for requests in (2, 3, 4)]
+        try:
+            for worker in workers:
+                worker.stdout.readline()
+            expected = 2 + 3 + 4 + 3  # plus one 404 each
+            assert self.wait_until(lambda: any(
+                export.sums().get("http_requests") == expected for export in collector.signal("metrics")
+            ))
+            # Only the elected worker connected to the collector
+            assert collector.http.connections == 1
+        finally:
+            for worker in workers:
+                worker.communicate()
+        assert [worker.returncode for worker in workers] == [0, 0, 0]
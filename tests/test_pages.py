@@ -0,0 +1,132 @@
+import pytest
+
+from app.pages import PageCache, get_page_cache_size
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Count the templates actually rendered through app.pages."""
+    import app.pages
+
+    rendered = []
+    render_template = app.pages.render_template
+
+    def counting_render(template_name, **context):
+        rendered.append(template_name)
+        return render_template(template_name, **context)
+
+    monkeypatch.setattr(app.pages, "render_template", counting_render)
+    return rendered
+
+
+class TestPageCache:
+    """Test the LRU cache on its own."""
+
+    def test_hit_and_miss(self):
+        cache = PageCache(2)
+        assert cache.get("a") is None
+        cache.put("a", "page a")
+        assert cache.get("a") == "page a"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_least_recently_used_evicted(self):
+        cache = PageCache(2)
+        cache.put("a", "page a")
+        cache.put("b", "page b")
+        cache.get("a")
+        cache.put("c", "page c")
+        assert cache.get("b") is None
+        assert cache.get("a") == "page a"
+        assert len(cache) == 2
+
+    def test_size_zero_stores_nothing(self):
+        cache = PageCache(0)
+        cache.put("a", "page a")
+        assert len(cache) == 0
+
+    def test_size_from_environment(self, monkeypatch):
+        monkeypatch.delenv("PAGE_CACHE_SIZE", raising=False)
+        assert get_page_cache_size() == 128
+        monkeypatch.setenv("PAGE_CACHE_SIZE", "0")
+        assert get_page_cache_size() == 0
+
+
+class TestCachedViews:
+    """Test that static views and error pages are rendered once."""
+
+    def test_404_rendered_once(self, flask_app, renders):
+        client = flask_app.test_client()
+        first = client.get("/no-such-page", buffered=True)
+        second = client.get("/other-missing-page", buffered=True)
+
+        assert first.status_code == second.status_code == 404
+        assert first.data == second.data
+        assert b"404 - File Not Found" in first.data
+        assert renders == ["errors/404.html"]
+
+    def test_index_rendered_once(self, flask_app, renders):
+        client = flask_app.test_client()
+        for _ in range(3):
+            assert client.get("/index", buffered=True).status_code == 200
+        assert renders == ["index.html"]
+        assert flask_app.extensions["page_cache"].hits == 2
+
+    def test_application_root_in_key(self, flask_app, renders):
+        client = flask_app.test_client()
+        plain = client.get("/no-such-page", buffered=True)
+        prefixed = client.get("/no-such-page", environ_overrides={"SCRIPT_NAME": "/app"}, buffered=True)
+
+        assert b'href="/app/index"' in prefixed.data
+        assert b'href="/app/index"' not in plain.data
+        assert len(renders) == 2
+
+    def test_unhashable_context_not_cached(self, flask_app, renders):
+        from app.pages import render_page
+
+        with flask_app.test_request_context("/"):
+            render_page("index.html", title=["Home"])
+            render_page("index.html", title=["Home"])
+        assert renders == ["index.html", "index.html"]
+
+    def test_disabled(self, monkeypatch, renders):
+        monkeypatch.setenv("PAGE_CACHE_SIZE", "0")
+        monkeypatch.setenv("OTEL_EXPORTER", "none")
+        from app import create_app
+        from config import Config
+
+        class TestConfig(Config):
+            TESTING = True
+
+        client = create_app(TestConfig).test_client()
+        client.get("/no-such-page", buffered=True)
+        client.get("/no-such-page", buffered=True)
+        assert renders == ["errors/404.html", "errors/404.html"]
+
+
+class TestTemplateCompilation:
+    """Test that templates are compiled at startup rather than on first request."""
+
+    def test_templates_compiled_by_create_app(self, flask_app):
+        env = flask_app.jinja_env
+        cached = {name for _, name in env.cache.keys()}
+        assert cached == set(env.list_templates(extensions=["html"]))
+
+    def test_bytecode_written_to_cache_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("TEMPLATE_CACHE_DIR", str(tmp_path / "templates"))
+        from flask import Flask
+
+        from app.pages import init_pages
+
+        app = Flask("app")
+        init_pages(app)
+        assert len(list((tmp_path / "templates").iterdir())) == len(app.jinja_env.list_templates(extensions=["html"]))
+
+    def test_no_page_cache_while_templates_reload(self):
+        from flask import Flask
+
+        from app.pages import init_pages
+
+        app = Flask("app")
+        app.config["TEMPLATES_AUTO_RELOAD"] = True
+        init_pages(app)
+        assert app.extensions["page_cache"].max_size == 0
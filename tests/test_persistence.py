@@ -0,0 +1,346 @@
+import json
+import os
+import signal
+import struct
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.metrics.histogram import DEFAULT_BUCKETS
+from app.metrics.persistence import (
+    HistogramState,
+    MetricState,
+    MetricsPersister,
+    SnapshotFile,
+    decode_state,
+    encode_state,
+    start_snapshot_run,
+)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INDEX = (("method", "GET"), ("route", "/index"))
+
+# One run of the app: records traffic, prints its summary and exits, which
+# writes the final snapshot from the atexit hook.
+RUN_SCRIPT = """
+import json
+import sys
+from app.metrics import get_metrics_backend
+
+backend = get_metrics_backend()
+for i in range(int(sys.argv[1])):
+    backend.record_request("/index", "GET", 200, 0.02)
+backend.record_request("/index", "GET", 404, 0.2)
+summary = backend.get_metrics_summary()
+print(json.dumps({
+    "requests": summary["http_requests"]["value"],
+    "errors": summary["http_4xx_errors"]["value"],
+    "count": summary["histogram_buckets"][-2]["value"],
+    "sum": summary["histogram_buckets"][-1]["value"],
+}))
+"""
+
+# Writes ever larger snapshots until killed, printing each generation once it is written.
+WRITER_SCRIPT = """
+import sys
+from app.metrics.persistence import HistogramState, MetricState, SnapshotFile, encode_state
+
+snapshots = SnapshotFile(sys.argv[1])
+for size in range(1, 10**6):
+    counters = {(f"c{i}", (("route", f"/r/{i}"),)): float(size) for i in range(size * 50)}
+    generation = snapshots.write(encode_state(MetricState(counters, {}, 1.0)), b"r" * 16)
+    print(generation, size, flush=True)
+"""
+
+
+def run_app(path, requests, backend="prometheus", env=None):
+    """Run the app once against the snapshot at ``path`` and return its summary."""
+    env = dict(
+        os.environ, METRICS_BACKEND=backend, OTEL_EXPORTER="none", METRICS_SNAPSHOT_PATH=str(path), **(env or {})
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", RUN_SCRIPT, str(requests)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def sample_state(series=3):
+    counters = {("http_requests", INDEX + (("status", "2xx"),)): 5.0, ("http_successful_request", INDEX): 5.0}
+    counters.update({("http_requests", (("method", "GET"), ("route", f"/r/{i}"), ("status", "5xx"))): 1.0
+                     for i in range(series)})
+    histograms = {
+        ("request_processing_seconds", INDEX): HistogramState(
+            DEFAULT_BUCKETS, (0, 5) + (0,) * 12 + (1,), 12.5
+        ),
+    }
+    return MetricState(counters, histograms, 1_700_000_000.0)
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    """Enable persistence with a snapshot file in a fresh directory."""
+    path = tmp_path / "snapshots" / "metrics.snap"
+    path.parent.mkdir()
+    monkeypatch.setenv("METRICS_SNAPSHOT_PATH", str(path))
+    return path
+
+
+class TestEncoding:
+    """Test the binary state format."""
+
+    def test_round_trip(self):
+        state = sample_state()
+        assert decode_state(encode_state(state)) == state
+
+    def test_labels_and_bounds_stored_once(self):
+        many = sample_state(series=1000)
+        few = sample_state(series=1)
+        per_series = (len(encode_state(many)) - len(encode_state(few))) / 999
+        assert per_series < 16
+
+    def test_unsupported_version_ignored(self, tmp_path):
+        path = tmp_path / "metrics.snap"
+        snapshots = SnapshotFile(str(path))
+        snapshots.write(encode_state(sample_state()), b"r" * 16)
+        snapshots.close()
+        with open(path, "r+b") as f:
+            f.seek(4)
+            f.write(struct.pack("<H", 99))
+
+        assert SnapshotFile(str(path)).read() is None
+
+
+class TestCrashConsistency:
+    """Test that a snapshot interrupted at any point leaves the previous one readable."""
+
+    def write(self, path, *payloads):
+        snapshots = SnapshotFile(str(path))
+        for payload in payloads:
+            snapshots.write(payload, b"r" * 16)
+        return snapshots
+
+    def test_newest_snapshot_read(self, tmp_path):
+        snapshots = self.write(tmp_path / "metrics.snap", b"first", b"second", b"third")
+        latest = snapshots.read()
+        assert (latest.generation, latest.payload) == (3, b"third")
+
+    def test_torn_write_falls_back_to_previous(self, tmp_path):
+        path = tmp_path / "metrics.snap"
+        self.write(path, b"first", b"second" * 100).close()
+        # Generation 2 lives in slot 0; damage the end of its payload as a crash mid-write would
+        data = bytearray(path.read_bytes())
+        data[12 + 40 + 500] ^= 0xFF
+        path.write_bytes(bytes(data))
+
+        latest = SnapshotFile(str(path)).read()
+        assert (latest.generation, latest.payload) == (1, b"first")
+
+    def test_truncated_file_ignored(self, tmp_path):
+        path = tmp_path / "metrics.snap"
+        self.write(path, b"first").close()
+        path.write_bytes(path.read_bytes()[:1000])
+
+        assert SnapshotFile(str(path)).read() is None
+
+    def test_growing_keeps_previous_snapshot(self, tmp_path):
+        path = tmp_path / "metrics.snap"
+        large = os.urandom(200_000)
+        snapshots = self.write(path, b"first", large)
+        assert snapshots.read().payload == large
+        assert snapshots._read_slot(1).payload == b"first"
+
+    def test_killed_writer_leaves_valid_snapshot(self, tmp_path):
+        path = tmp_path / "metrics.snap"
+        writer = subprocess.Popen(
+            [sys.executable, "-c", WRITER_SCRIPT, str(path)], cwd=ROOT_DIR, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            for _ in range(30):
+                generation, size = map(int, writer.stdout.readline().split())
+        finally:
+            writer.send_signal(signal.SIGKILL)
+            writer.wait()
+            writer.stdout.close()
+
+        latest = SnapshotFile(str(path)).read()
+        assert latest.generation >= generation
+        state = decode_state(latest.payload)
+        assert len(state.counters) >= size * 50
+
+
+class TestRestore:
+    """Test restoring totals into either backend across restarts."""
+
+    @pytest.mark.parametrize("backend", ["prometheus", "otel"])
+    def test_totals_continue_after_restart(self, tmp_path, backend):
+        path = tmp_path / "metrics.snap"
+        run_app(path, 3, backend)
+        summary = run_app(path, 2, backend)
+
+        assert summary["requests"] == 3 + 1 + 2 + 1
+        assert summary["errors"] == 2
+        assert summary["count"] == 7
+        assert summary["sum"] == pytest.approx(5 * 0.02 + 2 * 0.2)
+
+    def test_restores_across_backends(self, tmp_path):
+        path = tmp_path / "metrics.snap"
+        run_app(path, 3, "prometheus")
+        summary = run_app(path, 2, "otel")
+
+        assert (summary["requests"], summary["count"]) == (7, 7)
+
+    def test_multiprocess_totals_restored(self, tmp_path):
+        path = tmp_path / "metrics.snap"
+        env = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path / "prometheus")}
+        run_app(path, 3, env=env)
+        # A new gunicorn run starts with an empty multiprocess directory
+        for name in os.listdir(tmp_path / "prometheus"):
+            os.remove(tmp_path / "prometheus" / name)
+
+        assert run_app(path, 2, env=env)["requests"] == 7
+
+    def test_prometheus_backend(self, prometheus_env):
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        backend.record_request("/index", "GET", 200, 0.02)
+        backend.restore_state(sample_state())
+
+        summary = backend.get_metrics_summary()
+        assert summary["http_requests"]["value"] == 6 + 3
+        assert summary["histogram_buckets"][-2]["value"] == 7
+        assert backend.export_state().start_time == 1_700_000_000.0
+
+    def test_changed_buckets_skipped(self, prometheus_env):
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        state = sample_state()
+        key = ("request_processing_seconds", INDEX)
+        state.histograms[key] = state.histograms[key]._replace(bounds=(1.0,), counts=(1, 1))
+        backend.restore_state(state)
+
+        assert backend.get_metrics_summary()["histogram_buckets"][-2]["value"] == 0
+
+    def test_otel_exports_restored_totals(self, snapshot_path, monkeypatch):
+        monkeypatch.setenv("METRICS_BACKEND", "otel")
+        monkeypatch.setenv("OTEL_EXPORTER", "none")
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        backend.record_request("/index", "GET", 200, 0.02)
+        backend.restore_state(sample_state())
+
+        state = backend.export_state()
+        assert state.counters[("http_requests", INDEX + (("status", "2xx"),))] == 6
+        # Series without traffic since the restart are exported too
+        assert len(state.counters) == 2 + 3
+        histogram = state.histograms[("request_processing_seconds", INDEX)]
+        assert (sum(histogram.counts), histogram.sum) == (7, pytest.approx(12.52))
+        assert state.start_time == 1_700_000_000.0
+        assert backend.get_metrics_summary()["http_requests"]["value"] == 9
+
+    def test_delta_points_left_alone(self):
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.resources import Resource
+
+        from app.metrics.export import AdaptiveMetricReader, RestoredMetrics, preferred_temporality
+        from tests.collector import RecordingMetricExporter
+
+        exporter = RecordingMetricExporter(preferred_temporality("delta"))
+        reader = AdaptiveMetricReader(exporter, interval=3600)
+        provider = MeterProvider(metric_readers=[reader])
+        try:
+            provider.get_meter("app").create_counter("http_requests").add(1, dict(INDEX + (("status", "2xx"),)))
+            restored = RestoredMetrics(sample_state(), {"http_requests": ("counter", "", "1")}, Resource({}), "app")
+            restored.attach(reader)
+            reader.collect()
+        finally:
+            provider.shutdown()
+
+        assert len(exporter.exports) == 1
+        assert exporter.points()[("http_requests", INDEX + (("status", "2xx"),))].value == 1
+
+
+class TestOwnership:
+    """Test that one process per run restores and writes the snapshot."""
+
+    @pytest.fixture
+    def backend(self, prometheus_env):
+        from app.metrics import get_metrics_backend
+
+        return get_metrics_backend()
+
+    def persister(self, backend, path):
+        return MetricsPersister(backend, str(path), interval=3600)
+
+    def test_restores_once_per_run(self, backend, tmp_path):
+        path = tmp_path / "metrics.snap"
+        start_snapshot_run(str(path))
+        first = self.persister(backend, path)
+        first.stop()
+        start_snapshot_run(str(path))
+
+        second = self.persister(backend, path)
+        second.stop()
+        # A worker taking over in the same run does not restore again
+        third = self.persister(backend, path)
+        third.stop()
+
+        assert first.restored is None
+        assert second.restored is not None
+        assert third.restored is None
+
+    def test_one_owner_at_a_time(self, backend, tmp_path):
+        path = tmp_path / "metrics.snap"
+        owner = self.persister(backend, path)
+        other = self.persister(backend, path)
+        try:
+            assert owner.owner and not other.owner
+            other.save()
+            assert SnapshotFile(str(path)).read().generation == owner.generation == 1
+        finally:
+            other.stop()
+            owner.stop()
+
+    def test_disabled_by_default(self, backend):
+        import app.metrics.persistence
+
+        assert app.metrics.persistence._persister_instance is None
+
+
+class TestRestoreTime:
+    """Test restore time with many series."""
+
+    @pytest.mark.parametrize("backend_name", ["prometheus", "otel"])
+    def test_large_snapshot_restores_quickly(self, snapshot_path, monkeypatch, backend_name):
+        monkeypatch.setenv("METRICS_BACKEND", backend_name)
+        monkeypatch.setenv("OTEL_EXPORTER", "none")
+        counters = {
+            ("http_requests", (("method", "GET"), ("route", f"/r/{i}"), ("status", "2xx"))): float(i)
+            for i in range(10_000)
+        }
+        histograms = {
+            ("request_processing_seconds", (("method", "GET"), ("route", f"/r/{i}"))): HistogramState(
+                DEFAULT_BUCKETS, (1,) * 15, 30.0
+            )
+            for i in range(2_000)
+        }
+        snapshots = SnapshotFile(str(snapshot_path))
+        snapshots.write(encode_state(MetricState(counters, histograms, 1.0)), b"previous run" + b"\0" * 4)
+        snapshots.close()
+        import app.metrics.persistence
+        from app.metrics import get_metrics_backend
+
+        start = time.perf_counter()
+        backend = get_metrics_backend()
+        elapsed = time.perf_counter() - start
+
+        persister = app.metrics.persistence._persister_instance
+        assert len(persister.restored.counters) == 10_000
+        assert backend.get_metrics_summary()["http_requests"]["value"] == sum(range(10_000))
+        assert persister.restore_seconds < elapsed < 5.0
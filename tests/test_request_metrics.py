@@ -0,0 +1,177 @@
+import pytest
+from flask import Flask
+from werkzeug.test import Client
+
+from app.metrics.base import MetricsBackend
+from app.metrics.middleware import RequestMetricsMiddleware, exempt, init_request_metrics
+from tests.conftest import FakeClock
+
+
+@pytest.fixture
+def backend(mocker):
+    return mocker.Mock(spec=MetricsBackend)
+
+
+@pytest.fixture
+def app(backend):
+    """Minimal Flask app with request metrics installed."""
+    app = Flask(__name__)
+
+    @app.route("/ok")
+    def ok():
+        return "ok"
+
+    @app.route("/users/<int:user_id>")
+    def user(user_id):
+        return str(user_id)
+
+    @app.route("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    @app.route("/health")
+    @exempt
+    def health():
+        return "ok"
+
+    init_request_metrics(app, backend)
+    return app
+
+
+class TestRequestMetricsMiddleware:
+    """Test the WSGI accounting layer on its own."""
+
+    def test_records_status_and_duration(self, backend):
+        clock = FakeClock()
+
+        def wsgi_app(environ, start_response):
+            start_response("201 Created", [])
+            clock.now += 0.25
+            return [b"created"]
+
+        client = Client(RequestMetricsMiddleware(wsgi_app, backend, clock=clock))
+        client.post("/", buffered=True)
+        backend.record_request.assert_called_once_with("unmatched", "POST", 201, 0.25, trace_context=None)
+
+    def test_duration_covers_streamed_body(self, backend):
+        clock = FakeClock()
+
+        def wsgi_app(environ, start_response):
+            start_response("200 OK", [])
+
+            def body():
+                clock.now += 1
+                yield b"a"
+                clock.now += 1
+                yield b"b"
+            return body()
+
+        client = Client(RequestMetricsMiddleware(wsgi_app, backend, clock=clock))
+        client.get("/", buffered=True)
+        assert backend.record_request.call_args.args[3] == 2
+
+    def test_recorded_once_when_iterated_and_closed(self, backend):
+        def wsgi_app(environ, start_response):
+            start_response("200 OK", [])
+            return [b"ok"]
+
+        middleware = RequestMetricsMiddleware(wsgi_app, backend)
+        body = middleware({"REQUEST_METHOD": "GET"}, lambda *args: None)
+        list(body)
+        body.close()
+        backend.record_request.assert_called_once()
+
+    def test_escaping_exception_recorded_as_500(self, backend):
+        def wsgi_app(environ, start_response):
+            raise RuntimeError("boom")
+
+        middleware = RequestMetricsMiddleware(wsgi_app, backend)
+        with pytest.raises(RuntimeError):
+            middleware({"REQUEST_METHOD": "GET"}, lambda *args: None)
+        assert backend.record_request.call_args.args[2] == 500
+
+
+class TestInitRequestMetrics:
+    """Test request accounting installed on a Flask app."""
+
+    def test_route_template_label(self, app, backend):
+        app.test_client().get("/users/42", buffered=True)
+        backend.record_request.assert_called_once()
+        route, method, status, _ = backend.record_request.call_args.args
+        assert (route, method, status) == ("/users/<int:user_id>", "GET", 200)
+
+    def test_not_found_is_unmatched(self, app, backend):
+        app.test_client().get("/missing", buffered=True)
+        route, _, status, _ = backend.record_request.call_args.args
+        assert (route, status) == ("unmatched", 404)
+
+    def test_unhandled_error_counted_as_500(self, app, backend):
+        app.test_client().get("/boom", buffered=True)
+        route, _, status, _ = backend.record_request.call_args.args
+        assert (route, status) == ("/boom", 500)
+
+    def test_exempt_route_not_recorded(self, app, backend):
+        app.test_client().get("/health", buffered=True)
+        backend.record_request.assert_not_called()
+
+    def test_each_response_recorded_once(self, app, backend):
+        client = app.test_client()
+        for _ in range(3):
+            client.get("/ok", buffered=True)
+        assert backend.record_request.call_count == 3
+
+
+class TestRecordRequest:
+    """Test MetricsBackend.record_request against the real backends."""
+
+    @pytest.mark.parametrize("status_code,counter", [
+        (200, "http_successful_request"),
+        (302, "http_successful_request"),
+        (404, "http_4xx_errors"),
+        (503, "http_5xx_errors"),
+    ])
+    def test_status_counter(self, prometheus_env, status_code, counter):
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        backend.record_request("/index", "GET", status_code, 0.1)
+        summary = backend.get_metrics_summary()
+        assert summary[counter]["value"] == 1
+        assert summary["http_requests"]["value"] == 1
+
+    def test_duration_observed(self, otel_env):
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        backend.record_request("/index", "GET", 200, 0.1)
+        count = next(
+            b for b in backend.get_metrics_summary()["histogram_buckets"]
+            if b["name"] == "request_processing_seconds_count"
+        )
+        assert count["value"] == 1
+
+
+class TestAppRequestMetrics:
+    """Test that create_app counts every response."""
+
+    @pytest.fixture
+    def client(self, prometheus_env, flask_app):
+        return flask_app.test_client()
+
+    def _requests(self):
+        from app.metrics import get_metrics_backend
+
+        by_route = get_metrics_backend().get_metrics_summary()["requests_by_route"]
+        return {(r["route"], r["status"]): r["value"] for r in by_route}
+
+    def test_view_metrics_not_counted(self, client):
+        client.get("/view_metrics", buffered=True)
+        assert self._requests() == {}
+
+    def test_static_files_counted(self, client):
+        client.get("/static/favicon.ico", buffered=True)
+        assert self._requests()[("/static/<path:filename>", "2xx")] == 1
+
+    def test_metrics_scrape_not_counted(self, client):
+        client.get("/metrics", buffered=True)
+        assert self._requests() == {}
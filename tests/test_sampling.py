@@ -0,0 +1,356 @@
+import random
+import threading
+import time
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import Decision, ParentBased
+from opentelemetry.trace import NonRecordingSpan, SpanContext, Status, StatusCode, TraceFlags
+
+from app.sampling import ReportingSampler, TailSamplingSpanProcessor, TokenBucketSampler, create_sampler
+from tests.conftest import FakeClock
+
+
+def sample(sampler, parent_context=None, trace_id=1):
+    return sampler.should_sample(parent_context, trace_id, "GET /index").decision
+
+
+def sampled_parent():
+    span_context = SpanContext(trace_id=1, span_id=2, is_remote=True, trace_flags=TraceFlags(TraceFlags.SAMPLED))
+    return trace.set_span_in_context(NonRecordingSpan(span_context))
+
+
+class TestTokenBucketSampler:
+    """Test the rate-limited root sampler."""
+
+    def test_burst_then_drop(self):
+        sampler = TokenBucketSampler(rate=5, clock=FakeClock())
+        decisions = [sample(sampler) for _ in range(8)]
+        assert decisions.count(Decision.RECORD_AND_SAMPLE) == 5
+        assert decisions[-1] == Decision.DROP
+
+    def test_refills_at_rate(self):
+        clock = FakeClock()
+        sampler = TokenBucketSampler(rate=5, clock=clock)
+        for _ in range(5):
+            sample(sampler)
+        clock.now += 0.2
+        assert sample(sampler) == Decision.RECORD_AND_SAMPLE
+        assert sample(sampler) == Decision.DROP
+
+    def test_idle_time_allows_one_burst(self):
+        clock = FakeClock()
+        sampler = TokenBucketSampler(rate=5, burst=2, clock=clock)
+        clock.now += 3600
+        decisions = [sample(sampler) for _ in range(5)]
+        assert decisions.count(Decision.RECORD_AND_SAMPLE) == 2
+
+    def test_rate_held_over_time(self):
+        clock = FakeClock()
+        sampler = TokenBucketSampler(rate=10, clock=clock)
+        kept = 0
+        for _ in range(10000):  # 1000 requests/s for 10 s
+            clock.now += 0.001
+            kept += sample(sampler) == Decision.RECORD_AND_SAMPLE
+        assert kept == pytest.approx(10 * 10 + 10, abs=2)
+
+    def test_concurrent_callers_share_the_budget(self):
+        sampler = TokenBucketSampler(rate=50, clock=FakeClock())
+        kept = []
+
+        def work():
+            kept.append(sum(sample(sampler) == Decision.RECORD_AND_SAMPLE for _ in range(100)))
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sum(kept) == 50
+
+    def test_zero_rate_drops_after_burst(self):
+        sampler = TokenBucketSampler(rate=0, clock=FakeClock())
+        assert [sample(sampler) for _ in range(3)].count(Decision.RECORD_AND_SAMPLE) == 1
+
+
+class TestCreateSampler:
+    """Test sampler selection from the environment."""
+
+    def test_always_on_by_default(self, monkeypatch):
+        monkeypatch.delenv("OTEL_SAMPLER", raising=False)
+        sampler = create_sampler()
+        assert isinstance(sampler, ParentBased)
+        assert all(sample(sampler, trace_id=i) == Decision.RECORD_AND_SAMPLE for i in range(100))
+
+    def test_ratio(self, monkeypatch):
+        monkeypatch.setenv("OTEL_SAMPLER", "ratio")
+        monkeypatch.setenv("OTEL_SAMPLER_RATIO", "0.25")
+        sampler = create_sampler()
+        kept = sum(sample(sampler, trace_id=(i * 0x9E3779B97F4A7C15) % 2**64) == Decision.RECORD_AND_SAMPLE
+                   for i in range(4000))
+        assert kept == pytest.approx(1000, rel=0.1)
+
+    def test_rate_limit(self, monkeypatch):
+        monkeypatch.setenv("OTEL_SAMPLER", "rate_limit")
+        monkeypatch.setenv("OTEL_SAMPLER_RATE", "3")
+        sampler = create_sampler()
+        assert "TokenBucketSampler" in sampler.get_description()
+        assert [sample(sampler) for _ in range(10)].count(Decision.RECORD_AND_SAMPLE) == 3
+
+    @pytest.mark.parametrize("sampler_type", ["ratio", "rate_limit"])
+    def test_sampled_parent_is_followed(self, monkeypatch, sampler_type):
+        monkeypatch.setenv("OTEL_SAMPLER", sampler_type)
+        monkeypatch.setenv("OTEL_SAMPLER_RATIO", "0")
+        monkeypatch.setenv("OTEL_SAMPLER_RATE", "0")
+        sampler = create_sampler()
+        sample(sampler)  # spend the burst of the rate limiter
+        assert sample(sampler) == Decision.DROP
+        assert sample(sampler, sampled_parent()) == Decision.RECORD_AND_SAMPLE
+
+
+class TestReportingSampler:
+    """Test the sampled-rate metric."""
+
+    @pytest.mark.parametrize("backend_type", ["prometheus", "otel"])
+    def test_decisions_counted(self, monkeypatch, backend_type):
+        monkeypatch.setenv("METRICS_BACKEND", backend_type)
+        monkeypatch.setenv("OTEL_EXPORTER", "console")
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        sampler = ReportingSampler(ParentBased(TokenBucketSampler(rate=2, clock=FakeClock())), backend)
+        for _ in range(5):
+            sample(sampler)
+
+        sampling = backend.get_metrics_summary()["trace_sampling"]
+        assert sampling["name"] == "trace_sampling_decisions"
+        assert (sampling["sampled"], sampling["dropped"]) == (2, 3)
+        assert sampling["ratio"] == pytest.approx(0.4)
+
+    def test_no_decisions(self, prometheus_env):
+        from app.metrics import get_metrics_backend
+
+        assert get_metrics_backend().get_metrics_summary()["trace_sampling"]["ratio"] is None
+
+    def test_exported_on_metrics_endpoint(self, prometheus_env, monkeypatch, flask_app):
+        client = flask_app.test_client()
+        client.get("/index")
+        body = client.get("/metrics").data
+        assert b'trace_sampling_decisions_total{decision="sampled"} 1.0' in body
+
+
+class TestAppSampling:
+    """Test sampling of Flask requests."""
+
+    @pytest.fixture
+    def client(self, prometheus_env, monkeypatch):
+        monkeypatch.setenv("OTEL_SAMPLER", "rate_limit")
+        monkeypatch.setenv("OTEL_SAMPLER_RATE", "2")
+        monkeypatch.setenv("METRICS_CACHE_TTL", "0")
+        from app import create_app
+        from config import Config
+
+        class TestConfig(Config):
+            TESTING = True
+
+        app = create_app(TestConfig)
+        yield app.test_client()
+        app.extensions["tracer_provider"].shutdown()
+
+    def test_requests_beyond_rate_not_traced(self, client):
+        for _ in range(10):
+            client.get("/index")
+        sampling = client.get("/api/metrics").get_json()["series"]
+        assert sampling['trace_sampling_decisions{decision="sampled"}'] == 2
+        assert sampling['trace_sampling_decisions{decision="dropped"}'] == 8
+
+    def test_metrics_polling_not_traced(self, client):
+        for _ in range(3):
+            client.get("/api/metrics")
+        series = client.get("/api/metrics").get_json()["series"]
+        assert series['trace_sampling_decisions{decision="sampled"}'] == 0
+        assert series['trace_sampling_decisions{decision="dropped"}'] == 0
+
+
+@pytest.fixture
+def tail():
+    """Return (tracer, processor, exporter) for a tail-sampled provider that keeps no fast traces."""
+    exporter = InMemorySpanExporter()
+    processor = TailSamplingSpanProcessor(BatchSpanProcessor(exporter), latency=1.0, ratio=0.0, max_spans=100)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    yield provider.get_tracer(__name__), processor, exporter
+    provider.shutdown()
+
+
+def exported(processor, exporter):
+    processor.force_flush()
+    return [span.name for span in exporter.get_finished_spans()]
+
+
+def request_trace(tracer, duration=0.01, error=False, children=1):
+    """Record a root span with children, lasting ``duration`` seconds."""
+    start = time.time_ns()
+    with tracer.start_as_current_span("GET /index", start_time=start, end_on_exit=False) as root:
+        for _ in range(children):
+            with tracer.start_as_current_span("child") as child:
+                if error:
+                    child.set_status(Status(StatusCode.ERROR))
+        root.end(end_time=start + int(duration * 1e9))
+
+
+class TestTailSamplingSpanProcessor:
+    """Test keeping failed, slow and a fraction of other traces."""
+
+    def test_fast_trace_dropped(self, tail):
+        tracer, processor, exporter = tail
+        request_trace(tracer)
+        assert exported(processor, exporter) == []
+        assert (processor.kept, processor.dropped) == (0, 1)
+        assert processor.buffered_spans == 0
+
+    def test_failed_trace_kept_whole(self, tail):
+        tracer, processor, exporter = tail
+        request_trace(tracer, error=True, children=2)
+        assert exported(processor, exporter) == ["child", "child", "GET /index"]
+
+    def test_slow_trace_kept(self, tail):
+        tracer, processor, exporter = tail
+        request_trace(tracer, duration=5.0)
+        request_trace(tracer, duration=0.5)
+        assert exported(processor, exporter) == ["child", "GET /index"]
+        assert (processor.kept, processor.dropped) == (1, 1)
+
+    def test_ratio_of_other_traces_kept(self):
+        exporter = InMemorySpanExporter()
+        processor = TailSamplingSpanProcessor(SimpleSpanProcessor(exporter), ratio=0.25)
+        provider = TracerProvider()
+        provider.add_span_processor(processor)
+        tracer = provider.get_tracer(__name__)
+        for _ in range(4000):
+            with tracer.start_as_current_span("GET /index"):
+                pass
+        assert len(exporter.get_finished_spans()) == pytest.approx(1000, rel=0.1)
+
+    def test_span_with_remote_parent_is_local_root(self, tail):
+        tracer, processor, exporter = tail
+        with tracer.start_as_current_span("GET /index", context=sampled_parent()) as span:
+            span.set_status(Status(StatusCode.ERROR))
+        assert exported(processor, exporter) == ["GET /index"]
+
+    def test_late_span_follows_decision(self, tail):
+        tracer, processor, exporter = tail
+        root = tracer.start_span("GET /do_task")
+        late = tracer.start_span("task", context=trace.set_span_in_context(root))
+        root.set_status(Status(StatusCode.ERROR))
+        root.end()
+        late.end()
+        assert exported(processor, exporter) == ["GET /do_task", "task"]
+        assert processor.buffered_spans == 0
+
+    def test_buffer_bounded(self, tail):
+        tracer, processor, exporter = tail
+        roots = [tracer.start_span("GET /do_task") for _ in range(50)]
+        peak = 0
+        for i in range(5000):
+            root = roots[i % len(roots)]
+            child = tracer.start_span("child", context=trace.set_span_in_context(root))
+            if i == 4990:
+                child.set_status(Status(StatusCode.ERROR))
+            child.end()
+            peak = max(peak, processor.buffered_spans)
+
+        assert peak == 100
+        assert processor.evicted > 0
+        # The trace with the failed span is kept when it is evicted or its root ends
+        for root in roots:
+            root.end()
+        names = exported(processor, exporter)
+        assert names.count("GET /do_task") == 1
+        assert processor.buffered_spans == 0
+
+    def test_shutdown_decides_open_traces(self):
+        exporter = InMemorySpanExporter()
+        processor = TailSamplingSpanProcessor(SimpleSpanProcessor(exporter), ratio=0.0)
+        provider = TracerProvider()
+        provider.add_span_processor(processor)
+        tracer = provider.get_tracer(__name__)
+        root = tracer.start_span("GET /do_task")
+        child = tracer.start_span("child", context=trace.set_span_in_context(root))
+        child.set_status(Status(StatusCode.ERROR))
+        child.end()
+
+        provider.shutdown()
+        assert [span.name for span in exporter.get_finished_spans()] == ["child"]
+
+    def test_concurrent_traces(self, tail):
+        tracer, processor, exporter = tail
+
+        def work():
+            for i in range(200):
+                request_trace(tracer, error=i % 10 == 0)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert (processor.kept, processor.dropped) == (80, 720)
+        assert len(exported(processor, exporter)) == 160
+        assert processor.buffered_spans == 0
+
+    def test_throughput(self):
+        """Filtering adds little per span and cuts what the batch processor has to export."""
+        recorder = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(recorder))
+        tracer = provider.get_tracer(__name__)
+        rng = random.Random(7)
+        for _ in range(10000):
+            request_trace(tracer, error=rng.random() < 0.01)
+        spans = recorder.get_finished_spans()
+
+        exporter = InMemorySpanExporter()
+        processor = TailSamplingSpanProcessor(
+            BatchSpanProcessor(exporter, max_queue_size=len(spans)), ratio=0.05,
+        )
+        start = time.perf_counter()
+        for span in spans:
+            processor.on_end(span)
+        elapsed = time.perf_counter() - start
+        processor.shutdown()
+
+        assert elapsed / len(spans) < 50e-6
+        assert processor.kept + processor.dropped == 10000
+        assert len(exporter.get_finished_spans()) == 2 * processor.kept
+        assert processor.kept == pytest.approx(10000 * (0.05 + 0.01), rel=0.2)
+
+
+class TestAppTailSampling:
+    """Test tail sampling of Flask requests."""
+
+    def test_only_failed_requests_exported(self, prometheus_env, monkeypatch):
+        exporter = InMemorySpanExporter()
+        monkeypatch.setenv("OTEL_TAIL_SAMPLING", "true")
+        monkeypatch.setenv("OTEL_TAIL_SAMPLING_RATIO", "0")
+        monkeypatch.setattr("app.tracing._create_span_exporter", lambda: exporter)
+        from app import create_app
+        from config import Config
+
+        class TestConfig(Config):
+            TESTING = True
+
+        app = create_app(TestConfig)
+        app.add_url_rule("/unavailable", "unavailable", lambda: ("", 503))
+        client = app.test_client()
+        for _ in range(20):
+            client.get("/index")
+        client.get("/unavailable")
+
+        provider = app.extensions["tracer_provider"]
+        provider.force_flush()
+        assert [span.name for span in exporter.get_finished_spans()] == ["GET /unavailable"]
+        provider.shutdown()
@@ -0,0 +1,106 @@
+import gc
+import threading
+
+import pytest
+
+from app.metrics.sharded import ShardedCounters
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestShardedCounters:
+    """Test single-threaded counter behaviour."""
+
+    def test_unknown_key_is_zero(self):
+        counters = ShardedCounters()
+        assert counters.get("missing") == 0
+        assert counters.values() == {}
+
+    def test_inc_defaults_to_one(self):
+        counters = ShardedCounters()
+        counters.inc("requests")
+        counters.inc("requests")
+        assert counters.get("requests") == 2
+
+    def test_inc_by_amount(self):
+        counters = ShardedCounters()
+        counters.inc("requests", 5)
+        assert counters.get("requests") == 5
+
+    def test_keys_are_independent(self):
+        counters = ShardedCounters()
+        counters.inc("a")
+        counters.inc("b", 2)
+        assert counters.values() == {"a": 1, "b": 2}
+
+
+class TestShardedCountersConcurrency:
+    """Stress tests proving that no increments are lost."""
+
+    def test_concurrent_increments_not_lost(self):
+        counters = ShardedCounters()
+        threads, increments = 16, 20_000
+
+        def work():
+            for _ in range(increments):
+                counters.inc("requests")
+                counters.inc("errors", 2)
+
+        run_threads(threads, work)
+
+        assert counters.get("requests") == threads * increments
+        assert counters.get("errors") == 2 * threads * increments
+
+    def test_reads_during_writes_are_monotonic(self):
+        counters = ShardedCounters()
+        done = threading.Event()
+        observed = []
+
+        def read():
+            while not done.is_set():
+                observed.append(counters.get("requests"))
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        run_threads(8, lambda: [counters.inc("requests") for _ in range(10_000)])
+        done.set()
+        reader.join()
+
+        assert observed == sorted(observed)
+        assert counters.get("requests") == 80_000
+
+    def test_finished_threads_are_retired(self):
+        counters = ShardedCounters()
+
+        # Short-lived threads, like one greenlet per request under gevent
+        for _ in range(50):
+            run_threads(4, lambda: counters.inc("requests", 10))
+        gc.collect()
+
+        assert counters.get("requests") == 2000
+        assert len(counters._shards._live) <= 1
+
+    def test_greenlet_increments_not_lost(self):
+        gevent = pytest.importorskip("gevent")
+        from gevent.local import local
+
+        counters = ShardedCounters()
+        counters._shards._local = local()
+
+        def work():
+            for i in range(1000):
+                counters.inc("requests")
+                if i % 100 == 0:
+                    gevent.sleep(0)
+
+        gevent.joinall([gevent.spawn(work) for _ in range(100)])
+        gc.collect()
+
+        assert counters.get("requests") == 100_000
+        assert len(counters._shards._live) <= 1
@@ -0,0 +1,135 @@
+import random
+
+import pytest
+
+from app.metrics.sketch import DDSketch, quantile_summary
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.fixture
+def latencies():
+    rng = random.Random(42)
+    return [rng.lognormvariate(-3, 1) for _ in range(20000)]
+
+
+class TestDDSketchQuantiles:
+    """Test quantile estimates of the sketch."""
+
+    def test_empty_sketch(self):
+        sketch = DDSketch()
+        assert sketch.count == 0
+        assert sketch.quantile(0.5) is None
+
+    @pytest.mark.parametrize("q", [0.5, 0.9, 0.99])
+    def test_relative_accuracy(self, latencies, q):
+        sketch = DDSketch(relative_accuracy=0.01)
+        sketch.add_many(latencies)
+        expected = exact_quantile(latencies, q)
+        assert sketch.quantile(q) == pytest.approx(expected, rel=0.01)
+
+    def test_count_and_sum(self):
+        sketch = DDSketch()
+        sketch.add(0.2)
+        sketch.add(0.3)
+        assert sketch.count == 2
+        assert sketch.sum == pytest.approx(0.5)
+
+    def test_zero_values(self):
+        sketch = DDSketch()
+        for value in (0.0, 0.0, 1.0):
+            sketch.add(value)
+        assert sketch.quantile(0.0) == 0.0
+        assert sketch.quantile(1.0) == pytest.approx(1.0, rel=0.01)
+
+    def test_invalid_quantile_rejected(self):
+        with pytest.raises(ValueError):
+            DDSketch().quantile(1.5)
+
+    def test_invalid_accuracy_rejected(self):
+        with pytest.raises(ValueError):
+            DDSketch(relative_accuracy=0)
+
+
+class TestDDSketchMemory:
+    """Test that memory stays bounded."""
+
+    def test_bins_bounded_by_value_range(self, latencies):
+        sketch = DDSketch()
+        for _ in range(10):
+            sketch.add_many(latencies)
+        assert sketch.count == 200000
+        assert sketch.num_bins < 1000
+
+    def test_lowest_bins_collapsed(self):
+        sketch = DDSketch(max_bins=64)
+        for exponent in range(-9, 10):
+            sketch.add(10.0 ** exponent)
+        assert sketch.num_bins <= 64
+        assert sketch.count == 19
+        assert sketch.quantile(1.0) == pytest.approx(1e9, rel=0.01)
+
+
+class TestDDSketchMerge:
+    """Test merging and serialization across workers."""
+
+    def test_merge_equals_single_sketch(self, latencies):
+        whole = DDSketch()
+        whole.add_many(latencies)
+        first, second = DDSketch(), DDSketch()
+        first.add_many(latencies[:5000])
+        second.add_many(latencies[5000:])
+        first.merge(second)
+
+        assert first.count == whole.count
+        for q in (0.5, 0.9, 0.99):
+            assert first.quantile(q) == whole.quantile(q)
+
+    def test_merge_rejects_different_accuracy(self):
+        with pytest.raises(ValueError):
+            DDSketch(0.01).merge(DDSketch(0.02))
+
+    def test_round_trip(self, latencies):
+        sketch = DDSketch()
+        sketch.add_many(latencies)
+        sketch.add(0.0)
+        restored = DDSketch.from_bytes(sketch.to_bytes())
+        assert restored.count == sketch.count
+        assert restored.sum == sketch.sum
+        assert restored.quantile(0.99) == sketch.quantile(0.99)
+
+    def test_from_bytes_rejects_garbage(self):
+        with pytest.raises(ValueError):
+            DDSketch.from_bytes(b"XXXX" + bytes(40))
+
+
+class TestQuantileSummary:
+    """Test the get_metrics_summary() entries."""
+
+    def test_summary_entries(self):
+        sketch = DDSketch()
+        sketch.add(0.1)
+        entries = quantile_summary("request_processing_seconds", sketch)
+        assert [e["quantile"] for e in entries] == ["0.5", "0.9", "0.99"]
+        assert entries[0]["value"] == pytest.approx(0.1, rel=0.01)
+
+    @pytest.mark.parametrize("backend_type", ["prometheus", "otel"])
+    def test_backend_summary_has_quantiles(self, monkeypatch, backend_type):
+        monkeypatch.setenv("METRICS_BACKEND", backend_type)
+        monkeypatch.setenv("OTEL_EXPORTER", "console")
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        for i in range(1, 101):
+            backend.record_request("/index", "GET", 200, i / 1000)
+        quantiles = {q["quantile"]: q["value"] for q in backend.get_metrics_summary()["request_quantiles"]}
+        assert quantiles["0.5"] == pytest.approx(0.05, rel=0.05)
+        assert quantiles["0.99"] == pytest.approx(0.099, rel=0.05)
+
+    def test_view_metrics_renders_quantiles(self, prometheus_env, flask_app):
+        response = flask_app.test_client().get("/view_metrics")
+        assert b"(p50)" in response.data
+        assert b"(p99)" in response.data
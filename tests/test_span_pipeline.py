@@ -0,0 +1,309 @@
+import threading
+import time
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+from app.span_pipeline import AdaptiveBatchSpanProcessor
+
+
+class FakeExporter(SpanExporter):
+    """Collects exported spans after ``latency`` seconds; can be paused, made to fail or raise.
+
+    With ``timeout``, an export whose latency plus ``per_span`` seconds for
+    each span exceeds it gives up after ``timeout`` seconds and fails.
+    """
+
+    def __init__(self, latency=0.0, result=SpanExportResult.SUCCESS, per_span=0.0, timeout=None):
+        self.latency = latency
+        self.result = result
+        self.per_span = per_span
+        self.timeout = timeout
+        self.raises = False
+        self.batches = []
+        self.released = threading.Event()
+        self.released.set()
+
+    def export(self, spans):
+        self.released.wait()
+        latency = self.latency + self.per_span * len(spans)
+        if self.timeout is not None and latency > self.timeout:
+            time.sleep(self.timeout)
+            return SpanExportResult.FAILURE
+        time.sleep(latency)
+        if self.raises:
+            raise ConnectionError("collector unavailable")
+        self.batches.append(len(spans))
+        return self.result
+
+    def shutdown(self):
+        self.released.set()
+
+    @property
+    def exported(self):
+        return sum(self.batches)
+
+
+@pytest.fixture
+def backend(prometheus_env):
+    from app.metrics import get_metrics_backend
+
+    return get_metrics_backend()
+
+
+def pipeline(exporter, metrics=None, **kwargs):
+    """Return (tracer, processor) for a provider exporting through an AdaptiveBatchSpanProcessor."""
+    kwargs.setdefault("schedule_delay", 0.05)
+    processor = AdaptiveBatchSpanProcessor(exporter, metrics, **kwargs)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    return provider.get_tracer(__name__), processor
+
+
+def record_spans(tracer, count):
+    for _ in range(count):
+        with tracer.start_as_current_span("GET /index"):
+            pass
+
+
+class TestAdaptiveBatchSpanProcessor:
+    """Test batching, flushing and dropping spans."""
+
+    def test_exports_full_batches(self):
+        exporter = FakeExporter()
+        tracer, processor = pipeline(exporter, max_export_batch_size=10, schedule_delay=60)
+        record_spans(tracer, 25)
+        assert processor.force_flush()
+        assert exporter.batches[:2] == [10, 10]
+        assert exporter.exported == 25
+
+    def test_partial_batch_exported_after_delay(self):
+        exporter = FakeExporter()
+        tracer, _ = pipeline(exporter, max_export_batch_size=100, schedule_delay=0.05)
+        record_spans(tracer, 3)
+        deadline = time.monotonic() + 5
+        while exporter.exported < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert exporter.batches == [3]
+
+    def test_queue_full_drops_new_spans(self, backend):
+        exporter = FakeExporter()
+        exporter.released.clear()
+        tracer, processor = pipeline(exporter, backend, max_queue_size=20, max_export_batch_size=5)
+        record_spans(tracer, 100)
+        exporter.released.set()
+        assert processor.force_flush()
+
+        dropped = backend.get_metrics_summary()["spans_dropped"]
+        assert dropped["queue_full"] > 0
+        assert exporter.exported + dropped["queue_full"] == 100
+        assert processor.queue_size == 0
+
+    def test_failed_exports_counted(self, backend):
+        exporter = FakeExporter(result=SpanExportResult.FAILURE)
+        tracer, processor = pipeline(exporter, backend)
+        record_spans(tracer, 7)
+        processor.force_flush()
+        assert backend.get_metrics_summary()["spans_dropped"]["export_failed"] == 7
+
+    def test_exporter_exception_does_not_stop_worker(self, backend):
+        exporter = FakeExporter()
+        exporter.raises = True
+        tracer, processor = pipeline(exporter, backend)
+        record_spans(tracer, 3)
+        processor.force_flush()
+        exporter.raises = False
+        record_spans(tracer, 4)
+        processor.force_flush()
+        assert exporter.exported == 4
+        assert backend.get_metrics_summary()["spans_dropped"]["export_failed"] == 3
+
+    def test_unsampled_spans_ignored(self):
+        from opentelemetry.sdk.trace.sampling import ALWAYS_OFF
+
+        exporter = FakeExporter()
+        processor = AdaptiveBatchSpanProcessor(exporter)
+        provider = TracerProvider(sampler=ALWAYS_OFF)
+        provider.add_span_processor(processor)
+        record_spans(provider.get_tracer(__name__), 5)
+        assert processor.queue_size == 0
+
+    def test_shutdown_exports_remaining(self):
+        exporter = FakeExporter()
+        tracer, processor = pipeline(exporter, schedule_delay=60)
+        record_spans(tracer, 5)
+        processor.shutdown()
+        assert exporter.exported == 5
+        record_spans(tracer, 5)
+        assert processor.queue_size == 0
+
+    def test_concurrent_producers(self):
+        exporter = FakeExporter()
+        tracer, processor = pipeline(exporter, max_queue_size=10000, max_export_batch_size=64)
+        threads = [threading.Thread(target=record_spans, args=(tracer, 500)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        processor.force_flush()
+        assert exporter.exported == 2000
+
+
+class TestPipelineMetrics:
+    """Test what the span pipeline reports to the metrics backend."""
+
+    @pytest.mark.parametrize("backend_type", ["prometheus", "otel"])
+    def test_export_latency_and_batch_size(self, monkeypatch, backend_type):
+        monkeypatch.setenv("METRICS_BACKEND", backend_type)
+        monkeypatch.setenv("OTEL_EXPORTER", "console")
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        exporter = FakeExporter(latency=0.01)
+        tracer, processor = pipeline(exporter, backend, max_export_batch_size=4, schedule_delay=60)
+        record_spans(tracer, 10)
+        processor.force_flush()
+
+        summary = backend.get_metrics_summary()
+        assert summary["span_export_batch_size"]["count"] == len(exporter.batches)
+        assert summary["span_export_batch_size"]["sum"] == 10
+        assert summary["span_export"]["count"] == len(exporter.batches)
+        assert summary["span_export"]["sum"] >= 0.01 * len(exporter.batches)
+        assert summary["span_queue_size"]["value"] == 0
+        assert summary["spans_dropped"] == {"name": "spans_dropped", "queue_full": 0, "export_failed": 0}
+
+    def test_queue_size_reported_while_exporter_is_slow(self, backend):
+        exporter = FakeExporter()
+        exporter.released.clear()
+        tracer, processor = pipeline(exporter, backend, max_export_batch_size=5, adaptive=False)
+        record_spans(tracer, 5)
+        time.sleep(0.1)  # the worker takes the first batch and blocks in export
+        record_spans(tracer, 30)
+        exporter.released.set()
+        time.sleep(0.05)
+        processor.force_flush()
+        sizes = backend.get_metrics_summary()
+        assert sizes["span_export_batch_size"]["sum"] == 35
+        assert exporter.batches[0] == 5
+
+    def test_metrics_exported_on_scrape(self, prometheus_env, flask_app):
+        client = flask_app.test_client()
+        client.get("/index")
+        flask_app.extensions["tracer_provider"].force_flush()
+        body = client.get("/metrics").data
+        assert b"span_export_batch_size_count 1.0" in body
+        assert b"span_queue_size 0.0" in body
+
+
+class TestAdaptiveBatching:
+    """Test batch size and schedule delay following export latency."""
+
+    def test_failed_exports_back_off(self):
+        processor = AdaptiveBatchSpanProcessor(FakeExporter(), max_export_batch_size=512, schedule_delay=1.0,
+                                               target_latency=0.5)
+        processor._adapt(0.1, succeeded=False)
+        assert (processor.batch_size, processor.schedule_delay) == (256, 2.0)
+        for _ in range(20):
+            processor._adapt(2.0, succeeded=False)
+        assert (processor.batch_size, processor.schedule_delay) == (16, 8.0)
+
+    def test_slow_exports_keep_batch_size(self):
+        processor = AdaptiveBatchSpanProcessor(FakeExporter(), max_export_batch_size=512, schedule_delay=1.0,
+                                               target_latency=0.5)
+        for _ in range(3):
+            processor._adapt(2.0)
+        assert (processor.batch_size, processor.schedule_delay) == (512, 8.0)
+
+    def test_fast_exports_recover(self):
+        processor = AdaptiveBatchSpanProcessor(FakeExporter(), max_export_batch_size=512, schedule_delay=1.0,
+                                               target_latency=0.5)
+        for _ in range(3):
+            processor._adapt(2.0, succeeded=False)
+        processor._adapt(0.4)  # under target but not fast enough to grow
+        assert processor.batch_size == 64
+        for _ in range(10):
+            processor._adapt(0.1)
+        assert (processor.batch_size, processor.schedule_delay) == (512, 1.0)
+
+    def test_disabled(self):
+        exporter = FakeExporter(latency=0.02)
+        tracer, processor = pipeline(exporter, max_export_batch_size=8, adaptive=False, target_latency=0.001)
+        record_spans(tracer, 16)
+        processor.force_flush()
+        assert processor.batch_size == 8
+        assert processor.schedule_delay == 0.05
+
+    def test_slow_collector(self, backend):
+        """A deliberately slow exporter stretches the delay but keeps full batches; drops are counted."""
+        exporter = FakeExporter(latency=0.03)
+        tracer, processor = pipeline(
+            exporter, backend, max_queue_size=64, max_export_batch_size=32,
+            schedule_delay=0.01, target_latency=0.01,
+        )
+        for _ in range(20):
+            record_spans(tracer, 10)
+            time.sleep(0.005)
+        processor.force_flush()
+
+        assert processor.batch_size == 32
+        assert processor.schedule_delay == pytest.approx(0.08)
+        assert max(exporter.batches) == 32
+        summary = backend.get_metrics_summary()
+        assert exporter.exported + summary["spans_dropped"]["queue_full"] == 200
+        assert summary["span_export"]["sum"] >= 0.03 * len(exporter.batches)
+
+        exporter.latency = 0
+        for _ in range(6):
+            record_spans(tracer, 1)
+            processor.force_flush()
+        assert (processor.batch_size, processor.schedule_delay) == (32, 0.01)
+
+    def drops(self, adaptive, **exporter_kwargs):
+        """Return (spans lost, final batch size) after a burst of 300 spans into a 128-span queue."""
+        exporter = FakeExporter(**exporter_kwargs)
+        tracer, processor = pipeline(
+            exporter, max_queue_size=128, max_export_batch_size=64,
+            schedule_delay=0.01, target_latency=0.005, adaptive=adaptive,
+        )
+        for _ in range(30):
+            record_spans(tracer, 10)
+            time.sleep(0.005)
+        processor.force_flush()
+        processor.shutdown()
+        return 300 - exporter.exported, processor.batch_size
+
+    def test_slow_collector_drains_at_full_batch_size(self):
+        """When each request is slow, adapting must not shrink batches and drop more than fixed batching."""
+        adaptive_dropped, batch_size = self.drops(True, latency=0.05)
+        fixed_dropped, _ = self.drops(False, latency=0.05)
+        assert batch_size == 64
+        # Equal up to timing noise; halving batches to 16 lost ~90 more spans here
+        assert adaptive_dropped <= fixed_dropped + 16
+
+    def test_timing_out_collector_drops_fewer_spans_when_adaptive(self):
+        """Batches of 64 time out; the adaptive processor settles on 32, which do not."""
+        adaptive_dropped, batch_size = self.drops(True, latency=0.01, per_span=0.001, timeout=0.05)
+        fixed_dropped, _ = self.drops(False, latency=0.01, per_span=0.001, timeout=0.05)
+        assert batch_size == 32
+        assert adaptive_dropped < fixed_dropped
+
+
+class TestConfiguration:
+    """Test the OTEL_BSP_* settings used by init_tracing."""
+
+    def test_defaults(self, monkeypatch):
+        for name in ("OTEL_BSP_SCHEDULE_DELAY", "OTEL_BSP_MAX_QUEUE_SIZE", "OTEL_BSP_MAX_EXPORT_BATCH_SIZE",
+                     "OTEL_BSP_ADAPTIVE", "OTEL_BSP_TARGET_LATENCY"):
+            monkeypatch.delenv(name, raising=False)
+        from app import span_pipeline
+
+        assert span_pipeline.get_schedule_delay() == 5.0
+        assert span_pipeline.get_max_queue_size() == 2048
+        assert span_pipeline.get_max_export_batch_size() == 512
+        assert span_pipeline.get_adaptive_batching() is True
+        assert span_pipeline.get_target_export_latency() == 1.0
+
+    def test_init_tracing_uses_pipeline(self, monkeypatch, flask_app):
+        processors = flask_app.extensions["tracer_provider"]._active_span_processor._span_processors
+        assert isinstance(processors[0], AdaptiveBatchSpanProcessor)
@@ -0,0 +1,140 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.startup import StartupProfile
+from tests.conftest import FakeClock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous enough for a loaded CI machine; a full import of every backend and exporter stays well below it
+COLD_START_BUDGET = float(os.environ.get("COLD_START_BUDGET", "3.0"))
+
+COLD_START_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def cold_start(**env):
+    """Create the app in a fresh interpreter; return (seconds, imported module names)."""
+    env = dict(os.environ, LOG_TO_STDOUT="1", **env)
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    data = json.loads(next(line for line in result.stdout.splitlines() if line.startswith('{"seconds"')))
+    return data["seconds"], set(data["modules"])
+
+
+def imported(modules, package):
+    return any(name == package or name.startswith(package + ".") for name in modules)
+
+
+class TestStartupProfile:
+    """Test per-phase startup timings."""
+
+    def test_records_time_and_new_modules(self):
+        clock = FakeClock()
+        profile = StartupProfile(clock=clock)
+        with profile.phase("imports"):
+            sys.modules["_startup_profile_test_module"] = object()
+            clock.now += 0.25
+        del sys.modules["_startup_profile_test_module"]
+
+        assert profile.phases == [{"phase": "imports", "seconds": 0.25, "modules": 1}]
+        assert profile.total_seconds == 0.25
+        assert "imports" in profile.report()
+
+    def test_disabled_records_nothing(self):
+        profile = StartupProfile(enabled=False)
+        with profile.phase("imports"):
+            pass
+        assert profile.phases == []
+
+    def test_create_app_profile(self, prometheus_env, monkeypatch, flask_app):
+        monkeypatch.setenv("STARTUP_PROFILE", "true")
+        from app import create_app
+        from config import Config
+
+        class TestConfig(Config):
+            TESTING = True
+
+        app = create_app(TestConfig)
+        phases = [phase["phase"] for phase in app.extensions["startup_profile"].phases]
+        assert phases == [
+            "config", "blueprints", "templates", "metrics backend", "tracing", "request metrics",
+            "/metrics endpoint",
+        ]
+
+    def test_no_profile_by_default(self, flask_app):
+        assert "startup_profile" not in flask_app.extensions
+
+
+class TestTracingDisabled:
+    """Test OTEL_EXPORTER=none."""
+
+    def test_app_not_instrumented(self, monkeypatch):
+        monkeypatch.setenv("OTEL_EXPORTER", "none")
+        from flask import Flask
+        from app.tracing import init_tracing
+
+        app = Flask(__name__)
+        init_tracing(app)
+        assert not getattr(app, "_is_instrumented_by_opentelemetry", False)
+
+    def test_otel_metrics_without_export(self, monkeypatch):
+        monkeypatch.setenv("OTEL_EXPORTER", "none")
+        from app.metrics.otel import _create_metric_reader
+
+        assert _create_metric_reader() is None
+
+    def test_otel_backend_summary_without_export(self, monkeypatch):
+        monkeypatch.setenv("METRICS_BACKEND", "otel")
+        monkeypatch.setenv("OTEL_EXPORTER", "none")
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        backend.record_request("/index", "GET", 200, 0.1)
+        assert backend.get_metrics_summary()["http_requests"]["value"] == 1
+
+
+class TestColdStart:
+    """Test what a fresh worker imports and how long create_app() takes."""
+
+    def test_prometheus_without_tracing(self):
+        seconds, modules = cold_start(METRICS_BACKEND="prometheus", OTEL_EXPORTER="none")
+        assert not imported(modules, "opentelemetry")
+        assert not imported(modules, "grpc")
+        assert seconds < COLD_START_BUDGET
+
+    def test_console_tracing_skips_otlp(self):
+        seconds, modules = cold_start(METRICS_BACKEND="prometheus", OTEL_EXPORTER="console")
+        assert imported(modules, "opentelemetry.instrumentation.flask")
+        assert not imported(modules, "grpc")
+        assert not imported(modules, "opentelemetry.exporter.otlp")
+        assert seconds < COLD_START_BUDGET
+
+    def test_otlp_http_skips_grpc(self):
+        seconds, modules = cold_start(METRICS_BACKEND="otel", OTEL_EXPORTER="otlp_http")
+        assert imported(modules, "opentelemetry.exporter.otlp.proto.http")
+        assert not imported(modules, "grpc")
+        assert seconds < COLD_START_BUDGET
+
+    def test_otel_backend_skips_prometheus_client(self):
+        seconds, modules = cold_start(METRICS_BACKEND="otel", OTEL_EXPORTER="console")
+        assert not imported(modules, "prometheus_client")
+        assert seconds < COLD_START_BUDGET
+
+    def test_thread_executor_skips_multiprocessing(self):
+        _, modules = cold_start(METRICS_BACKEND="prometheus", OTEL_EXPORTER="none")
+        assert not imported(modules, "multiprocessing")
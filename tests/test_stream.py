@@ -0,0 +1,219 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.metrics.snapshot import MetricsSnapshots
+from app.metrics.stream import MetricsStream, format_event
+from tests.conftest import FakeClock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GEVENT_SCRIPT = """
+from gevent import monkey
+monkey.patch_all()
+
+import os
+import gevent
+os.environ["METRICS_BACKEND"] = "prometheus"
+from app.metrics import get_metrics_backend
+from app.metrics.snapshot import MetricsSnapshots
+from app.metrics.stream import MetricsStream
+
+backend = get_metrics_backend()
+stream = MetricsStream(MetricsSnapshots(backend, ttl=0), interval=0.05)
+received = []
+
+def client():
+    events = stream.events(max_age=1.0)
+    for payload in events:
+        if b'"http_error_4xx":1' in payload:
+            received.append(payload)
+            events.close()
+
+clients = [gevent.spawn(client) for _ in range(200)]
+gevent.sleep(0.1)
+backend.inc_4xx("/index", "GET")
+gevent.joinall(clients, timeout=5)
+print(len(received), stream.subscribers)
+"""
+
+
+def parse_events(body):
+    """Return the data of every 'metrics' event in an SSE body."""
+    events = []
+    for block in body.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields.get("event") == "metrics":
+            events.append(json.loads(fields["data"]))
+    return events
+
+
+@pytest.fixture
+def backend(prometheus_env):
+    from app.metrics import get_metrics_backend
+    return get_metrics_backend()
+
+
+@pytest.fixture
+def stream(backend):
+    """A stream whose producer is driven by calling tick()."""
+    stream = MetricsStream(MetricsSnapshots(backend, ttl=0), heartbeat=0.01)
+    stream.close()
+    return stream
+
+
+class TestFormatEvent:
+    """Test Server-Sent Event encoding."""
+
+    def test_event_fields(self):
+        payload = format_event(7, 3, {"http_requests": 1})
+        assert payload.startswith(b"id: 7\nevent: metrics\ndata: ")
+        assert payload.endswith(b"\n\n")
+        assert parse_events(payload) == [{"version": 7, "since": 3, "series": {"http_requests": 1}}]
+
+
+class TestMetricsStream:
+    """Test delivery of deltas to stream clients."""
+
+    def test_first_event_has_every_series(self, stream):
+        events = stream.events()
+        assert next(events).startswith(b"retry: ")
+        first = parse_events(next(events))[0]
+        assert first["since"] is None
+        assert "http_requests" in first["series"]
+        events.close()
+
+    def test_tick_only_publishes_changes(self, stream, backend):
+        assert stream.tick()
+        assert not stream.tick()
+        backend.inc_4xx("/index", "GET")
+        assert stream.tick()
+
+    def test_clients_share_encoded_event(self, stream, backend):
+        clients = [stream.events() for _ in range(3)]
+        for events in clients:
+            next(events), next(events)
+        backend.inc_4xx("/index", "GET")
+        stream.tick()
+
+        payloads = [next(events) for events in clients]
+        assert all(payload is payloads[0] for payload in payloads)
+        assert parse_events(payloads[0])[0]["series"] == {"http_error_4xx": 1}
+        for events in clients:
+            events.close()
+
+    def test_lagging_client_gets_combined_delta(self, stream, backend):
+        events = stream.events()
+        next(events), next(events)
+        backend.inc_4xx("/index", "GET")
+        stream.tick()
+        backend.inc_5xx("/index", "GET")
+        stream.tick()
+
+        delta = parse_events(next(events))[0]
+        assert {"http_error_4xx", "http_error_5xx"} <= set(delta["series"])
+        events.close()
+
+    def test_resume_after_version(self, stream, backend):
+        version = stream._snapshots.changed_since()[0]
+        backend.inc_4xx("/index", "GET")
+        events = stream.events(since=version)
+        next(events)
+        assert parse_events(next(events))[0]["series"] == {"http_error_4xx": 1}
+        events.close()
+
+    def test_keepalive_when_idle(self, stream):
+        events = stream.events()
+        next(events), next(events)
+        assert next(events) == b": keepalive\n\n"
+        events.close()
+
+    def test_stream_ends_after_max_age(self, backend):
+        clock = FakeClock()
+        stream = MetricsStream(MetricsSnapshots(backend, ttl=0), heartbeat=0.01, clock=clock)
+        stream.close()
+        events = stream.events(max_age=30)
+        next(events), next(events)
+        clock.now += 30
+        assert list(events) == []
+        assert stream.subscribers == 0
+
+
+class TestMetricsStreamProducer:
+    """Test the shared producer thread."""
+
+    def test_one_summary_per_tick_for_many_clients(self, backend, monkeypatch):
+        stream = MetricsStream(MetricsSnapshots(backend, ttl=0))
+        stream.close()
+        clients = [stream.events() for _ in range(50)]
+        for events in clients:
+            next(events), next(events)
+
+        calls = []
+        summary = backend.get_metrics_summary
+        monkeypatch.setattr(backend, "get_metrics_summary", lambda: calls.append(1) or summary())
+        backend.inc_4xx("/index", "GET")
+        stream.tick()
+        for events in clients:
+            next(events)
+        assert len(calls) == 1
+        for events in clients:
+            events.close()
+
+    def test_producer_starts_and_stops_with_clients(self, backend):
+        stream = MetricsStream(MetricsSnapshots(backend, ttl=0), interval=0.01)
+        events = stream.events()
+        next(events), next(events)
+        backend.inc_4xx("/index", "GET")
+        assert parse_events(next(events))[0]["series"] == {"http_error_4xx": 1}
+        producer = stream._producer
+
+        events.close()
+        producer.join(timeout=1)
+        assert not producer.is_alive()
+        assert stream._producer is None
+        stream.close()
+
+    def test_gevent_clients(self):
+        pytest.importorskip("gevent")
+        result = subprocess.run(
+            [sys.executable, "-c", GEVENT_SCRIPT],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True, timeout=30,
+        )
+        assert result.stdout.split() == ["200", "0"]
+
+
+class TestStreamEndpoint:
+    """Test /api/metrics/stream."""
+
+    @pytest.fixture
+    def client(self, prometheus_env, monkeypatch, flask_app):
+        monkeypatch.setenv("METRICS_CACHE_TTL", "0")
+        monkeypatch.setenv("METRICS_STREAM_MAX_AGE", "0.2")
+        return flask_app.test_client()
+
+    def test_stream_response(self, client):
+        started = time.monotonic()
+        response = client.get("/api/metrics/stream")
+        assert response.mimetype == "text/event-stream"
+        assert response.headers["Cache-Control"] == "no-cache"
+        events = parse_events(response.get_data())
+        assert time.monotonic() - started < 5
+        assert "http_requests" in events[0]["series"]
+
+    def test_resume_with_last_event_id(self, client):
+        version = client.get("/api/metrics").get_json()["version"]
+        response = client.get("/api/metrics/stream", headers={"Last-Event-ID": str(version)})
+        assert parse_events(response.get_data()) == []
+
+    def test_invalid_since(self, client):
+        assert client.get("/api/metrics/stream?since=x").status_code == 400
+
+    def test_view_metrics_subscribes(self, client):
+        response = client.get("/view_metrics")
+        assert b"/api/metrics/stream" in response.data
+        assert b'data-series="http_requests"' in response.data
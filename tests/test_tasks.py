@@ -0,0 +1,185 @@
+import threading
+import time
+
+import pytest
+
+from app.metrics.base import MetricsBackend
+from app.tasks import Job, TaskExecutor, TaskQueueFull, report_progress
+
+
+def add(a, b):
+    return a + b
+
+
+def fail():
+    raise ValueError("boom")
+
+
+@pytest.fixture
+def backend(mocker):
+    return mocker.Mock(spec=MetricsBackend)
+
+
+@pytest.fixture
+def executor(backend):
+    executor = TaskExecutor(backend, max_workers=2, max_queue=2)
+    yield executor
+    executor.shutdown()
+
+
+class TestTaskExecutor:
+    """Test task submission and job lifecycle."""
+
+    def test_job_succeeds(self, executor):
+        job = executor.submit(add, 1, 2)
+        job.wait(timeout=5)
+        assert job.state == "succeeded"
+        assert job.progress == 1.0
+        assert job.started_at >= job.submitted_at
+        assert job.finished_at >= job.started_at
+
+    def test_job_failure_recorded(self, executor):
+        job = executor.submit(fail)
+        job.wait(timeout=5)
+        assert job.state == "failed"
+        assert "boom" in job.error
+
+    def test_get_returns_job(self, executor):
+        job = executor.submit(add, 1, 2)
+        assert executor.get(job.id) is job
+        assert executor.get("missing") is None
+
+    def test_progress_reported(self, executor):
+        reported = threading.Event()
+        release = threading.Event()
+
+        def task():
+            report_progress(0.5)
+            reported.set()
+            release.wait(5)
+
+        job = executor.submit(task)
+        assert reported.wait(5)
+        assert job.progress == 0.5
+        release.set()
+        job.wait(timeout=5)
+        assert job.progress == 1.0
+
+    def test_report_progress_outside_task_is_noop(self):
+        report_progress(0.5)
+
+    def test_queue_full_rejects(self, executor):
+        release = threading.Event()
+        jobs = [executor.submit(release.wait, 5) for _ in range(2)]
+        while executor.running < 2:
+            time.sleep(0.001)
+        jobs += [executor.submit(release.wait, 5) for _ in range(2)]
+
+        with pytest.raises(TaskQueueFull):
+            executor.submit(release.wait, 5)
+
+        release.set()
+        for job in jobs:
+            job.wait(timeout=5)
+
+    def test_unknown_mode_rejected(self, backend):
+        with pytest.raises(ValueError):
+            TaskExecutor(backend, mode="fiber")
+
+    def test_finished_jobs_evicted(self, backend):
+        executor = TaskExecutor(backend, max_workers=1, max_queue=10, max_jobs=3)
+        try:
+            jobs = []
+            for _ in range(5):
+                job = executor.submit(add, 1, 1)
+                job.wait(timeout=5)
+                jobs.append(job)
+            assert executor.get(jobs[0].id) is None
+            assert executor.get(jobs[-1].id) is jobs[-1]
+        finally:
+            executor.shutdown()
+
+    def test_process_mode(self, backend):
+        executor = TaskExecutor(backend, mode="process", max_workers=1)
+        try:
+            job = executor.submit(add, 2, 3)
+            job.wait(timeout=30)
+            assert job.state == "succeeded"
+        finally:
+            executor.shutdown()
+
+
+class TestTaskExecutorMetrics:
+    """Test that the executor reports through the metrics backend."""
+
+    def test_reports_queue_depth_and_running(self, executor, backend):
+        executor.submit(add, 1, 2).wait(timeout=5)
+
+        backend.set_task_queue_depth.assert_any_call(1)
+        backend.set_task_queue_depth.assert_called_with(0)
+        backend.set_tasks_running.assert_any_call(1)
+        backend.set_tasks_running.assert_called_with(0)
+
+    def test_reports_queue_wait(self, executor, backend):
+        executor.submit(add, 1, 2).wait(timeout=5)
+
+        backend.observe_task_queue_wait.assert_called_once()
+        assert backend.observe_task_queue_wait.call_args.args[0] >= 0
+
+
+class TestJob:
+    """Test job serialization."""
+
+    def test_to_dict(self):
+        job = Job()
+        data = job.to_dict()
+        assert data["id"] == job.id
+        assert data["state"] == "queued"
+        assert data["progress"] == 0.0
+
+
+class TestTaskRoutes:
+    """Test /do_task and /tasks/<job_id>."""
+
+    @pytest.fixture
+    def client(self, prometheus_env, flask_app):
+        flask_app.config["TASK_DURATION"] = 0.01
+        return flask_app.test_client()
+
+    def test_do_task_waits_by_default(self, client):
+        response = client.get("/do_task")
+        assert response.status_code == 200
+
+    def test_do_task_async_returns_job(self, client):
+        response = client.get("/do_task?async=1")
+        assert response.status_code == 202
+        job_id = response.get_json()["id"]
+        assert response.headers["Location"].endswith(f"/tasks/{job_id}")
+
+        for _ in range(500):
+            status = client.get(f"/tasks/{job_id}").get_json()
+            if status["state"] == "succeeded":
+                break
+            time.sleep(0.01)
+        assert status["state"] == "succeeded"
+        assert status["progress"] == 1.0
+
+    def test_do_task_prefer_header(self, client):
+        response = client.get("/do_task", headers={"Prefer": "respond-async"})
+        assert response.status_code == 202
+
+    def test_unknown_task_returns_404(self, client):
+        response = client.get("/tasks/does-not-exist")
+        assert response.status_code == 404
+        assert response.get_json() == {"error": "unknown job"}
+
+    def test_full_queue_returns_503(self, client, monkeypatch):
+        from app.tasks import get_task_executor
+
+        def reject(*args):
+            raise TaskQueueFull()
+
+        monkeypatch.setattr(get_task_executor(), "submit", reject)
+        response = client.get("/do_task")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
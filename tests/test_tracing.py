@@ -1,5 +1,7 @@
 import pytest
 
+from tests.collector import StandInCollector, make_spans
+
 
 class TestCreateSpanExporter:
     """Test the span exporter factory function."""
@@ -39,6 +41,124 @@ class TestCreateSpanExporter:
         assert isinstance(exporter, ConsoleSpanExporter)
 
 
+class TestOTLPHTTPExporter:
+    """Test OTEL_EXPORTER=otlp_http against a local stand-in collector."""
+
+    def test_returns_http_exporter(self, otlp_http_env):
+        from app.tracing import _create_span_exporter
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        exporter = _create_span_exporter()
+        assert isinstance(exporter, OTLPSpanExporter)
+
+    def test_default_endpoint_and_compression(self, monkeypatch):
+        monkeypatch.setenv("OTEL_EXPORTER", "otlp_http")
+        monkeypatch.delenv("OTEL_EXPORTER_OTLP_ENDPOINT", raising=False)
+        monkeypatch.delenv("OTEL_EXPORTER_OTLP_COMPRESSION", raising=False)
+        from app.tracing import get_otlp_compression, get_otlp_endpoint
+
+        assert get_otlp_endpoint() == "http://localhost:4318"
+        assert get_otlp_compression() == "gzip"
+
+    def test_spans_sent_gzipped(self, otlp_http_env):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        from app.tracing import _create_span_exporter
+
+        exporter = _create_span_exporter()
+        assert exporter.export(make_spans(50)) is SpanExportResult.SUCCESS
+
+        [export] = otlp_http_env.signal("traces")
+        assert (export.items, export.encoding) == (50, "gzip")
+        assert export.body_bytes < export.payload_bytes / 3
+
+    def test_compression_can_be_disabled(self, otlp_http_env, monkeypatch):
+        monkeypatch.setenv("OTEL_EXPORTER_OTLP_COMPRESSION", "none")
+        from app.tracing import _create_span_exporter
+
+        _create_span_exporter().export(make_spans(5))
+        [export] = otlp_http_env.signal("traces")
+        assert export.encoding is None
+        assert export.body_bytes == export.payload_bytes
+
+    def test_connections_reused_across_exports_and_signals(self, otlp_http_env):
+        from opentelemetry.sdk.metrics import MeterProvider
+        from app.metrics.otel import _create_metric_reader
+        from app.tracing import _create_span_exporter
+
+        span_exporter = _create_span_exporter()
+        reader = _create_metric_reader()
+        provider = MeterProvider(metric_readers=[reader])
+        counter = provider.get_meter(__name__).create_counter("exports")
+        for _ in range(5):
+            span_exporter.export(make_spans(10))
+            counter.add(1)
+            reader.force_flush()
+
+        assert len(otlp_http_env.signal("traces")) == 5
+        assert len(otlp_http_env.signal("metrics")) == 5
+        assert otlp_http_env.http.connections == 1
+        provider.shutdown()
+
+    def test_shutdown_of_one_exporter_keeps_the_other_working(self, otlp_http_env):
+        from opentelemetry.sdk.metrics import MeterProvider
+        from app.metrics.otel import _create_metric_reader
+        from app.tracing import _create_span_exporter
+
+        span_exporter = _create_span_exporter()
+        reader = _create_metric_reader()
+        provider = MeterProvider(metric_readers=[reader])
+        provider.get_meter(__name__).create_counter("exports").add(1)
+        span_exporter.shutdown()
+        reader.force_flush()
+
+        assert len(otlp_http_env.signal("metrics")) == 1
+        provider.shutdown()
+
+    def test_app_exports_request_spans(self, otlp_http_env, monkeypatch, flask_app):
+        client = flask_app.test_client()
+        for _ in range(3):
+            client.get("/index")
+        flask_app.extensions["tracer_provider"].force_flush()
+        assert sum(export.items for export in otlp_http_env.signal("traces")) == 3
+
+
+class TestOTLPCompression:
+    """Test OTEL_EXPORTER_OTLP_COMPRESSION on the wire."""
+
+    @pytest.fixture
+    def collector(self):
+        with StandInCollector() as collector:
+            yield collector
+
+    def wire_bytes(self, monkeypatch, collector, exporter_type, compression):
+        from app.tracing import _create_span_exporter
+
+        proxy = collector.grpc if exporter_type == "otlp" else collector.http
+        endpoint = collector.grpc_endpoint if exporter_type == "otlp" else collector.http_endpoint
+        monkeypatch.setenv("OTEL_EXPORTER", exporter_type)
+        monkeypatch.setenv("OTEL_EXPORTER_OTLP_ENDPOINT", endpoint)
+        monkeypatch.setenv("OTEL_EXPORTER_OTLP_COMPRESSION", compression)
+        before = proxy.wire_bytes
+        exporter = _create_span_exporter()
+        exporter.export(make_spans(200))
+        exporter.shutdown()
+        return proxy.wire_bytes - before
+
+    @pytest.mark.parametrize("exporter_type", ["otlp", "otlp_http"])
+    def test_gzip_reduces_bytes_on_the_wire(self, monkeypatch, collector, exporter_type):
+        plain = self.wire_bytes(monkeypatch, collector, exporter_type, "none")
+        gzipped = self.wire_bytes(monkeypatch, collector, exporter_type, "gzip")
+        assert gzipped < plain / 3
+        assert [export.items for export in collector.signal("traces")] == [200, 200]
+
+    def test_grpc_compression_default_none(self, otlp_env, monkeypatch):
+        monkeypatch.delenv("OTEL_EXPORTER_OTLP_COMPRESSION", raising=False)
+        import grpc
+        from app.tracing import otlp_grpc_compression
+
+        assert otlp_grpc_compression() is grpc.Compression.NoCompression
+
+
 class TestOTLPConfiguration:
     """Test OTLP exporter configuration."""
 
@@ -0,0 +1,121 @@
+import tracemalloc
+
+import pytest
+
+from app.metrics.window import WINDOWS, SlidingWindow
+
+
+@pytest.fixture
+def window(clock):
+    return SlidingWindow(clock=clock)
+
+
+class TestSlidingWindowTotals:
+    """Test window totals and expiry."""
+
+    def test_empty_window(self, window):
+        requests, errors, latency_count, latency_sum, _ = window.totals(60)
+        assert (requests, errors, latency_count, latency_sum) == (0, 0, 0, 0.0)
+
+    def test_counts_within_window(self, window, clock):
+        window.add(requests=3, errors=1)
+        clock.now += 10
+        window.add(requests=2)
+        assert window.totals(60)[:2] == (5, 1)
+
+    def test_old_seconds_expire(self, window, clock):
+        window.add(requests=3)
+        clock.now += 30
+        window.add(requests=2)
+        clock.now += 40
+        assert window.totals(60)[0] == 2
+        assert window.totals(300)[0] == 5
+
+    def test_everything_expires_after_span(self, window, clock):
+        window.add(requests=3)
+        clock.now += 2000
+        assert window.totals(900)[0] == 0
+
+    def test_idle_gap_longer_than_ring(self, window, clock):
+        window.add(requests=3)
+        clock.now += 5000
+        window.add(requests=1)
+        clock.now += 1
+        assert window.totals(60)[0] == 1
+
+    def test_covered_seconds_limited_by_age(self, window, clock):
+        clock.now += 10
+        assert window.totals(900)[4] == pytest.approx(10)
+
+    def test_clock_going_backwards_keeps_counting(self, window, clock):
+        clock.now += 5
+        window.add(requests=1)
+        clock.now -= 3
+        window.add(requests=1)
+        assert window.totals(60)[0] == 2
+
+    def test_window_longer_than_span_rejected(self, window):
+        with pytest.raises(ValueError):
+            window.totals(1000)
+
+
+class TestSlidingWindowSummary:
+    """Test the get_metrics_summary() entries."""
+
+    def test_rate_and_ratio(self, window, clock):
+        for _ in range(120):
+            window.add(requests=2, errors=1, latency_count=2, latency_sum=0.2)
+            clock.now += 1
+
+        entries = {e["window"]: e for e in window.summary()}
+        assert [label for label, _ in WINDOWS] == list(entries)
+        one_minute = entries["1m"]
+        # The current second is empty, so the minute holds 59 seconds of traffic
+        assert one_minute["requests"] == 118
+        assert one_minute["rate"] == pytest.approx(2.0)
+        assert one_minute["error_ratio"] == pytest.approx(0.5)
+        assert one_minute["latency_avg"] == pytest.approx(0.1)
+        assert entries["5m"]["requests"] == 240
+
+    def test_rate_over_covered_seconds(self, window, clock):
+        clock.now += 9.5
+        window.add(requests=5)
+        one_minute = window.summary()[0]
+        assert one_minute["seconds"] == 10
+        assert one_minute["rate"] == one_minute["requests"] / one_minute["seconds"] == 0.5
+
+    def test_no_requests(self, window):
+        entry = window.summary()[0]
+        assert entry["rate"] == 0.0
+        assert entry["error_ratio"] == 0.0
+        assert entry["latency_avg"] is None
+
+    @pytest.mark.parametrize("backend_type", ["prometheus", "otel"])
+    def test_backend_summary_has_windows(self, monkeypatch, backend_type):
+        monkeypatch.setenv("METRICS_BACKEND", backend_type)
+        monkeypatch.setenv("OTEL_EXPORTER", "console")
+        from app.metrics import get_metrics_backend
+
+        backend = get_metrics_backend()
+        backend.record_request("/index", "GET", 200, 0.1)
+        backend.record_request("/index", "GET", 503, 0.1)
+        one_minute = backend.get_metrics_summary()["request_windows"][0]
+        assert one_minute["window"] == "1m"
+        assert one_minute["requests"] == 2
+        assert one_minute["error_ratio"] == 0.5
+
+
+class TestSlidingWindowMemory:
+    """Test that memory does not grow with traffic."""
+
+    def test_memory_independent_of_traffic(self, window, clock):
+        tracemalloc.start()
+        try:
+            for _ in range(3600):
+                for _ in range(10):
+                    window.add(requests=1, latency_count=1, latency_sum=0.01)
+                clock.now += 1
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < 64 * 1024